@@ -1,14 +1,594 @@
 #!/usr/bin/python
 
 import httplib2 
+import urllib3
 import base64
+import codecs
+import copy
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import re
+import socket
+import threading
+import time
+from collections import deque
 import simplejson as json
+import json as stdjson
+from concurrent.futures import Future, ThreadPoolExecutor
 from urllib.parse import urlencode
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 class Required(object): pass
 class Optional(object): pass
 
 class Device42APIObjectException(Exception):    pass
+class Device42APITimeoutException(Device42APIObjectException):  pass
+
+# the object whose load()/save() is running in the current context, used by the SlowRequestLog
+_caller = contextvars.ContextVar('device42api_caller', default=None)
+# time.monotonic() the calls of the current context have to be finished by, see Device42API.deadline
+_deadline = contextvars.ContextVar('device42api_deadline', default=None)
+# socket timeout applied by the connection classes below once connected
+_read_timeout = contextvars.ContextVar('device42api_read_timeout', default=None)
+# True while a WriteBehind sends a queued request, the request goes out instead of being queued again
+_write_behind = contextvars.ContextVar('device42api_write_behind', default=False)
+# the _Attempt of a hedged GET running in the current context, aborted once the other request answered
+_attempt = contextvars.ContextVar('device42api_attempt', default=None)
+
+def remaining():
+    """return the seconds left until the deadline of the current context or None without deadline"""
+    d = _deadline.get()
+    if d == None:   return None
+    return d - time.monotonic()
+
+def normalize_mac(v):
+    """return mac address v as lower case xx:xx:xx:xx:xx:xx, also given with - or . separators or none,
+    other values lower case, None if empty
+    
+    >>> device42api.normalize_mac('00-11-22-AA-BB-CC'), device42api.normalize_mac('0011.22aa.bbcc')
+    ('00:11:22:aa:bb:cc', '00:11:22:aa:bb:cc')
+    
+    """
+    if v == None or isinstance(v, (Required, Optional)):    return None
+    digits = re.sub('[^0-9a-f]', '', (u'%s' % v).lower())
+    if len(digits) != 12:   return (u'%s' % v).strip().lower() or None
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+class ReadTimeoutConnection(object):
+    """httplib2 uses one timeout for connecting and reading, this mixin connects with the timeout of the
+    connection (the connect timeout) and switches the socket to the read timeout of the current request"""
+    def connect(self):
+        attempt = _attempt.get()
+        if attempt != None and attempt.aborted.is_set():
+            # httplib2 reconnects after the socket was shut down by _Attempt.abort(), give up instead
+            raise Device42APIObjectException(u'request aborted, another request answered first')
+        super(ReadTimeoutConnection, self).connect()
+        read = _read_timeout.get()
+        if self.sock != None and (read != None or self.timeout != None):
+            self.sock.settimeout(read)
+class HTTPConnectionWithReadTimeout(ReadTimeoutConnection, httplib2.HTTPConnectionWithTimeout):     pass
+class HTTPSConnectionWithReadTimeout(ReadTimeoutConnection, httplib2.HTTPSConnectionWithTimeout):   pass
+
+def traced(fn):
+    """decorator wrapping Device42API getters and the load()/save() methods of objects into a tracing span
+    named "Class.method" with the object type, id and name as attributes, see SpanRecorder"""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if isinstance(self, Device42API):
+            api, token = self, None
+        else:
+            api, token = getattr(self, 'api', None), _caller.set(self)
+        try:
+            if getattr(api, 'tracer', None) == None:
+                return fn(self, *args, **kwargs)
+            attributes = {'device42.object.type': self.__class__.__name__}
+            if token != None:
+                attributes['device42.object.id']    = self.__object_id__()
+                attributes['device42.object.name']  = self.__object_name__()
+            with api.__span__('%s.%s' % (self.__class__.__name__, fn.__name__), attributes):
+                return fn(self, *args, **kwargs)
+        finally:
+            if token != None:   _caller.reset(token)
+    return wrapper
+
+class Span(object):
+    """.. _Span:
+    
+    span recorded by the SpanRecorder, offers the parts of the OpenTelemetry span interface used by this module
+    
+    """
+    def __init__(self, name, attributes=None, parent=None):
+        self.name       = name
+        self.attributes = dict(attributes or {})
+        self.parent     = parent
+        self.children   = []
+        self.start      = time.time()
+        self.duration   = None
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+    def record_exception(self, exception, **kwargs):
+        self.attributes['exception'] = repr(exception)
+    def __str__(self):
+        return u'%s %.3fs %s' % (self.name, self.duration or 0.0, ' '.join('%s=%s' % i for i in sorted(self.attributes.items())))
+
+class SpanRecorder(object):
+    """.. _SpanRecorder:
+    
+    in-memory tracer implementing start_as_current_span() like an OpenTelemetry tracer, use it if there's no
+    OpenTelemetry setup, otherwise pass trace.get_tracer('device42api') as tracer to the Device42API
+    
+    >>> tracer = device42api.SpanRecorder()
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', noInit=True, tracer=tracer)
+    >>> racks = api.get_rack()
+    >>> print tracer.format(min_seconds=0.5)
+    Device42API.get_rack 90.412s device42.object.type=Device42API
+      HTTP GET 0.210s http.method=GET http.path=racks/ http.status_code=200 http.template=racks/
+      Rack.load 88.102s device42.object.id=80 device42.object.name=TestRack1 device42.object.type=Rack
+        Device.load 61.532s device42.object.id=156 device42.object.name=TestDevice device42.object.type=Device
+          Device42API.get_macid_byAddress 61.001s device42.object.type=Device42API
+            HTTP GET 61.000s http.method=GET http.path=macs/ http.status_code=200 http.template=macs/
+    
+    """
+    def __init__(self, max_traces=1000):
+        self._lock      = threading.Lock()
+        self._current   = contextvars.ContextVar('device42api_span', default=None)
+        self.traces     = deque(maxlen=max_traces)
+    @contextlib.contextmanager
+    def start_as_current_span(self, name, attributes=None, **kwargs):
+        parent  = self._current.get()
+        span    = Span(name, attributes, parent)
+        with self._lock:
+            if parent == None:  self.traces.append(span)
+            else:               parent.children.append(span)
+        token   = self._current.set(span)
+        start   = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            self._current.reset(token)
+    def format(self, span=None, min_seconds=0.0, indent=0):
+        """return the span trees (or the given span) as text, omitting subtrees faster than min_seconds"""
+        lines = []
+        for sp in ([span] if span != None else list(self.traces)):
+            if (sp.duration or 0.0) < min_seconds:  continue
+            lines.append(u'%s%s' % ('  ' * indent, sp))
+            for c in list(sp.children):
+                sub = self.format(c, min_seconds, indent + 1)
+                if sub:     lines.append(sub)
+        return u'\n'.join(lines)
+    def clear(self):
+        with self._lock:
+            self.traces.clear()
+
+class SlowRequestLog(object):
+    """.. _SlowRequestLog:
+    
+    keeps the last size requests slower than threshold seconds together with the object (class, name, id)
+    whose load()/save() issued them, optionally every entry is passed to a sink like log_sink()
+    
+    >>> slow = device42api.SlowRequestLog(threshold=2.0, size=500, sink=device42api.SlowRequestLog.log_sink())
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', slow_log=slow)
+    >>> racks = api.get_rack()
+    >>> slow.entries()[0]
+    {'time': 1396606606.7, 'method': 'GET', 'path': 'devices/id/156/?follow=yes', 'status': 200, 'seconds': 14.2,
+     'size': 2204133, 'object_type': 'Device', 'object_id': 156, 'object_name': 'TestDevice'}
+    
+    """
+    def __init__(self, threshold=1.0, size=1000, sink=None):
+        self.threshold  = float(threshold)
+        self.sink       = sink
+        self._lock      = threading.Lock()
+        self._entries   = deque(maxlen=int(size))
+    def record(self, method, path, status, seconds, size=0, obj=None):
+        """store the request if it exceeded the threshold, return True if it was stored"""
+        if seconds < self.threshold:    return False
+        entry = dict(time=time.time(), method=method, path=path, status=status, seconds=seconds, size=size,
+                     object_type=None, object_id=None, object_name=None)
+        if obj != None:
+            entry['object_type']    = obj.__class__.__name__
+            entry['object_id']      = obj.__object_id__()
+            entry['object_name']    = obj.__object_name__()
+        with self._lock:
+            self._entries.append(entry)
+        if self.sink != None:
+            self.sink(entry)
+        return True
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    @staticmethod
+    def log_sink(logger=None, level=logging.WARNING):
+        """return a sink writing every entry as JSON to logger (default device42api), the entry is also attached as extra"""
+        logger = logger or logging.getLogger('device42api')
+        def sink(entry):
+            logger.log(level, u'slow request %s', json.dumps(entry), extra=dict(device42=entry))
+        return sink
+
+class SingleFlight(object):
+    """.. _SingleFlight:
+    
+    coalesces identical calls which are in flight at the same time, the first caller executes the call
+    and every caller arriving before it returned waits for its result and gets a copy of it, if the first
+    caller runs out of its deadline the waiters call again with their own
+    
+    >>> sf = device42api.SingleFlight()
+    >>> sf.do('macs/', lambda: api.__get_api__('macs/'))
+    {'macaddresses': [...]}
+    >>> sf.stats()
+    {'calls': 1, 'executed': 1, 'coalesced': 0, 'inflight': 0}
+    
+    .. note:: the waiting callers get deep copies of a snapshot taken before the first caller returns, so every caller may modify its result in place
+    
+    """
+    def __init__(self):
+        self._lock      = threading.Lock()
+        self._inflight  = {}
+        self.calls      = 0
+        self.executed   = 0
+        self.coalesced  = 0
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+        while True:
+            with self._lock:
+                call = self._inflight.get(key, None)
+                leader = call == None
+                if leader:
+                    call = self._inflight[key] = dict(event=threading.Event(), result=None, error=None, waiters=0)
+                    self.executed += 1
+                else:
+                    call['waiters'] += 1
+                    self.coalesced += 1
+            if leader:  break
+            # a waiter gives up at its own deadline, the leader keeps going for the others
+            if not call['event'].wait(remaining()):
+                raise Device42APITimeoutException(u'deadline exceeded waiting for %s' % key)
+            if isinstance(call['error'], Device42APITimeoutException):
+                # the leader ran out of its own time, this caller tries again with its own deadline
+                continue
+            if call['error'] != None:   raise call['error']
+            return copy.deepcopy(call['result'])
+        try:
+            result = fn()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            # no waiter joins any more, they copy a snapshot taken before the leader's caller modifies the result
+            if call['error'] == None and call['waiters']:
+                try:
+                    call['result'] = copy.deepcopy(result)
+                except Exception as e:
+                    call['error'] = e
+            call['event'].set()
+        return result
+    def stats(self):
+        with self._lock:
+            return dict(calls=self.calls, executed=self.executed, coalesced=self.coalesced, inflight=len(self._inflight))
+
+class _Attempt(object):
+    """one of the two requests of a hedged GET, abort() shuts down its connection so the request fails
+    instead of waiting for a response nobody needs"""
+    def __init__(self):
+        self._lock      = threading.Lock()
+        self.http       = None
+        self.aborted    = threading.Event()
+        self.done       = threading.Event()
+        self.result     = None
+        self.error      = None
+        self.record     = None
+    def attach(self, http):
+        with self._lock:
+            if self.aborted.is_set():
+                raise Device42APIObjectException(u'request aborted, another request answered first')
+            self.http = http
+    def detach(self):
+        """called before the httplib2.Http goes back to the pool, a shut down connection isn't reused"""
+        with self._lock:
+            if self.aborted.is_set() and self.http != None:
+                for conn in self.http.connections.values():
+                    conn.close()
+            self.http = None
+    def abort(self):
+        with self._lock:
+            self.aborted.set()
+            if self.http == None:   return
+            for conn in self.http.connections.values():
+                if conn.sock == None:   continue
+                try:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+class Hedge(object):
+    """.. _Hedge:
+    
+    hedging policy for the idempotent GET requests of a Device42API, if no response arrived after the
+    q latency percentile of the endpoint (estimated from api.metrics, clamped to min_delay..max_delay,
+    max_delay until min_samples requests of the endpoint were recorded) an identical request is sent and
+    the first response wins, the connection of the other request is shut down
+    
+    the original request runs on the calling thread, only the hedges run on up to workers threads, a timer
+    thread sends them, api.metrics records the winning request only, requests of a custom transport
+    aren't hedged as their connections can't be shut down
+    
+    at most budget (fraction of the GET requests) are hedged, hedges suppressed by the budget are counted
+    
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme',
+    ...                               hedge=device42api.Hedge(q=0.95, budget=0.05))
+    >>> api.hedge_stats()
+    {'requests': 2000, 'hedged': 61, 'won': 48, 'suppressed': 3}
+    
+    """
+    def __init__(self, q=0.95, min_delay=0.01, max_delay=1.0, budget=0.05, min_samples=20, workers=32):
+        self.q          = q
+        self.min_delay  = min_delay
+        self.max_delay  = max_delay
+        self.budget     = budget
+        self.min_samples = min_samples
+        self.workers    = int(workers)
+        self._lock      = threading.Lock()
+        self._cond      = threading.Condition(self._lock)
+        self._pool      = None
+        self._timer     = None
+        self._timers    = []
+        self._seq       = itertools.count()
+        self.requests   = 0
+        self.hedged     = 0
+        self.won        = 0
+        self.suppressed = 0
+    def delay(self, metrics, path):
+        """return the seconds to wait for a response of path before hedging"""
+        if metrics.count('GET', path) < self.min_samples:   return self.max_delay
+        p = metrics.percentile('GET', path, self.q)
+        if p == None:   return self.max_delay
+        return min(max(p, self.min_delay), self.max_delay)
+    def __allow__(self):
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                self.suppressed += 1
+                return False
+            self.hedged += 1
+            return True
+    def __submit__(self, context, fn, *args):
+        with self._lock:
+            if self._pool == None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='device42api-hedge')
+        # the hedge runs in a copy of the callers context, deadline and tracing span are kept
+        return self._pool.submit(context.run, fn, *args)
+    def __schedule__(self, delay, fn):
+        """call fn on the timer thread after delay seconds"""
+        with self._cond:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._seq), fn))
+            if self._timer == None:
+                self._timer = threading.Thread(target=self.__timers__, name='device42api-hedge-timer', daemon=True)
+                self._timer.start()
+            self._cond.notify()
+    def __timers__(self):
+        while True:
+            with self._cond:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    self._cond.wait(self._timers[0][0] - time.monotonic() if self._timers else None)
+                due, seq, fn = heapq.heappop(self._timers)
+            fn()
+    def __run__(self, api, url, attempt, race, other):
+        """send the request of attempt, the first one answering wins and aborts the other one"""
+        token = _attempt.set(attempt)
+        try:
+            attempt.result = api.__request__(url, 'GET')
+        except Exception as e:
+            attempt.error = e
+        finally:
+            _attempt.reset(token)
+        with race['lock']:
+            won = attempt.error == None and race['winner'] == None
+            if won:     race['winner'] = attempt
+        if won:     other.abort()
+        attempt.done.set()
+    def request(self, api, url):
+        """send GET url through api.__request__, hedged if it's slower than the delay of its endpoint"""
+        path = api.__path__(url)
+        with self._lock:
+            self.requests += 1
+        if api._transport != None:
+            return api.__request__(url, 'GET')
+        delay, left = self.delay(api.metrics, path), remaining()
+        if left != None:    delay = max(min(delay, left), 0)
+        primary, hedge = _Attempt(), _Attempt()
+        race    = dict(lock=threading.Lock(), winner=None, closed=False, hedged=False)
+        context = contextvars.copy_context()
+        def fire():
+            with race['lock']:
+                if race['closed']:  return
+            if not self.__allow__():    return
+            with race['lock']:
+                if race['closed']:  return
+                race['hedged'] = True
+            api.metrics.record_hedge('GET', path)
+            self.__submit__(context, self.__run__, api, url, hedge, race, primary)
+        self.__schedule__(delay, fire)
+        self.__run__(api, url, primary, race, hedge)
+        with race['lock']:
+            race['closed'] = True
+            hedged, winner = race['hedged'], race['winner']
+        if winner == None and hedged:
+            # the original request failed, the hedge might still answer
+            hedge.done.wait(remaining())
+            winner = race['winner']
+        if winner is hedge:
+            with self._lock:
+                self.won += 1
+            api.metrics.record_hedge('GET', path, won=True)
+        attempt = winner or primary
+        if attempt.record != None:  api.metrics.record(*attempt.record)
+        if attempt.error != None:   raise attempt.error
+        return attempt.result
+    def stats(self):
+        with self._lock:
+            return dict(requests=self.requests, hedged=self.hedged, won=self.won, suppressed=self.suppressed)
+
+class WriteBehind(object):
+    """.. _WriteBehind:
+
+    write-behind queue for the POST and PUT requests of a Device42API, save() and add_customField() return a
+    concurrent.futures.Future instead of the response, the request waits window seconds for further changes
+    of the same object, these are merged into it (later values win) and sent as one request, at most workers
+    requests are sent at the same time
+
+    writes are the same object if they have the type and the API id, without an id the identity attributes
+    of the class (_identity_attrs, name for a Device, type, name and content for a IPAM_DNSRecord, ...),
+    objects without either are only merged with themselves, requests without object with identical ones
+
+    the future of every merged call gets the one response, failed responses and exceptions are passed to
+    on_error(method, path, body, response or exception), ids of created objects are set when the response
+    arrives, writes of different objects aren't ordered, flush() before a write depending on another one
+
+    >>> wb  = device42api.WriteBehind(window=2.0, workers=4, on_error=lambda *a: log.warning('write failed: %s', a))
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', write_behind=wb)
+    >>> for fact in facts:
+    ...     setattr(device, fact.name, fact.value)
+    ...     device.save()
+    <Future at 0x7f2b0c1d5e80 state=pending>
+    >>> wb.flush()
+    >>> api.write_behind_stats()
+    {'calls': 120, 'merged': 108, 'sent': 12, 'failed': 0, 'pending': 0}
+
+    .. attention:: GET requests don't see the queued changes, writes still queued when the process exits are lost, call close()
+
+    """
+    def __init__(self, window=1.0, workers=4, on_error=None):
+        self.window     = window
+        self.workers    = int(workers)
+        self.on_error   = on_error
+        self._cond      = threading.Condition()
+        self._pending   = {}
+        self._inflight  = set()
+        self._thread    = None
+        self._pool      = None
+        self._closed    = False
+        self.calls      = 0
+        self.merged     = 0
+        self.sent       = 0
+        self.failed     = 0
+    def __key__(self, method, path, body, obj):
+        if obj == None:
+            return (method, path, None, tuple(sorted(body.items())))
+        if obj.__object_id__() != None:
+            return (method, path, obj.__class__.__name__, 'id', obj.__object_id__())
+        values = tuple(getattr(obj, k, None) for k in obj._identity_attrs)
+        if not values or any(v == None or isinstance(v, (Required, Optional)) for v in values):
+            # nothing identifies the object, only its own writes are merged
+            return (method, path, obj.__class__.__name__, 'object', id(obj))
+        return (method, path, obj.__class__.__name__, 'identity', tuple(u'%s' % v for v in values))
+    def submit(self, api, method, path, v, body):
+        """queue a request and return the Future of its response"""
+        obj, future = _caller.get(), Future()
+        key = self.__key__(method, path, body, obj)
+        with self._cond:
+            if self._closed:
+                raise Device42APIObjectException(u'write-behind queue is closed')
+            self.calls += 1
+            entry = self._pending.get(key, None)
+            if entry != None:
+                self.merged += 1
+                entry['body'].update(body)
+            else:
+                entry = self._pending[key] = dict(api=api, method=method, path=path, v=v, body=dict(body),
+                                                  due=time.monotonic() + self.window, objects=[], futures=[])
+            if obj != None and not any(o is obj for o in entry['objects']):
+                entry['objects'].append(obj)
+            entry['futures'].append(future)
+            if self._thread == None:
+                self._pool   = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='device42api-write-behind')
+                self._thread = threading.Thread(target=self.__run__, name='device42api-write-behind', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+    def __run__(self):
+        with self._cond:
+            while not (self._closed and not self._pending):
+                now, due = time.monotonic(), None
+                # a key is sent again only after its previous request returned, the writes of an object stay ordered
+                for key, entry in list(self._pending.items()):
+                    if key in self._inflight:   continue
+                    if entry['due'] <= now:
+                        del self._pending[key]
+                        self._inflight.add(key)
+                        self._pool.submit(self.__send__, key, entry)
+                    elif due == None or entry['due'] < due:
+                        due = entry['due']
+                self._cond.wait(None if due == None else due - now)
+    def __send__(self, key, entry):
+        def send():
+            _caller.set(entry['objects'][-1] if entry['objects'] else None)
+            _write_behind.set(True)
+            return entry['api'].__send_api__(entry['method'], entry['path'], entry['v'], entry['body'])
+        rsp, error = None, None
+        try:
+            # a fresh context, the deadline of the first caller doesn't apply to the merged request
+            rsp = contextvars.Context().run(send)
+        except Exception as e:
+            error = e
+        ok = error == None and isinstance(rsp, dict) and rsp.get('code', 1) == 0
+        if ok:
+            msg = rsp.get('msg', None)
+            for obj in entry['objects']:
+                if isinstance(obj, CustomField) or obj.__object_id__() != None:     continue
+                if isinstance(msg, list) and len(msg) > 2 and msg[-2] == True:
+                    setattr(obj, obj._id_attrs[0], msg[1])
+        with self._cond:
+            self._inflight.discard(key)
+            self.sent += 1
+            if not ok:  self.failed += 1
+            self._cond.notify_all()
+        if not ok and self.on_error != None:
+            try:
+                self.on_error(entry['method'], entry['path'], entry['body'], error if error != None else rsp)
+            except Exception:
+                logging.getLogger('device42api').exception(u'write-behind on_error callback failed')
+        for f in entry['futures']:
+            if error != None:   f.set_exception(error)
+            else:               f.set_result(rsp)
+    def flush(self, timeout=None):
+        """send the queued requests now and wait until all are answered, return False if timeout passed first"""
+        end = time.monotonic() + timeout if timeout != None else None
+        with self._cond:
+            for entry in self._pending.values():
+                entry['due'] = 0
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                left = end - time.monotonic() if end != None else None
+                if left != None and left <= 0:  return False
+                self._cond.wait(left)
+        return True
+    def close(self):
+        """send the queued requests, wait for them and stop the writer, later writes raise"""
+        with self._cond:
+            self._closed = True
+        self.flush()
+        if self._thread != None:
+            self._thread.join()
+            self._pool.shutdown()
+    def stats(self):
+        with self._cond:
+            return dict(calls=self.calls, merged=self.merged, sent=self.sent, failed=self.failed,
+                        pending=len(self._pending) + len(self._inflight))
 
 class Device42APIObject(object):
     """.. _Device42APIObject:
@@ -21,6 +601,10 @@ class Device42APIObject(object):
     * get_json()
     
     """
+    _id_attrs   = ('id',)
+    _json_keys  = ()
+    # attributes identifying an object without its id, the API adds or updates by them
+    _identity_attrs = ()
     def __init__(self, json=None, parent=None, api=None):
         self.api            = api
         self._json          = json
@@ -42,10 +626,40 @@ class Device42APIObject(object):
         raise Device42APIObjectException(u'need to implement get_json')
     def load(self):
         raise Device42APIObjectException(u'need to implement load')
+    def __object_id__(self):
+        """return the API id of the object or None if unknown"""
+        for k in self._id_attrs:
+            v = self.__dict__.get(k, None)
+            if v != None and not isinstance(v, (Required, Optional)):  return v
+        return None
+    def __object_name__(self):
+        v = self.__dict__.get('name', None)
+        if v == None or isinstance(v, (Required, Optional)):   return None
+        return u'%s' % v
+    def __child__(self, lazy=False, partial=False):
+        """return self loaded or as LazyObject proxy serving the summary json it was created from,
+        with partial=True a child whose load runs out of time is returned with its summary only"""
+        if lazy:
+            return LazyObject(self, self.__summary__())
+        try:
+            self.load()
+        except Device42APITimeoutException:
+            if not partial:     raise
+        return self
+    def __summary__(self):
+        return self._json.keys()
+    def __values__(self):
+        """return every set attribute of _json_keys converted like get_json() does, not only the changed ones"""
+        values = {}
+        for k in self._json_keys:
+            v = getattr(self, k, None)
+            if v == None or isinstance(v, (Required, Optional)):   continue
+            values[k] = v if isinstance(v, int) else str(v)
+        return values
     def __get_json_validator__(self, keys=[]):
         for k in keys:
             v = getattr(self, k)
-            if isinstance(v, Optional):  continue
+            if isinstance(v, (Required, Optional)):  continue
             if k in self._json and self._json[k] != v:
                 if not isinstance(v, int):
                     self.json[k] = str(v)
@@ -59,7 +673,7 @@ class Device42APIObject(object):
         for k in self._json.keys():
             try:
                 v = getattr(self, k)
-                if isinstance(v, Optional):  continue
+                if isinstance(v, (Required, Optional)):  continue
                 if self._json[k] != v:
                     if not isinstance(v, int):
                         self.json[k] = str(v)
@@ -67,6 +681,359 @@ class Device42APIObject(object):
                         self.json[k] = v
             except AttributeError:  continue
 
+class JSONDecoder(object):
+    """.. _JSONDecoder:
+    
+    decodes response bodies straight from the bytes returned by the transport and accounts the time spent
+    decoding, subclass and implement loads() to plug in another parser
+    
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', decoder='orjson')
+    >>> api.get_rack()
+    >>> api.decode_stats()
+    {'decoder': 'orjson', 'calls': 3, 'bytes': 1833204, 'decode_seconds': 0.0121, 'requests': 3, 'network_seconds': 1.532}
+    
+    """
+    name    = None
+    def __init__(self):
+        self._lock      = threading.Lock()
+        self.calls      = 0
+        self.bytes      = 0
+        self.seconds    = 0.0
+    def loads(self, data):
+        raise Device42APIObjectException(u'need to implement loads')
+    def decode(self, data):
+        start = time.perf_counter()
+        try:
+            return self.loads(data)
+        finally:
+            self.record(len(data), time.perf_counter() - start)
+    def record(self, size, seconds):
+        """account one decoded response, JSONArrayStream calls it once for all items of a stream"""
+        with self._lock:
+            self.calls   += 1
+            self.bytes   += size
+            self.seconds += seconds
+    def stats(self):
+        with self._lock:
+            return dict(decoder=self.name, calls=self.calls, bytes=self.bytes, decode_seconds=self.seconds)
+
+class SimplejsonDecoder(JSONDecoder):
+    name    = 'simplejson'
+    def loads(self, data):
+        return json.loads(data)
+
+class StdlibDecoder(JSONDecoder):
+    name    = 'json'
+    def loads(self, data):
+        return stdjson.loads(data)
+
+class OrjsonDecoder(JSONDecoder):
+    name    = 'orjson'
+    def loads(self, data):
+        return orjson.loads(data)
+
+def get_decoder(name=None):
+    """return a JSONDecoder instance, name is one of orjson, simplejson, json or None for the fastest installed"""
+    if isinstance(name, JSONDecoder):   return name
+    if name == None:
+        name = 'orjson' if orjson != None else 'simplejson'
+    if name == 'orjson':
+        if orjson == None:  raise Device42APIObjectException(u'orjson is not installed')
+        return OrjsonDecoder()
+    elif name == 'simplejson':
+        return SimplejsonDecoder()
+    elif name == 'json':
+        return StdlibDecoder()
+    raise Device42APIObjectException(u'unknown decoder "%s"' % name)
+
+class RequestMetrics(object):
+    """.. _RequestMetrics:
+    
+    per endpoint template request metrics of a Device42API, ids and names in the path are collapsed
+    (devices/id/156/?follow=yes becomes devices/id/{id}/), latencies are kept as histogram
+    
+    >>> api.metrics.snapshot()['GET devices/id/{id}/']
+    {'method': 'GET', 'template': 'devices/id/{id}/', 'count': 12, 'errors': 0, 'hedges': 1, 'hedges_won': 1, 'seconds': 1.92,
+     'decode_seconds': 0.004, 'bytes_in': 48211, 'bytes_out': 0, 'status': {200: 12}, 'buckets': [0, 0, 0, 0, 3, 9, 0, 0, 0, 0, 0, 0]}
+    >>> print api.metrics.prometheus()
+    # TYPE device42api_requests_total counter
+    device42api_requests_total{method="GET",template="devices/id/{id}/",status="200"} 12
+    ...
+    
+    """
+    buckets     = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+    _id         = re.compile(r'^\d+$')
+    def __init__(self):
+        self._lock      = threading.Lock()
+        self._endpoints = {}
+    def template(self, path):
+        """collapse ids, names and serials of a path into placeholders"""
+        path, sep, query = path.partition('?')
+        parts = path.split('/')
+        for i, p in enumerate(parts):
+            if self._id.match(p):
+                parts[i] = '{id}'
+            elif i > 0 and parts[i - 1] in ('name', 'serial') and p != '':
+                parts[i] = '{%s}' % parts[i - 1]
+        return '/'.join(parts)
+    def __endpoint__(self, method, path):
+        template = self.template(path)
+        key = '%s %s' % (method, template)
+        e = self._endpoints.get(key, None)
+        if e == None:
+            e = self._endpoints[key] = dict(method=method, template=template, count=0, errors=0,
+                                            hedges=0, hedges_won=0, seconds=0.0, decode_seconds=0.0, bytes_in=0, bytes_out=0, status={},
+                                            buckets=[0] * len(self.buckets))
+        return e
+    def record(self, method, path, status, seconds, bytes_in=0, bytes_out=0):
+        with self._lock:
+            e = self.__endpoint__(method, path)
+            e['count']      += 1
+            e['seconds']    += seconds
+            e['bytes_in']   += bytes_in
+            e['bytes_out']  += bytes_out
+            e['status'][status] = e['status'].get(status, 0) + 1
+            if status >= 400 or status == 0:    e['errors'] += 1
+            for i, b in enumerate(self.buckets):
+                if seconds <= b:
+                    e['buckets'][i] += 1
+                    break
+    def record_decode(self, method, path, seconds):
+        with self._lock:
+            self.__endpoint__(method, path)['decode_seconds'] += seconds
+    def record_hedge(self, method, path, won=False):
+        with self._lock:
+            e = self.__endpoint__(method, path)
+            if won:     e['hedges_won'] += 1
+            else:       e['hedges'] += 1
+    def count(self, method, path):
+        """return the number of requests recorded for the endpoint of path"""
+        with self._lock:
+            e = self._endpoints.get('%s %s' % (method, self.template(path)), None)
+            return 0 if e == None else e['count']
+    def percentile(self, method, path, q):
+        """estimate the q (0..1) latency percentile of an endpoint from its histogram, None if nothing recorded"""
+        with self._lock:
+            e = self._endpoints.get('%s %s' % (method, self.template(path)), None)
+            if e == None or e['count'] == 0:    return None
+            rank, seen = q * e['count'], 0
+            for i, n in enumerate(e['buckets']):
+                seen += n
+                if seen >= rank:    return self.buckets[i]
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+    def snapshot(self):
+        """return a copy of all endpoint metrics keyed by "METHOD template\""""
+        with self._lock:
+            snap = {}
+            for k, e in self._endpoints.items():
+                snap[k] = dict(e, status=dict(e['status']), buckets=list(e['buckets']))
+            return snap
+    def prometheus(self, prefix='device42api'):
+        """return the metrics in the Prometheus text exposition format"""
+        lines = ['# TYPE %s_requests_total counter' % prefix]
+        snap  = sorted(self.snapshot().values(), key=lambda e: (e['template'], e['method']))
+        for e in snap:
+            for status, n in sorted(e['status'].items()):
+                lines.append('%s_requests_total{method="%s",template="%s",status="%s"} %s' % (prefix, e['method'], e['template'], status, n))
+        for name in ('hedges', 'hedges_won', 'bytes_in', 'bytes_out', 'decode_seconds'):
+            lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+            for e in snap:
+                lines.append('%s_%s_total{method="%s",template="%s"} %s' % (prefix, name, e['method'], e['template'], e[name]))
+        lines.append('# TYPE %s_request_seconds histogram' % prefix)
+        for e in snap:
+            labels, total = 'method="%s",template="%s"' % (e['method'], e['template']), 0
+            for b, n in zip(self.buckets, e['buckets']):
+                total += n
+                le = '+Inf' if b == float('inf') else repr(b)
+                lines.append('%s_request_seconds_bucket{%s,le="%s"} %s' % (prefix, labels, le, total))
+            lines.append('%s_request_seconds_sum{%s} %s' % (prefix, labels, e['seconds']))
+            lines.append('%s_request_seconds_count{%s} %s' % (prefix, labels, e['count']))
+        return '\n'.join(lines) + '\n'
+
+class JSONArrayStream(object):
+    """.. _JSONArrayStream:
+    
+    incremental parser for collection responses like {"macaddresses": [{...}, {...}], ...}, the items of the
+    array stored at key are yielded one by one while the byte chunks are consumed, so memory is bounded by
+    a single item instead of the whole response
+    
+    the end of an item is scanned for once, the scan continues where it stopped when a chunk ends inside the
+    item, the complete item is then parsed by the loads() of decoder (a JSONDecoder, the stdlib json without)
+    which accounts the whole stream as one decoded response
+    
+    >>> chunks = [b'{"total_count": 2, "macaddr', b'esses": [{"macaddress": "00:00:00:00:00:01"}, {"mac', b'address": "00:00:00:00:00:02"}]}']
+    >>> for m in device42api.JSONArrayStream(chunks, 'macaddresses', device42api.get_decoder()):
+    ...     print m['macaddress']
+    00:00:00:00:00:01
+    00:00:00:00:00:02
+    
+    """
+    # the characters ending or nesting a value outside of strings, at the top level and nested
+    _top        = re.compile(r'["{}\[\],\s]')
+    _nested     = re.compile(r'["{}\[\]]')
+    _string     = re.compile(r'["\\]')
+    def __init__(self, chunks, key, decoder=None):
+        self._chunks    = iter(chunks)
+        self._key       = key
+        self._utf8      = codecs.getincrementaldecoder('utf-8')()
+        self._decoder   = decoder
+        self._loads     = decoder.loads if decoder != None else stdjson.loads
+        self._buf       = u''
+        self._pos       = 0
+        self._eof       = False
+        self.decoded    = 0
+        self.decode_seconds = 0.0
+    def __more__(self, size=0):
+        """append at least size characters (one chunk at least) to the buffer, an item spanning many chunks
+        is copied a logarithmic number of times"""
+        if self._eof:   return False
+        parts, n = [], 0
+        while not self._eof and (not parts or n < size):
+            try:
+                data = self._utf8.decode(next(self._chunks))
+            except StopIteration:
+                data = self._utf8.decode(b'', True)
+                self._eof = True
+            parts.append(data)
+            n += len(data)
+        self._buf = self._buf[self._pos:] + u''.join(parts)
+        self._pos = 0
+        return True
+    def __peek__(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in u' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buf):  return self._buf[self._pos]
+            if not self.__more__():         return None
+    def __expect__(self, chars):
+        c = self.__peek__()
+        if c == None or c not in chars:
+            raise ValueError(u'expected one of "%s" got "%s" in stream of "%s"' % (chars, c, self._key))
+        self._pos += 1
+        return c
+    def __text__(self):
+        """return the text of the next value, without parsing it"""
+        if self.__peek__() == None:
+            raise ValueError(u'unexpected end of stream of "%s"' % self._key)
+        i, depth, string = self._pos, 0, False
+        while True:
+            m = (self._string if string else self._nested if depth else self._top).search(self._buf, i)
+            if m != None:
+                i, c = m.start(), m.group()
+                if string:
+                    if c == u'"':
+                        string = False
+                        i += 1
+                        if depth == 0:  break
+                        continue
+                    # skip the escaped character, unless it's in the next chunk
+                    if i + 1 < len(self._buf):
+                        i += 2
+                        continue
+                elif c == u'"':
+                    string = True
+                    i += 1
+                    continue
+                elif c in u'{[':
+                    depth += 1
+                    i += 1
+                    continue
+                elif c in u'}]' and depth:
+                    depth -= 1
+                    i += 1
+                    if depth == 0:  break
+                    continue
+                else:
+                    # the end of a number or literal
+                    break
+            else:
+                i = len(self._buf)
+            offset = i - self._pos
+            if not self.__more__(offset):
+                if depth == 0 and not string and offset > 0:    break
+                raise ValueError(u'unexpected end of stream of "%s"' % self._key)
+            i = self._pos + offset
+        text, self._pos = self._buf[self._pos:i], i
+        return text
+    def __load__(self, text):
+        start = time.perf_counter()
+        try:
+            return self._loads(text)
+        finally:
+            self.decoded        += len(text)
+            self.decode_seconds += time.perf_counter() - start
+    def __iter__(self):
+        try:
+            self.__expect__(u'{')
+            if self.__peek__() == u'}':     return
+            while True:
+                k = stdjson.loads(self.__text__())
+                self.__expect__(u':')
+                if k == self._key and self.__peek__() == u'[':
+                    self._pos += 1
+                    if self.__peek__() == u']':
+                        self._pos += 1
+                    else:
+                        while True:
+                            yield self.__load__(self.__text__())
+                            if self.__expect__(u',]') == u']':  break
+                else:
+                    self.__text__()
+                if self.__expect__(u',}') == u'}':  return
+        finally:
+            if self._decoder != None:
+                self._decoder.record(self.decoded, self.decode_seconds)
+
+class LazyObject(object):
+    """.. _LazyObject:
+    
+    proxy for a child object (Device, Asset, Rack, IPAM_macaddress) holding the summary json embedded in
+    its parent, attributes contained in the summary are served without any request, the full object is
+    fetched (default is obj.load()) on first access of any other attribute
+    
+    >>> rack = api.get_rack('TestRack1', lazy=True)[0]
+    >>> [d.name for d in rack.devices.values()]     # served from the rack summary
+    ['Test Device']
+    >>> rack.devices[1.0].ip_addresses               # now the device is loaded
+    [<device42api.IPAM_ipaddress object at 0x26a0e10>]
+    >>> isinstance(rack.devices[1.0], device42api.Device)
+    True
+    
+    """
+    def __init__(self, obj, summary=(), loader=None):
+        object.__setattr__(self, '_lazy_obj', obj)
+        object.__setattr__(self, '_lazy_summary', frozenset(summary))
+        object.__setattr__(self, '_lazy_loader', loader)
+        object.__setattr__(self, '_lazy_loaded', False)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+    def __resolve__(self):
+        """load the full object if not done yet and return it"""
+        if self._lazy_loaded:   return self._lazy_obj
+        with self._lazy_lock:
+            if not self._lazy_loaded:
+                if self._lazy_loader != None:
+                    obj = self._lazy_loader(self._lazy_obj)
+                    if obj:     object.__setattr__(self, '_lazy_obj', obj)
+                else:
+                    self._lazy_obj.load()
+                object.__setattr__(self, '_lazy_loaded', True)
+        return self._lazy_obj
+    @property
+    def __class__(self):
+        return self._lazy_obj.__class__
+    def __getattr__(self, k):
+        if not self._lazy_loaded and k in self._lazy_summary:
+            return getattr(self._lazy_obj, k)
+        return getattr(self.__resolve__(), k)
+    def __setattr__(self, k, v):
+        setattr(self.__resolve__(), k, v)
+    def __str__(self):
+        return self._lazy_obj.__str__()
+    def __repr__(self):
+        return u'<device42api.LazyObject %s loaded=%s>' % (self._lazy_obj.__class__.__name__, self._lazy_loaded)
+
 class CustomField(Device42APIObject):
     """.. _CustomField:
     
@@ -85,6 +1052,10 @@ class CustomField(Device42APIObject):
     {'msg': ['custom key pair values added or updated', 1, 'Building with CustomFields'], 'code': 0}
     
     """
+    _json_keys  = ('name', 'key', 'type', 'value', 'value2', 'notes')
+    # a custom field has no id of its own, the id set by add_customField is the one of its object
+    _id_attrs   = ()
+    _identity_attrs = ('name', 'key')
     def __init__(self, json=None, parent=None, api=None):
         self.name       = Required()
         self.key        = Required()
@@ -93,6 +1064,7 @@ class CustomField(Device42APIObject):
         self.value2     = Optional()
         self.notes      = Optional()
         super(CustomField, self).__init__(json, parent, api)
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__put_api__('custom_fields/%s/' % self._api_path, body=self.get_json())
@@ -104,7 +1076,7 @@ class CustomField(Device42APIObject):
         for attr in ('name', 'key'):
             if isinstance(getattr(self, attr), Required):
                 raise Device42APIObjectException(u'required Attribute "%s" not set' % attr)
-        self.__get_json_validator__(('name', 'key', 'type', 'value', 'value2', 'notes'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class CustomFieldDevice(CustomField):
@@ -116,6 +1088,7 @@ class CustomFieldDevice(CustomField):
     def __init__(self, json=None, parent=None, api=None):
         super(CustomFieldDevice, self).__init__(json, parent, api)
         self._api_path  = 'device/custom_field'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__put_api__(self._api_path, body=self.get_json())
@@ -138,6 +1111,9 @@ class Building(Device42APIObject):
     {'msg': ['Building added/updated successfully', 3, 'TestBuilding', True, True], 'code': 0}
 
     """
+    _id_attrs   = ('building_id', 'id')
+    _json_keys  = ('name', 'address', 'contact_name', 'contact_phone', 'notes')
+    _identity_attrs = ('name',)
     def __init__(self, json=None, parent=None, api=None):
         self.name           = Required()
         self.address        = Optional()
@@ -169,6 +1145,7 @@ class Building(Device42APIObject):
         return rsp
     def __str__(self):
         return u'%s %s' % (self.name, self.address)
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -179,7 +1156,7 @@ class Building(Device42APIObject):
     def get_json(self):
         if isinstance(self.name, Required):
             raise Device42APIObjectException(u'required Attribute "name" not set')
-        self.__get_json_validator__(('name', 'address', 'contact_name', 'contact_phone', 'notes'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class Room(Device42APIObject):
@@ -197,6 +1174,9 @@ class Room(Device42APIObject):
     {'msg': ['Room added/updated successfully', 2, 'Test Room', True, True], 'code': 0}
 
     """
+    _id_attrs   = ('room_id', 'id')
+    _json_keys  = ('name', 'building', 'building_id', 'notes')
+    _identity_attrs = ('name',)
     def __init__(self, json=None, parent=None, api=None):
         self.name           = Required()
         self.building_id    = Required()
@@ -209,6 +1189,7 @@ class Room(Device42APIObject):
         self._api_path      = 'rooms'
     def __str__(self):
         return u'%s %s' % (self.name)
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -237,7 +1218,8 @@ class Room(Device42APIObject):
             if rsp['code'] == 0:
                 self.custom_fields.append(cf)
         return rsp
-    def load(self):
+    @traced
+    def load(self, lazy=False, deadline=None, partial=False):
         """get entries for room from API
         
         >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme')
@@ -248,26 +1230,29 @@ class Room(Device42APIObject):
         'coffee corner for sysadmins'
         >>> r.building
         'TestBuilding'
+        
+        with lazy=True devices, racks and assets are LazyObject proxies which are loaded on first access
+        of an attribute not contained in the room summary
+        
+        deadline is the budget in seconds for the room and all nested loads, once it's used up
+        Device42APITimeoutException is raised or, with partial=True, the remaining children keep their summary
+        
+        >>> r.load(deadline=2.0, partial=True)
 
         """
-        if self.api != None:
+        if self.api == None:    return
+        with self.api.deadline(deadline):
             json = self.api.__get_api__('rooms/%s' % self.room_id)
             for k in json.keys():
                 if k == 'devices':
                     for d in json[k]:
-                        d = Device(json=d, parent=self, api=self.api)
-                        d.load()
-                        self.devices.append(d)
+                        self.devices.append(Device(json=d, parent=self, api=self.api).__child__(lazy, partial))
                 elif k == 'racks':
                     for r in json[k]:
-                        r = Rack(json=r, parent=self, api=self.api)
-                        r.load()
-                        self.racks.append(r)
+                        self.racks.append(Rack(json=r, parent=self, api=self.api).__child__(lazy, partial))
                 elif k == 'assets':
                     for a in json[k]:
-                        a = Asset(json=a, parent=self, api=self.api)
-                        a.load()
-                        self.assets.append(a)
+                        self.assets.append(Asset(json=a, parent=self, api=self.api).__child__(lazy, partial))
                 else:
                     if json[k] != None:
                         setattr(self, k, json[k])
@@ -281,7 +1266,7 @@ class Room(Device42APIObject):
                     raise Device42APIObjectException(u'required Attribute "building_id" or Attribute "building" not set')
                 elif attr == 'name':
                     raise Device42APIObjectException(u'required Attribute "name" not set')
-        self.__get_json_validator__(('name', 'building', 'building_id', 'notes'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class Rack(Device42APIObject):
@@ -302,6 +1287,10 @@ class Rack(Device42APIObject):
     {'msg': ['rack added/updated.', 80, 'TestRack1', True, True], 'code': 0}
 
     """
+    _id_attrs   = ('rack_id', 'id')
+    _json_keys  = ('name', 'size', 'room', 'building', 'room_id', 'numbering_start_from_bottom', 'first_number',
+                   'row', 'manufacturer', 'notes')
+    _identity_attrs = ('name', 'room')
     def __init__(self, json=None, parent=None, api=None):
         self.name           = Required()
         self.size           = Required()
@@ -379,6 +1368,7 @@ class Rack(Device42APIObject):
             if rsp['msg'][-2] == True:
                 self.load()
         return rsp
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -390,10 +1380,10 @@ class Rack(Device42APIObject):
         for attr in ('name', 'size', 'room'):
             if isinstance(getattr(self, attr), Required):
                 raise Device42APIObjectException(u'required Attribute "%s" not set' % attr)
-        self.__get_json_validator__(('name', 'size', 'room', 'building', 'room_id', 'numbering_start_from_bottom', 'first_number',
-                  'row', 'manufacturer', 'notes'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
-    def load(self):
+    @traced
+    def load(self, lazy=False, deadline=None, partial=False):
         """get entries for rack from API
         
         >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme')
@@ -405,22 +1395,25 @@ class Rack(Device42APIObject):
         >>> r.devices
         {32.0: <device42api.Device object at 0x991cd0>, 36.0: <device42api.Device object at 0x991b50>, 6.0: <device42api.Device object at 0x9097d0>, 40.0: <device42api.Device object at 0x994d50>, 45.0: <device42api.Device object at 0x994f10>, 28.0: <device42api.Device object at 0x991b10>}
         
+        with lazy=True the rack costs one request, devices and assets are LazyObject proxies
+        
+        >>> r.load(lazy=True)
+        >>> [d.name for d in r.devices.values()]
+        ['Test Device', 'Test Device 2']
+        
+        deadline and partial work like in Room.load
+        
         """
-        if self.api != None:
+        if self.api == None:    return
+        with self.api.deadline(deadline):
             json = self.api.__get_api__('racks/%s' % self.rack_id)
             for k in json.keys():
                 if k == 'devices':
                     for d in json[k]:
-                        start_at = d['start_at']
-                        d = Device(json=d, parent=self, api=self.api)
-                        d.load()
-                        self.devices[start_at] = d
+                        self.devices[d['start_at']] = Device(json=d, parent=self, api=self.api).__child__(lazy, partial)
                 elif k == 'assets':
                     for a in json[k]:
-                        start_at = a['start_at']
-                        a = Asset(json=a, parent=self, api=self.api)
-                        a.load()
-                        self.assets[start_at] = a
+                        self.assets[a['start_at']] = Asset(json=a, parent=self, api=self.api).__child__(lazy, partial)
                 else:
                     if json[k] != None:
                         setattr(self, k, json[k])
@@ -466,6 +1459,11 @@ class Asset(Device42APIObject):
     {'msg': ['asset added/edited.', 1, ''], 'code': 0}
 
     """
+    _id_attrs   = ('asset_id', 'id')
+    _json_keys  = ('type', 'name', 'service_level', 'serial_no', 'asset_no', 'customer_id', 'location', 'notes',
+                   'building', 'vendor', 'imagefile_id', 'contract_id', 'rack_id', 'building', 'room', 'rack',
+                   'row', 'start_at', 'size', 'orientation', 'depth', 'patch_panel_model_id',
+                   'numbering_start_from')
     def __init__(self, json=None, parent=None, api=None):
         self.type           = Required()
         self.name           = Optional()
@@ -497,6 +1495,7 @@ class Asset(Device42APIObject):
         else:
             super(Asset, self).__init__(json, parent, api)
         self._api_path      = 'assets'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -507,21 +1506,21 @@ class Asset(Device42APIObject):
     def get_json(self):
         if isinstance(self.type, Required):
             raise Device42APIObjectException(u'required Attribute "type" not set')
-        self.__get_json_validator__(('type', 'name', 'service_level', 'serial_no', 'asset_no', 'customer_id', 'location',
-                  'notes', 'building', 'vendor', 'imagefile_id', 'contract_id', 'rack_id',
-                  'building', 'room', 'rack', 'row', 'start_at', 'size', 'orientation',
-                  'depth', 'patch_panel_model_id', 'numbering_start_from'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
+    @traced
     def load(self):
         """get entries for asset from API
         
         """
         if self.api != None:
-            json = self.api.__get_api__('assets/%s' % self.asset_id)
-            for k in json.keys():
-                if json[k] != None:
-                    setattr(self, k, json[k])
-            self._json = json
+            self.__apply__(self.api.__get_api__('assets/%s' % self.asset_id))
+    def __apply__(self, json):
+        """set the attributes of the asset from an asset response"""
+        for k in json.keys():
+            if json[k] != None:
+                setattr(self, k, json[k])
+        self._json = json
     def add_customField(self, cf=None):
         """add custom Fields to the object
         
@@ -567,6 +1566,13 @@ class Device(Device42APIObject):
     {'msg': ['device added or updated', 156, 'TestDevice', True, True], 'code': 0}
 
     """
+    _id_attrs   = ('device_id', 'id')
+    _json_keys  = ('name', 'serial_no', 'asset_no', 'manufacturer', 'hardware', 'type', 'service_level',
+                   'virtual_host', 'blade_host', 'slot_no', 'storage_room_id', 'storage_room', 'os', 'osver',
+                   'memory', 'cpucount', 'cpupower', 'cpucore', 'hddcount', 'hddsize', 'hddraid', 'hddraid_type',
+                   'devices', 'appcomps', 'customer', 'contract', 'aliases', 'notes', 'is_it_switch',
+                   'is_it_virtual_host', 'is_it_blade_host', 'uuid')
+    _identity_attrs = ('name',)
     def __init__(self, json=None, parent=None, api=None):
         self.name                   = Required()
         self.serial_no              = Optional()
@@ -610,6 +1616,9 @@ class Device(Device42APIObject):
             super(Device, self).__init__(json, parent, api)
             self._json              = dict()
         self._api_path              = 'device'
+    def __summary__(self):
+        return self._json.get('device', self._json).keys()
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, v=None, body=self.get_json())
@@ -618,7 +1627,8 @@ class Device(Device42APIObject):
                 if rsp['msg'][-2] == True:
                     self.device_id  = rsp['msg'][1]
             return rsp
-    def load(self):
+    @traced
+    def load(self, lazy=False):
         """
         get entries for asset from API
         
@@ -629,39 +1639,46 @@ class Device(Device42APIObject):
         >>> d.name, d.serial_no
         ('TestDevice', 'Ab123asd')
         
+        with lazy=True the macAddresses aren't resolved through get_macid_byAddress until an attribute
+        not contained in the device summary is accessed
+        
         """
         if self.api != None:
-            json = self.api.__get_api__('devices/id/%s/?follow=yes' % self.device_id)
-            # fix size changed during iteration with hack hw_model
-            json['hardware'] = ''
-            for k in json.keys():
-                if k == 'ip_addresses':
-                    ipaddresses = []
-                    for i in json['ip_addresses']:
-                        ip = IPAM_ipaddress(json=i, parent=self, api=self.api)
-                        ip.load()
-                        ipaddresses.append(ip)
-                    self.ip_addresses = ipaddresses
-                elif k == 'mac_addresses':
-                    for m in json['mac_addresses']:
-                        # it might be None
-                        if m:
-                            self.mac_addresses.append(self.api.get_macid_byAddress(m['mac']))
-                elif k == 'hw_model':
-                    setattr(self, 'hardware', json[k])
-                    # hack as hardware is returned as hw_model
-                    json['hardware'] = json[k]
-                else:
-                    if json[k] != None:
-                        setattr(self, k, json[k])
-            self._json = json
+            self.__apply__(self.api.__get_api__('devices/id/%s/?follow=yes' % self.device_id), lazy)
+    def __apply__(self, json, lazy=False):
+        """set the attributes, ip and mac addresses of the device from a device response"""
+        # fix size changed during iteration with hack hw_model
+        json['hardware'] = ''
+        for k in json.keys():
+            if k == 'ip_addresses':
+                ipaddresses = []
+                for i in json['ip_addresses']:
+                    ip = IPAM_ipaddress(json=i, parent=self, api=self.api)
+                    ip.load()
+                    ipaddresses.append(ip)
+                self.ip_addresses = ipaddresses
+            elif k == 'mac_addresses':
+                for m in json['mac_addresses']:
+                    # it might be None
+                    if not m:   continue
+                    if lazy:
+                        mac = IPAM_macaddress(json=dict(macaddress=m['mac']), parent=self, api=self.api)
+                        self.mac_addresses.append(LazyObject(mac, ('macaddress',),
+                                                             loader=lambda o: self.api.get_macid_byAddress(o.macaddress)))
+                    else:
+                        self.mac_addresses.append(self.api.get_macid_byAddress(m['mac']))
+            elif k == 'hw_model':
+                setattr(self, 'hardware', json[k])
+                # hack as hardware is returned as hw_model
+                json['hardware'] = json[k]
+            else:
+                if json[k] != None:
+                    setattr(self, k, json[k])
+        self._json = json
     def get_json(self):
         if isinstance(self.name, Required):
             raise Device42APIObjectException(u'required Attribute "name" not set')
-        self.__get_json_validator__(('name', 'serial_no', 'asset_no', 'manufacturer', 'hardware', 'type', 'service_level', 'virtual_host', 'blade_host', 'slot_no',
-                  'storage_room_id', 'storage_room', 'os', 'osver', 'memory', 'cpucount', 'cpupower', 'cpucore',
-                  'hddcount', 'hddsize', 'hddraid', 'hddraid_type', 'devices', 'appcomps',
-                  'customer', 'contract', 'aliases', 'notes', 'is_it_switch', 'is_it_virtual_host', 'is_it_blade_host', 'uuid'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
     def add_mac(self, macAddress=None, port_name=None):
         """.. _Device.add_mac:
@@ -682,7 +1699,8 @@ class Device(Device42APIObject):
             mc.port_name = port_name
         mc.device = self
         rsp = mc.save()
-        if rsp['msg'][-2] == True:
+        # queued by a WriteBehind rsp is the Future of the response, it's returned as is
+        if isinstance(rsp, dict) and rsp['msg'][-2] == True:
             mc.macaddress_id = rsp['msg'][1]
             self.mac_addresses.append(mc)
             return True
@@ -716,7 +1734,8 @@ class Device(Device42APIObject):
         ip.device = self.name
         ip.type = 'static'
         rsp = ip.save()
-        if rsp['msg'][-2] == True:
+        # queued by a WriteBehind rsp is the Future of the response, it's returned as is
+        if isinstance(rsp, dict) and rsp['msg'][-2] == True:
             ip.ipaddress_id = rsp['msg'][1]
             self.ip_addresses.append(ip)
             return True
@@ -761,6 +1780,10 @@ class Hardware(Device42APIObject):
     {'msg': ['hardware model added or updated', 25, 'TestHardware', True, True], 'code': 0}
     
     """
+    _id_attrs   = ('hardware_id', 'id')
+    _json_keys  = ('name', 'type', 'size', 'depth', 'blade_size', 'part_no', 'watts', 'spec_url', 'manufacturer',
+                   'front_image_id', 'back_image_id', 'notes')
+    _identity_attrs = ('name',)
     def __init__(self, json=None, parent=None, api=None):
         self.name           = Required()
         self.type           = Optional() # 1=Regular,2=Blade,3=Other
@@ -776,6 +1799,7 @@ class Hardware(Device42APIObject):
         self.notes          = Optional()
         super(Hardware, self).__init__(json, parent, api)
         self._api_path      = 'hardwares'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -786,8 +1810,7 @@ class Hardware(Device42APIObject):
     def get_json(self):
         if isinstance(self.name, Required):
             raise Device42APIObjectException(u'required Attribute "name" not set')
-        self.__get_json_validator__(('name', 'type', 'size', 'depth', 'blade_size', 'part_no', 'watts', 'spec_url', 'manufacturer', 'front_image_id',
-                  'back_image_id', 'notes'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class PDU_Model(Device42APIObject):
@@ -895,6 +1918,8 @@ class PDU(Device42APIObject):
     [{'start_at': 1.0, 'name': 'PDU Test', 'orientation': 'Front', 'pdu_id': 1, 'depth': 'Full Depth', 'where': 'Left', 'size': 1.0}]
     
     """
+    _id_attrs   = ('pdu_id', 'id')
+    _json_keys  = ('name', 'pdu_id', 'rack_id', 'device', 'notes', 'where', 'start_at', 'orientation')
     def __init__(self, json=None, parent=None, api=None):
         self.name           = Required()
         self.pdu_id         = Optional()
@@ -909,6 +1934,7 @@ class PDU(Device42APIObject):
         else:
             super(PDU, self).__init__(json, parent, api)
         self._api_path      = 'pdus'
+    @traced
     def save(self):
         if self.api != None:
             if self.rack_id != Optional():
@@ -922,7 +1948,7 @@ class PDU(Device42APIObject):
     def get_json(self):
         if isinstance(self.name, Required):
             raise Device42APIObjectException(u'required Attribute "name" not set')
-        self.__get_json_validator__(('name', 'pdu_id', 'rack_id', 'device', 'notes', 'where', 'start_at', 'orientation'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class PatchPanel(Device42APIObject):
@@ -943,6 +1969,10 @@ class PatchPanel(Device42APIObject):
     {'msg': ['patch port details edited successfully.', 1, 'Test Panel : 1'], 'code': 0}
     
     """
+    _id_attrs   = ('patch_panel_id', 'id')
+    _json_keys  = ('patch_panel_id', 'number', 'mac_id', 'device', 'device_id', 'switchport_id', 'switch',
+                   'switchport', 'patch_panel_port_id', 'label', 'obj_label1', 'obj_label2', 'back_connection_id',
+                   'back_switchport_id', 'back_switch', 'back_switchport', 'cable_type')
     def __init__(self, json=None, parent=None, api=None):
         self.patch_panel_id         = Required()
         self.number                 = Required()
@@ -963,6 +1993,7 @@ class PatchPanel(Device42APIObject):
         self.cable_type             = Optional()
         super(PatchPanel, self).__init__(json, parent, api)
         self._api_path              = 'patch_panel_ports'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -984,9 +2015,7 @@ class PatchPanel(Device42APIObject):
             if isinstance(self.mac_id, Required):       self.mac_id     = Optional()
             for attr in ('device', 'device_id'):
                 if isinstance(getattr(self, attr), Optional):   continue
-        self.__get_json_validator__(('patch_panel_id', 'number', 'mac_id', 'device', 'device_id', 'switchport_id', 'switch', 'switchport', 'patch_panel_port_id', 'label',
-                  'obj_label1', 'obj_label2', 'back_connection_id', 'back_switchport_id',
-                  'back_switch', 'back_switchport', 'cable_type'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class PatchPanelModule(Device42APIObject):
@@ -1030,6 +2059,9 @@ class IPAM_macaddress(Device42APIObject):
     {'msg': ['mac address successfully added/updated', 1, '00:11:22:33:44:55', True, True], 'code': 0}
 
     """
+    _id_attrs   = ('mac_id', 'macaddress_id', 'id')
+    _json_keys  = ('macaddress', 'port_name', 'vlan_id', 'device')
+    _identity_attrs = ('macaddress',)
     def __init__(self, json=None, parent=None, api=None):
         self.macaddress         = Required()
         self.port_name 	        = Optional() # Interface name.
@@ -1038,6 +2070,7 @@ class IPAM_macaddress(Device42APIObject):
         self.device 	        = Optional()
         super(IPAM_macaddress, self).__init__(json, parent, api)
         self._api_path          = 'macs'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -1048,7 +2081,7 @@ class IPAM_macaddress(Device42APIObject):
     def get_json(self):
         if isinstance(self.macaddress, Required):
             raise Device42APIObjectException(u'required Attribute "macaddress" not set')
-        self.__get_json_validator__(('macaddress', 'port_name', 'vlan_id', 'device'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class IPAM_ipaddress(Device42APIObject):
@@ -1070,6 +2103,9 @@ class IPAM_ipaddress(Device42APIObject):
     {'msg': ['ip added or updated', 1, '1.1.1.1', True, True], 'code': 0}
     
     """
+    _id_attrs   = ('ip_id', 'ipaddress_id', 'id')
+    _json_keys  = ('ipaddress', 'tag', 'subnet', 'macaddress', 'device', 'type')
+    _identity_attrs = ('ipaddress',)
     def __init__(self, json=None, parent=None, api=None): 
         self.ipaddress      = Required()
         self.tag 	    = Optional() # label for the interface
@@ -1086,6 +2122,7 @@ class IPAM_ipaddress(Device42APIObject):
         self._api_path      = 'ip'
         if json != None and self.__dict__.get('ip', False):
             self.ipaddress  = self.ip
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, v=None, body=self.get_json())
@@ -1145,8 +2182,9 @@ class IPAM_ipaddress(Device42APIObject):
     def get_json(self):
         if isinstance(self.ipaddress, Required):
             raise Device42APIObjectException(u'required Attribute "ipaddress" not set')
-        self.__get_json_validator__(('ipaddress', 'tag', 'subnet', 'macaddress', 'device', 'type'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
+    @traced
     def load(self):
         """ there's nothing to be loaded for now"""
         return True
@@ -1166,6 +2204,10 @@ class IPAM_subnet(Device42APIObject):
     {'msg': ['subnet successfully added/updated', 1, 'Home Servers-1.1.1.0/24'], 'code': 0}
     
     """
+    _id_attrs   = ('subnet_id', 'id')
+    _json_keys  = ('network', 'mask_bits', 'vrf_group_id', 'name', 'description', 'number', 'gateway',
+                   'range_begin', 'range_end', 'parent_vlan_id', 'customer_id', 'customer')
+    _identity_attrs = ('network', 'mask_bits')
     def __init__(self, json=None, parent=None, api=None):
         self.network 	    = Required() 
         self.mask_bits 	    = Required() 
@@ -1182,6 +2224,7 @@ class IPAM_subnet(Device42APIObject):
         self.notes 	    = Optional()
         super(IPAM_subnet, self).__init__(json, parent, api)
         self._api_path      = 'subnets'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -1193,8 +2236,7 @@ class IPAM_subnet(Device42APIObject):
         for attr in ('network', 'mask_bits'):
             if isinstance(getattr(self, attr), Required):
                 raise Device42APIObjectException(u'required Attribute "%s" not set' % getattr(self, attr))
-        self.__get_json_validator__(('network', 'mask_bits', 'vrf_group_id', 'name', 'description', 'number', 'gateway',
-                  'range_begin', 'range_end', 'parent_vlan_id', 'customer_id', 'customer'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class IPAM_vlan(Device42APIObject):
@@ -1209,6 +2251,9 @@ class IPAM_vlan(Device42APIObject):
     {'msg': ['vlan successfully added', 1, 'Default VLAN', True], 'code': 0}
     
     """
+    _id_attrs   = ('vlan_id', 'id')
+    _json_keys  = ('number', 'name', 'description', 'switch_id', 'switches', 'notes')
+    _identity_attrs = ('number',)
     def __init__(self, json=None, parent=None, api=None):
         self.number         = Required()
         self.name           = Optional()
@@ -1218,6 +2263,7 @@ class IPAM_vlan(Device42APIObject):
         self.notes          = Optional()
         super(IPAM_vlan, self).__init__(json, parent, api)
         self._api_path      = 'vlans'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -1228,7 +2274,7 @@ class IPAM_vlan(Device42APIObject):
     def get_json(self):
         if isinstance(self.number, Required):
             raise Device42APIObjectException(u'required Attribute "number" not set')
-        self.__get_json_validator__(('number', 'name', 'description', 'switch_id', 'switches', 'notes'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class IPAM_switchport(Device42APIObject):
@@ -1255,6 +2301,10 @@ class IPAM_switchport(Device42APIObject):
     {'msg': ['switchport successfully added/updated', 9, '7'], 'code': 0}
     
     """
+    _id_attrs   = ('switchport_id', 'id')
+    _json_keys  = ('port', 'switch', 'description', 'type', 'vlan_ids', 'up', 'up_admin', 'count', 'remote_port_id',
+                   'remote_device', 'remote_port', 'notes', 'switchport_id')
+    _identity_attrs = ('switch', 'port')
     def __init__(self, json=None, parent=None, api=None):
         self.port           = Required()
         self.switch         = Optional()
@@ -1271,6 +2321,7 @@ class IPAM_switchport(Device42APIObject):
         self.switchport_id  = Optional()
         super(IPAM_switchport, self).__init__(json, parent, api)
         self._api_path      = 'switchports'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -1281,8 +2332,7 @@ class IPAM_switchport(Device42APIObject):
     def get_json(self):
         if isinstance(self.port, Required):
             raise Device42APIObjectException(u'required Attribute "port" not set')
-        self.__get_json_validator__(('port', 'switch', 'description', 'type', 'vlan_ids', 'up', 'up_admin', 'count',
-                                     'remote_port_id', 'remote_device', 'remote_port', 'notes', 'switchport_id'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class IPAM_switch(Device42APIObject):
@@ -1292,6 +2342,7 @@ class IPAM_switch(Device42APIObject):
     postponed
     
     """
+    _json_keys  = ('device', 'switch_template_id', 'device_id', 'notes')
     def __init__(self, json=None, parent=None, api=None):
         self.device         = Required()
         self.device_id      = Optional()
@@ -1299,6 +2350,7 @@ class IPAM_switch(Device42APIObject):
         self.notes          = Optional()
         super(IPAM_switch, self).__init__(json, parent, api)
         self._api_path      = 'vlans'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -1310,7 +2362,7 @@ class IPAM_switch(Device42APIObject):
         for attr in ('device', 'switch_template_id'):
             if isinstance(getattr(self, attr), Required):
                 raise Device42APIObjectException(u'required Attribute "%s" not set' % getattr(self, attr))
-        self.__get_json_validator__(('device', 'switch_template_id', 'device_id', 'notes'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class Customer(Device42APIObject):
@@ -1339,6 +2391,9 @@ class Customer(Device42APIObject):
     
     
     """
+    _id_attrs   = ('customer_id', 'id')
+    _json_keys  = ('name', 'contact_info', 'notes', 'type', 'customer', 'email', 'phone', 'address')
+    _identity_attrs = ('name',)
     def __init__(self, json=None, parent=None, api=None):
         self.name           = Required()
         self.contact_info   = Optional()
@@ -1350,6 +2405,7 @@ class Customer(Device42APIObject):
         self.address 	    = Optional() # Text field.
         super(Customer, self).__init__(json, parent, api)
         self._api_path      = 'customers'
+    @traced
     def save(self):
         if self.api != None:
             if not isinstance(self.customer, Optional):
@@ -1364,7 +2420,7 @@ class Customer(Device42APIObject):
         for attr in ('name',):
             if isinstance(getattr(self, attr), Required):
                 raise Device42APIObjectException(u'required Attribute "%s" not set' % getattr(self, attr))
-        self.__get_json_validator__(('name', 'contact_info', 'notes', 'type', 'customer', 'email', 'phone', 'address'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
     def add_customField(self, cf=None):
         if not isinstance(cf, CustomField): raise Device42APIObjectException(u'need CustomField instance')
@@ -1404,6 +2460,8 @@ class IPAM_DNSRecord(Device42APIObject):
     {'msg': ['DNS record added/updated successfully', 2, 'localhost'], 'code': 0}
     
     """
+    _json_keys  = ('domain', 'type', 'nameserver', 'name', 'content', 'prio', 'ttl')
+    _identity_attrs = ('type', 'name', 'content')
     def __init__(self, json=None, parent=None, api=None):
         self.domain             = Required()
         self.type 	        = Required() # SOA, NS, MX, A, AAAA, CNAME, PTR, TXT, SPF, SRV, CERT, DNSKEY, DS, KEY, NSEC, RRSIG, HINFO, LOC, NAPTR, RP, AFSDB, SSHFP
@@ -1414,6 +2472,7 @@ class IPAM_DNSRecord(Device42APIObject):
         self.ttl                = Optional()
         super(IPAM_DNSRecord, self).__init__(json, parent, api)
         self._api_path          = 'dns/records'
+    @traced
     def save(self):
         if self.api != None:
             rsp = self.api.__post_api__('%s/' % self._api_path, body=self.get_json())
@@ -1425,7 +2484,7 @@ class IPAM_DNSRecord(Device42APIObject):
         for attr in ('domain', 'type'):
             if isinstance(getattr(self, attr), Required):
                 raise Device42APIObjectException(u'required Attribute "%s" not set' % attr)
-        self.__get_json_validator__(('domain', 'type', 'nameserver', 'name', 'content', 'prio', 'ttl'))
+        self.__get_json_validator__(self._json_keys)
         return self.json
 
 class Device42API(object):
@@ -1447,10 +2506,53 @@ class Device42API(object):
     * __post_api__(path='.../', v='1.0', body=dict())   # v='1.0' or None
     * __put_api__(path='.../', body=dict()) # currently not used
     
+    requests go through a transport with the interface of httplib2.Http.request(uri, method, headers=, body=),
+    by default a pool of httplib2.Http connections, see device42api.replay for recording and replaying transports
+    
+    one Device42API can be shared by many threads, headers are copied per request, connections are taken
+    from the pool and the caches are replaced atomically when (re)loaded
+    
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', workers=16)
+    >>> with concurrent.futures.ThreadPoolExecutor(16) as pool:
+    ...     devices = list(pool.map(lambda i: api.get_device(device_id=i), range(1, 1000)))
+    
+    identical GET requests issued at the same time from several threads share one network call and one
+    decoded response (disable with coalesce=False), the saved requests are counted
+    
+    >>> api.coalesce_stats()
+    {'calls': 120, 'executed': 31, 'coalesced': 89, 'inflight': 0}
+    
+    tracing spans are opened for the getters, the load()/save() methods and every HTTP request if a tracer
+    is given, either an OpenTelemetry tracer or the SpanRecorder
+    
+    >>> from opentelemetry import trace
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', tracer=trace.get_tracer('device42api'))
+    
+    connect_timeout and read_timeout (seconds, default None waits forever) apply to every request, a deadline
+    bounds a whole call including its nested loads, requests are cut to the time left and none is sent after it
+    passed, a request running out of time raises Device42APITimeoutException
+    
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', connect_timeout=3, read_timeout=30)
+    >>> racks = api.get_rack(deadline=10.0, partial=True)
+    >>> with api.deadline(5.0):
+    ...     d = api.get_device(name='Test Device')
+    
+    GET requests slower than the p95 of their endpoint are sent a second time if a Hedge is given, see Hedge
+    
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', hedge=device42api.Hedge(q=0.95))
+    
+    POST and PUT requests are queued and changes of the same object merged if a WriteBehind is given, save()
+    returns a Future then, see WriteBehind
+    
+    >>> api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', write_behind=device42api.WriteBehind(window=2.0))
+    
     """
-    def __init__(self, host=None, port=443, username=None, password=None, noInit=False):
+    def __init__(self, host=None, port=443, username=None, password=None, noInit=False, coalesce=True, workers=8,
+                 decoder=None, tracer=None, slow_log=None, scheme='https', transport=None, connect_timeout=None,
+                 read_timeout=None, hedge=None, write_behind=None):
         self.host       = host
         self.port       = int(port)
+        self.scheme     = scheme
         self.username   = username
         self.password   = password
         self._macAddress = {}
@@ -1460,7 +2562,23 @@ class Device42API(object):
         self._rooms     = {}
         self._servicelevels = {}
         self._assets    = {}
-        self._http      = httplib2.Http(disable_ssl_certificate_validation=True)
+        self.workers    = int(workers)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._transport = transport
+        self._http      = transport or httplib2.Http(disable_ssl_certificate_validation=True)
+        self._idle      = [self._http] if transport == None else []
+        self._singleflight = SingleFlight() if coalesce else None
+        self._decoder   = get_decoder(decoder)
+        self._network   = dict(requests=0, network_seconds=0.0)
+        self._pool      = None
+        self.metrics    = RequestMetrics()
+        self._hooks     = dict(pre=[], post=[])
+        self.tracer     = tracer
+        self.slow_log   = slow_log
+        self.hedge      = hedge
+        self.write_behind = write_behind
+        self._lock      = threading.RLock()
         self._auth_b    = '{}:{}'.format(self.username, self.password).encode("utf-8")
         self._auth      = base64.b64encode(self._auth_b)
         self._headers   = {
@@ -1481,36 +2599,362 @@ class Device42API(object):
         if not path.startswith('patch_panel_ports') and not path.endswith('?follow=yes'):
             # unfortunately for this url path they API doesn't accept tailing '/'
             if not path.endswith('/'):  path += '/'
-        c, r = self._http.request(u'https://%s:%s/api/1.0/%s' % (self.host, self.port, path), 'GET', headers=self._headers)
-        self.__set_cookie__(c)
-        return json.loads(r)
+        url = u'%s://%s:%s/api/1.0/%s' % (self.scheme, self.host, self.port, path)
+        if self._singleflight != None:
+            return self._singleflight.do(url, lambda: self.__fetch_api__(url))
+        return self.__fetch_api__(url)
+    def __fetch_api__(self, url):
+        if self.hedge != None:
+            c, r = self.hedge.request(self, url)
+        else:
+            c, r = self.__request__(url, 'GET')
+        return self.__decode__('GET', url, r)
     def __post_api__(self, path=None, v='1.0', body=None):
         if path == None or body == None:    return False
-        if not path.endswith('/'):  path += '/'
-        self._headers['content-type'] = 'application/x-www-form-urlencoded'
-        if v == '1.0':
-            c, r = self._http.request(u'https://%s:%s/api/1.0/%s' % (self.host, self.port, path), 'POST', headers=self._headers, body=urlencode(body))
-        else:
-            c, r = self._http.request(u'https://%s:%s/api/%s' % (self.host, self.port, path), 'POST', headers=self._headers, body=urlencode(body))
-        self.__set_cookie__(c)
-        del self._headers['content-type']
-        try:    return json.loads(r)
-        except ValueError:  return r
+        return self.__send_api__('POST', path, v, body)
     def __put_api__(self, path=None, v='1.0', body=None):
         if path == None or body == None:    return False
+        return self.__send_api__('PUT', path, v, body)
+    def __send_api__(self, method, path, v, body):
         if not path.endswith('/'):  path += '/'
-        self._headers['content-type'] = 'application/x-www-form-urlencoded'
+        if self.write_behind != None and not _write_behind.get():
+            return self.write_behind.submit(self, method, path, v, body)
         if v == '1.0':
-            c, r = self._http.request(u'https://%s:%s/api/1.0/%s' % (self.host, self.port, path), 'PUT', headers=self._headers, body=urlencode(body))
+            c, r = self.__request__(u'%s://%s:%s/api/1.0/%s' % (self.scheme, self.host, self.port, path), method, body=urlencode(body))
         else:
-            c, r = self._http.request(u'https://%s:%s/api/%s' % (self.host, self.port, path), 'PUT', headers=self._headers, body=urlencode(body))
-        self.__set_cookie__(c)
-        del self._headers['content-type']
-        try:    return json.loads(r)
+            c, r = self.__request__(u'%s://%s:%s/api/%s' % (self.scheme, self.host, self.port, path), method, body=urlencode(body))
+        try:    return self.__decode__(method, path, r)
         except ValueError:  return r
+    def __decode__(self, method, url, content):
+        start = time.perf_counter()
+        try:
+            return self._decoder.decode(content)
+        finally:
+            self.metrics.record_decode(method, self.__path__(url), time.perf_counter() - start)
+    def __path__(self, url):
+        """strip scheme, host and api version from url"""
+        if '://' in url:
+            url = url.split('/', 3)[-1]
+        for prefix in ('api/1.0/', 'api/'):
+            if url.startswith(prefix):  return url[len(prefix):]
+        return url
+    def __span__(self, name, attributes=None):
+        """return a span context manager of the configured tracer (OpenTelemetry compatible) or a no-op"""
+        if self.tracer == None:     return contextlib.nullcontext()
+        attributes = dict((k, v) for k, v in (attributes or {}).items() if v != None)
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+    def __request__(self, url, method, body=None):
+        def send(connect, read):
+            attempt = _attempt.get()
+            http    = self.__acquire__()
+            try:
+                if attempt != None:     attempt.attach(http)
+                c, r = self.__send__(http, url, method, body, connect, read)
+            finally:
+                if attempt != None:     attempt.detach()
+                self.__release__(http)
+            self.__set_cookie__(c)
+            return (c, r), c.status, len(r)
+        return self.__exchange__(method, self.__path__(url), body, send)
+    def __exchange__(self, method, path, body, send):
+        """run send(connect, read) returning (result, status, size) as one request: the pre hooks, a HTTP span,
+        the metrics, the slow log and the post hooks, a socket or urllib3 timeout is raised as
+        Device42APITimeoutException, return the result"""
+        for hook in self._hooks['pre']:
+            hook(method, path, body)
+        connect, read = self.__timeouts__(method, path)
+        with self.__span__('HTTP %s' % method, {'http.method': method, 'http.path': path,
+                                                'http.template': self.metrics.template(path)}) as span:
+            start = time.perf_counter()
+            try:
+                result, status, size = send(connect, read)
+            except (socket.timeout, TimeoutError, urllib3.exceptions.TimeoutError) as e:
+                elapsed = time.perf_counter() - start
+                self.__record__(method, path, 0, elapsed, 0, len(body or ''))
+                raise Device42APITimeoutException(u'%s %s timed out after %.3fs' % (method, path, elapsed))
+            elapsed = time.perf_counter() - start
+            if span != None:
+                span.set_attribute('http.status_code', status)
+                span.set_attribute('http.response_size', size)
+        with self._lock:
+            self._network['requests']        += 1
+            self._network['network_seconds'] += elapsed
+        self.__record__(method, path, status, elapsed, size, len(body or ''))
+        if self.slow_log != None:
+            self.slow_log.record(method, path, status, elapsed, size, _caller.get())
+        for hook in self._hooks['post']:
+            hook(method, path, status, elapsed, size)
+        return result
+    def __record__(self, *record):
+        """record a request in api.metrics, a hedged request leaves it to the Hedge recording the winner only"""
+        attempt = _attempt.get()
+        if attempt != None:     attempt.record = record
+        else:                   self.metrics.record(*record)
+    def __timeouts__(self, method, path):
+        """return the (connect, read) timeouts of the next request, capped to the time left until the deadline"""
+        connect, read, left = self.connect_timeout, self.read_timeout, remaining()
+        if left == None:    return connect, read
+        if left <= 0:
+            self.metrics.record(method, path, 0, 0.0)
+            raise Device42APITimeoutException(u'deadline exceeded before %s %s' % (method, path))
+        return min(connect or left, left), min(read or left, left)
+    def __send__(self, http, url, method, body, connect, read):
+        if http is self._transport:
+            return http.request(url, method, headers=self.__headers__(body), body=body)
+        # the connection of a httplib2.Http is reused, set the timeouts of the open sockets as well
+        http.timeout = connect
+        for conn in http.connections.values():
+            conn.timeout = connect
+            if conn.sock != None:   conn.sock.settimeout(read)
+        token = _read_timeout.set(read)
+        try:
+            return http.request(url, method, headers=self.__headers__(body), body=body,
+                                connection_type=HTTPSConnectionWithReadTimeout if self.scheme == 'https' else HTTPConnectionWithReadTimeout)
+        except (socket.timeout, TimeoutError):
+            # the connection might still receive the late response, don't reuse it
+            for conn in http.connections.values():
+                conn.close()
+            raise
+        finally:
+            _read_timeout.reset(token)
+    def deadline(self, seconds=None):
+        """return a context manager limiting all calls of the current context (and of the threads started by
+        parallel/prefetch) to seconds, an enclosing shorter deadline is kept, None doesn't change anything
+        
+        >>> with api.deadline(2.5):
+        ...     rack = api.get_rack('TestRack1')[0]
+        
+        """
+        if seconds == None:     return contextlib.nullcontext()
+        return self.__deadline__(seconds)
+    @contextlib.contextmanager
+    def __deadline__(self, seconds):
+        d = time.monotonic() + seconds
+        if _deadline.get() != None:     d = min(d, _deadline.get())
+        token = _deadline.set(d)
+        try:
+            yield d
+        finally:
+            _deadline.reset(token)
+    def add_hook(self, when='pre', fn=None):
+        """register a callback called before (when='pre') or after (when='post') every request
+        
+        * pre(method, path, body)
+        * post(method, path, status, seconds, size)
+        
+        >>> api.add_hook('post', lambda method, path, status, seconds, size: log.debug('%s %s %.3fs', method, path, seconds))
+        
+        """
+        if when not in self._hooks or not callable(fn):
+            raise Device42APIObjectException(u'need pre or post hook and a callable')
+        self._hooks[when].append(fn)
+    def remove_hook(self, when='pre', fn=None):
+        if fn in self._hooks.get(when, []):
+            self._hooks[when].remove(fn)
+    def __acquire__(self):
+        """return the transport given to the constructor or an idle httplib2.Http (one connection per host) of the pool"""
+        if self._transport != None:     return self._transport
+        with self._lock:
+            if self._idle:  return self._idle.pop()
+        return httplib2.Http(disable_ssl_certificate_validation=True)
+    def __release__(self, http):
+        """return a httplib2.Http to the pool, at most api.workers are kept idle"""
+        if http is self._transport:     return
+        with self._lock:
+            if len(self._idle) < max(self.workers, 1):
+                self._idle.append(http)
+    def __headers__(self, body=None):
+        """return a copy of the session headers for one request"""
+        with self._lock:
+            headers = dict(self._headers)
+        if body != None:
+            headers['content-type'] = 'application/x-www-form-urlencoded'
+        return headers
     def __set_cookie__(self, headers):
         if 'set-cookie' in headers:
-            self._headers['Cookie'] = headers['set-cookie']
+            with self._lock:
+                self._headers['Cookie'] = headers['set-cookie']
+    def coalesce_stats(self):
+        """return the counters of the GET request coalescing, coalesced is the number of requests saved"""
+        if self._singleflight == None:
+            return dict(calls=0, executed=0, coalesced=0, inflight=0)
+        return self._singleflight.stats()
+    def hedge_stats(self):
+        """return the counters of the request hedging, won is the number of hedges answering first"""
+        if self.hedge == None:
+            return dict(requests=0, hedged=0, won=0, suppressed=0)
+        return self.hedge.stats()
+    def write_behind_stats(self):
+        """return the counters of the write-behind queue, merged is the number of requests saved"""
+        if self.write_behind == None:
+            return dict(calls=0, merged=0, sent=0, failed=0, pending=0)
+        return self.write_behind.stats()
+    def __stream_api__(self, path=None, key=None, chunk_size=65536):
+        """yield the items of the array key of a collection response while it's read from the socket, the
+        items are parsed by the decoder of the api, the request goes through the hooks, span, metrics and slow
+        log like any other once the response headers arrived, its size is the content-length if known"""
+        if path == None or key == None:     return
+        if not path.endswith('/') and '?' not in path:  path += '/'
+        if self._transport != None:
+            # a custom transport returns the whole body, parse it with the same item by item semantics
+            c, r = self.__request__(u'%s://%s:%s/api/1.0/%s' % (self.scheme, self.host, self.port, path), 'GET')
+            if c.status >= 400:
+                raise Device42APIObjectException(u'GET %s failed with status %s' % (path, c.status))
+            stream = JSONArrayStream([r], key, self._decoder)
+            try:
+                for item in stream:
+                    yield item
+            finally:
+                self.metrics.record_decode('GET', path, stream.decode_seconds)
+            return
+        with self._lock:
+            if self._pool == None:
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+                self._pool = urllib3.PoolManager(cert_reqs='CERT_NONE')
+        def send(connect, read):
+            try:
+                rsp = self._pool.request('GET', u'%s://%s:%s/api/1.0/%s' % (self.scheme, self.host, self.port, path),
+                                         headers=self.__headers__(), preload_content=False,
+                                         timeout=urllib3.Timeout(connect=connect, read=read))
+            except urllib3.exceptions.MaxRetryError as e:
+                if isinstance(e.reason, urllib3.exceptions.TimeoutError):   raise e.reason
+                raise
+            self.__set_cookie__(rsp.headers)
+            return rsp, rsp.status, int(rsp.headers.get('content-length') or 0)
+        rsp = self.__exchange__('GET', path, None, send)
+        stream = JSONArrayStream(rsp.stream(chunk_size), key, self._decoder)
+        try:
+            if rsp.status >= 400:
+                raise Device42APIObjectException(u'GET %s failed with status %s' % (path, rsp.status))
+            for item in stream:
+                yield item
+        except urllib3.exceptions.TimeoutError as e:
+            raise Device42APITimeoutException(u'GET %s timed out while streaming: %s' % (path, e))
+        finally:
+            rsp.release_conn()
+            self.metrics.record_decode('GET', path, stream.decode_seconds)
+    def iter_macs(self):
+        """yield IPAM_macaddress objects while macs/ is streamed from the API
+        
+        >>> for m in api.iter_macs():
+        ...     print m.macaddress
+        00:00:00:00:00:01
+        
+        """
+        for m in self.__stream_api__('macs/', 'macaddresses'):
+            yield IPAM_macaddress(json=m, parent=self, api=self)
+    def iter_assets(self):
+        """yield (not loaded) Asset objects while assets/ is streamed from the API"""
+        for a in self.__stream_api__('assets/', 'assets'):
+            yield Asset(json=a, parent=self, api=self)
+    def iter_racks(self):
+        """yield (not loaded) Rack objects while racks/ is streamed from the API"""
+        for r in self.__stream_api__('racks/', 'racks'):
+            yield Rack(json=r, parent=self, api=self)
+    def decode_stats(self):
+        """return the time spent decoding response bodies versus the time spent waiting for the network"""
+        stats = self._decoder.stats()
+        with self._lock:
+            stats.update(self._network)
+        return stats
+    def parallel(self, fn, items, workers=None):
+        """run fn for every item on up to workers threads (default api.workers) and return the results in order
+        
+        >>> api.parallel(lambda i: api.get_device(device_id=i), [1, 2, 3])
+        [<device42api.Device object at 0x26a0e10>, <device42api.Device object at 0x26a0f50>, <device42api.Device object at 0x26a1090>]
+        
+        """
+        items   = list(items)
+        workers = min(int(workers or self.workers), len(items))
+        if workers <= 1:
+            return [fn(i) for i in items]
+        # run every item in a copy of the callers context, so tracing spans keep their parent
+        ctx = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda i: ctx.copy().run(fn, i), items))
+    @traced
+    def prefetch(self, parents=None, paths=('devices', 'assets'), workers=None, partial=False):
+        """load the children of many Rack or Room objects concurrently and stitch them back into their parents
+        
+        the children of a rack are read with one request per rack and kind (devices/all/?rack_id= and
+        assets/?rack_id=, streamed), the requests of all racks run concurrently, children missing in these
+        responses and the children of rooms are loaded one by one, supported paths are
+        
+        * devices                   # load every Device
+        * devices.ip_addresses      # included in the device response, no additional request
+        * devices.mac_addresses     # resolve the macAddresses through one request for all macs
+        * assets                    # load every Asset
+        
+        >>> racks = api.get_rack(room='Test Room', prefetch=['devices', 'devices.mac_addresses'])
+        >>> api.prefetch(api.get_rack(lazy=True), ['devices'])
+        
+        with partial=True children which couldn't be loaded before the deadline keep their summary
+        
+        """
+        paths   = set(paths)
+        jobs, seen, batches = [], set(), {}
+        for p in parents or []:
+            for attr in ('devices', 'assets'):
+                if attr not in paths:   continue
+                children = getattr(p, attr, None)
+                if isinstance(children, dict):      items = list(children.items())
+                elif isinstance(children, list):    items = list(enumerate(children))
+                else:                               continue
+                for key, c in items:
+                    if isinstance(c, LazyObject):
+                        c = object.__getattribute__(c, '_lazy_obj')
+                    if id(c) in seen:   continue
+                    seen.add(id(c))
+                    job = (getattr(p, attr), key, c)
+                    if isinstance(p, Rack) and p.__object_id__() != None and c.__object_id__() != None:
+                        batch = (attr, p.__object_id__())
+                        batches.setdefault(batch, {}).setdefault(u'%s' % c.__object_id__(), []).append(job)
+                    else:
+                        jobs.append(job)
+        macs = 'devices.mac_addresses' in paths
+        if macs and (jobs or batches):
+            self.get_macid_byAddress()
+        def fetch(batch):
+            """return {child id: response json} of the children of one rack or None if it can't be read"""
+            attr, rack_id = batch
+            if attr == 'devices':
+                # only complete device responses (with the addresses) replace Device.load()
+                path, key, ids, full = 'devices/all/?rack_id=%s' % rack_id, 'Devices', ('device_id', 'id'), ('ip_addresses', 'mac_addresses')
+            else:
+                path, key, ids, full = 'assets/?rack_id=%s' % rack_id, 'assets', ('asset_id', 'id'), ()
+            wanted, found = batches[batch], {}
+            try:
+                for item in self.__stream_api__(path, key):
+                    i = next((item[k] for k in ids if item.get(k) != None), None)
+                    if i != None and u'%s' % i in wanted and all(k in item for k in full):
+                        found[u'%s' % i] = item
+            except Device42APITimeoutException:
+                if not partial:     raise
+                return {}
+            except Device42APIObjectException:
+                return None
+            return found
+        for batch, found in zip(list(batches), self.parallel(fetch, list(batches), workers)):
+            for i, waiting in batches[batch].items():
+                if found == None or i not in found:
+                    if found != None or not partial:    jobs.extend(waiting)
+                    continue
+                for children, key, c in waiting:
+                    if isinstance(c, Device):   c.__apply__(dict(found[i]), lazy=not macs)
+                    else:                       c.__apply__(dict(found[i]))
+                    children[key] = c
+        def load(job):
+            children, key, c = job
+            try:
+                if isinstance(c, Device):
+                    c.load(lazy=not macs)
+                else:
+                    c.load()
+            except Device42APITimeoutException:
+                if not partial:     raise
+            children[key] = c
+        self.parallel(load, jobs, workers)
+    @traced
     def get_macid_byAddress(self, macAddress=None, reload=False):
         """return IPAM_macaddress object from API if found otherwise False
         
@@ -1521,10 +2965,14 @@ class Device42API(object):
         
         """
         if self._macAddress == {} or reload == True:
+            macs = {}
             for m in self.__get_api__('macs/')['macaddresses']:
                 mac = IPAM_macaddress(json=m, parent=self, api=self)
-                self._macAddress[mac.macaddress] = mac
+                macs[mac.macaddress] = mac
+            with self._lock:
+                self._macAddress = macs
         return self._macAddress.get(macAddress, False)
+    @traced
     def get_pdu_models(self):
         """return all PDU models from device42
         
@@ -1540,7 +2988,9 @@ class Device42API(object):
         for r in self.__get_api__('pdu_models/')['pdu_models']:
             pdum.append(PDU_Model(json=r, parent=self, api=self))
         return pdum
-    def get_rack(self, name=None, building=None, room=None, reload=True):
+    @traced
+    def get_rack(self, name=None, building=None, room=None, reload=True, lazy=False, prefetch=None,
+                 deadline=None, partial=False):
         """return all racks from device42
         
         >>> api.get_rack('TestRack1')
@@ -1552,35 +3002,65 @@ class Device42API(object):
         device: Test Device id: 1
         >>>
         >>> api.get_rack(room='Test Room')
+        >>> # one request per rack, devices and assets are loaded on demand
+        >>> api.get_rack(lazy=True)
+        >>> # only the selected racks are loaded, their children concurrently (see prefetch)
+        >>> api.get_rack(room='Test Room', prefetch=['devices', 'devices.ip_addresses'])
+        >>> # at most 10 seconds, racks and devices not loaded by then keep their summary
+        >>> api.get_rack(deadline=10.0, partial=True)
         
         """
-        if self._racks == {} or reload == True:
-            for r in self.__get_api__('racks/')['racks']:
-                ra = Rack(json=r, parent=self, api=self)
-                ra.load()
-                self._racks[ra.name] = ra
-        if name == None and building == None and room == None:
-            return self._racks.values()
-        racks = []
-        if name != None and building == None and room == None:
-            for r in self._racks.values():
-                if r.name == name:              racks.append(r)
-        if building != None:
-            for r in self._racks.values():
-                if room == None:
-                    if r.building == building:
-                        if name == None:        racks.append(r)
-                        elif name == r.name:    racks.append(r)
-                else:
-                    if r.building == building and r.room == room:
-                        if name == None:        racks.append(r)
-                        elif name == r.name:    racks.append(r)
-        elif room != None:
-            for r in self._racks.values():
-                if r.room != room:              continue
-                if name == None:                racks.append(r)
-                elif name == r.name:            racks.append(r)
-        return racks
+        with self.deadline(deadline):
+            cache = self._racks
+            if cache == {} or reload == True or prefetch != None:
+                cache = {}
+                for r in self.__get_api__('racks/')['racks']:
+                    ra = Rack(json=r, parent=self, api=self)
+                    if prefetch == None:
+                        try:
+                            ra.load(lazy=lazy, partial=partial)
+                        except Device42APITimeoutException:
+                            if not partial:     raise
+                    cache[ra.name] = ra
+                # prefetched racks are summaries until selected, they are never cached
+                if prefetch == None:
+                    with self._lock:
+                        self._racks = cache
+            if name == None and building == None and room == None:
+                if prefetch != None:
+                    self.__prefetch_racks__(cache.values(), prefetch, partial)
+                return cache.values()
+            racks = []
+            if name != None and building == None and room == None:
+                for r in cache.values():
+                    if r.name == name:              racks.append(r)
+            if building != None:
+                for r in cache.values():
+                    if room == None:
+                        if r.building == building:
+                            if name == None:        racks.append(r)
+                            elif name == r.name:    racks.append(r)
+                    else:
+                        if r.building == building and r.room == room:
+                            if name == None:        racks.append(r)
+                            elif name == r.name:    racks.append(r)
+            elif room != None:
+                for r in cache.values():
+                    if r.room != room:              continue
+                    if name == None:                racks.append(r)
+                    elif name == r.name:            racks.append(r)
+            if prefetch != None:
+                self.__prefetch_racks__(racks, prefetch, partial)
+            return racks
+    def __prefetch_racks__(self, racks, paths, partial=False):
+        def load(r):
+            try:
+                r.load(lazy=True)
+            except Device42APITimeoutException:
+                if not partial:     raise
+        self.parallel(load, racks)
+        self.prefetch(racks, paths, partial=partial)
+    @traced
     def get_asset(self, name=None, reload=False):
         """return all assets from device42
         
@@ -1596,16 +3076,20 @@ class Device42API(object):
         
         """
         if self._assets == {} or reload == True:
+            assets = {}
             for a in self.__get_api__('assets/')['assets']:
                 ass = Asset(json=a, parent=self, api=self)
                 ass.load()
-                self._assets[ass.id] = ass
+                assets[ass.id] = ass
+            with self._lock:
+                self._assets = assets
         if name != None:
             assets = []
             for a in self._assets.values():
                 if a.name == name:  assets.append(a)
             return assets
         return self._assets.values()
+    @traced
     def get_patch_panels(self):
         """return all patch panels from device42, use get_assets and validate patch_panel_model_id field
         
@@ -1637,6 +3121,7 @@ class Device42API(object):
         for m in self.__get_api__('patch_panel_models'):
             modules.append(PatchPanelModule(json=m, parent=self, api=self))
         return modules
+    @traced
     def get_customer(self, name=None, reload=False):
         """return Customer object from API if found otherwise False
         
@@ -1650,10 +3135,14 @@ class Device42API(object):
         
         """
         if self._customers == {} or reload == True:
+            customers = {}
             for c in self.__get_api__('customers/')['Customers']:
                 cu = Customer(json=c, parent=self, api=self)
-                self._customers[cu.name] = cu
+                customers[cu.name] = cu
+            with self._lock:
+                self._customers = customers
         return self._customers.get(name, False)
+    @traced
     def get_building(self, name=None, reload=False):
         """return Building object from API if found otherwise False
         
@@ -1664,10 +3153,14 @@ class Device42API(object):
         
         """
         if self._buildings == {} or reload == True:
+            buildings = {}
             for c in self.__get_api__('buildings/')['buildings']:
                 b = Building(json=c, parent=self, api=self)
-                self._buildings[b.name] = b
+                buildings[b.name] = b
+            with self._lock:
+                self._buildings = buildings
         return self._buildings.get(name, False)
+    @traced
     def get_room(self, name=None, reload=False):
         """return Room object from API if found otherwise False
         
@@ -1678,10 +3171,14 @@ class Device42API(object):
         
         """
         if self._rooms == {} or reload == True:
+            rooms = {}
             for c in self.__get_api__('rooms/')['rooms']:
                 r = Room(json=c, parent=self, api=self)
-                self._rooms[r.name] = r
+                rooms[r.name] = r
+            with self._lock:
+                self._rooms = rooms
         return self._rooms.get(name, False)
+    @traced
     def get_service_level(self, name=None, reload=False):
         """return ServiceLevel object from API if found otherwise False
         
@@ -1692,9 +3189,12 @@ class Device42API(object):
         
         """
         if self._servicelevels == {} or reload == True:
+            servicelevels = {}
             for c in self.__get_api__('service_level/'):
                 r = ServiceLevel(json=c, parent=self, api=self)
-                self._servicelevels[r.name] = r
+                servicelevels[r.name] = r
+            with self._lock:
+                self._servicelevels = servicelevels
         if name != None:
             return self._servicelevels.get(name, False)
         return self._servicelevels
@@ -1708,6 +3208,7 @@ class Device42API(object):
         """
         for h in self.__get_api__('history/'):
             yield History(json=h, parent=self, api=self)
+    @traced
     def get_device(self, name=None, device_id=None, serial=None):
         """return the Device from the API classified by
         
@@ -1731,7 +3232,7 @@ class Device42API(object):
             device.load()
             return device
         elif serial != None:
-            device_id = self.__get_api__('devices/serial/%s' % serial)
+            device_id = self.__get_api__('devices/serial/%s' % serial).get('id', False)
             if device_id:
                 device.device_id = device_id
                 device.load()
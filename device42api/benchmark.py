@@ -0,0 +1,199 @@
+#!/usr/bin/python
+""".. _benchmark:
+
+reproducible benchmarks of the hot paths of device42api against the local stand-in server (see testserver),
+every benchmark reports throughput, p50/p95/p99 latency, the requests it caused and its peak memory, the
+results are written as JSON to compare versions
+
+    $ python -m device42api.benchmark --devices-per-rack 20 --output bench-1.4.json
+    $ python -m device42api.benchmark --devices-per-rack 20 --compare bench-1.4.json
+
+>>> from device42api import benchmark
+>>> results = benchmark.run(iterations=5, only=['get_device_by_id'])
+>>> results['benchmarks']['get_device_by_id']['p95']
+0.0021
+
+"""
+
+import argparse
+import gc
+import platform
+import sys
+import time
+import tracemalloc
+import simplejson as json
+import device42api
+from device42api.testserver import Inventory, FakeDevice42Server
+
+def percentiles(samples, qs=(0.5, 0.95, 0.99)):
+    """return the nearest rank percentiles qs (0..1) of samples"""
+    ordered = sorted(samples)
+    if not ordered:     return [None for q in qs]
+    return [ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))] for q in qs]
+
+def summarize(latencies, elapsed, requests=0, peak_memory=None):
+    """return the result record of one benchmark"""
+    p50, p95, p99 = percentiles(latencies)
+    return dict(operations=len(latencies), seconds=elapsed,
+                throughput=len(latencies) / elapsed if elapsed else None,
+                p50=p50, p95=p95, p99=p99, requests=requests,
+                requests_per_operation=float(requests) / len(latencies) if latencies else None,
+                peak_memory=peak_memory)
+
+def version():
+    try:
+        from importlib.metadata import version
+        return version('device42api')
+    except Exception:
+        return 'unknown'
+
+class Benchmarks(object):
+    """.. _Benchmarks:
+
+    the benchmarks, each bench_* method returns a callable running one operation (setup is done before),
+    run() times the callable and counts the requests the server received
+
+    """
+    def __init__(self, server, iterations=20, objects=100000):
+        self.server     = server
+        self.iterations = int(iterations)
+        self.objects    = int(objects)
+        inv             = server.inventory
+        self.devices    = list(inv.devices.values())
+        self.macs       = [m['macaddress'] for m in inv.macs.values()]
+        self.rooms      = list(inv.rooms.values())
+    def api(self, noInit=True):
+        return device42api.Device42API(host=self.server.host, port=self.server.port, username='admin',
+                                       password='changeme', scheme=self.server.scheme, noInit=noInit)
+    def bench_construct(self):
+        return lambda i: self.api(noInit=False)
+    def bench_get_rack_deep(self):
+        api = self.api()
+        return lambda i: api.get_rack()
+    def bench_room_load(self):
+        api = self.api()
+        def op(i):
+            r = device42api.Room(api=api)
+            r.room_id = self.rooms[i % len(self.rooms)]['room_id']
+            r.load()
+        return op
+    def bench_get_device_by_id(self):
+        api = self.api()
+        return lambda i: api.get_device(device_id=self.devices[i % len(self.devices)]['device_id'])
+    def bench_get_device_by_name(self):
+        api = self.api()
+        return lambda i: api.get_device(name=self.devices[i % len(self.devices)]['name'])
+    def bench_get_device_by_serial(self):
+        api = self.api()
+        return lambda i: api.get_device(serial=self.devices[i % len(self.devices)]['serial_no'])
+    def bench_get_macid_cold(self):
+        api = self.api()
+        return lambda i: api.get_macid_byAddress(self.macs[i % len(self.macs)], reload=True)
+    def bench_get_macid_warm(self):
+        api = self.api()
+        api.get_macid_byAddress()
+        return lambda i: api.get_macid_byAddress(self.macs[i % len(self.macs)])
+    def bench_device_save(self):
+        api = self.api()
+        def op(i):
+            d = device42api.Device(api=api)
+            d.name      = 'bench-device-%06d' % i
+            d.hardware  = 'Generic Hardware 1U'
+            d.memory    = 16.0
+            d.cpucount  = 2
+            d.save()
+        return op
+    def bench_get_json(self):
+        api     = self.api()
+        summary = self.devices[0]
+        def op(i):
+            for n in range(self.objects):
+                d = device42api.Device(json=dict(device=summary), api=api)
+                d.name = 'device-%s' % n
+                d.get_json()
+        return op
+    def names(self):
+        return [n[6:] for n in dir(self) if n.startswith('bench_')]
+    def run(self, name, memory=True):
+        iterations = 1 if name == 'get_json' else self.iterations
+        op = getattr(self, 'bench_%s' % name)()
+        gc.collect()
+        before, latencies = self.server.total_requests(), []
+        start = time.perf_counter()
+        for i in range(iterations):
+            t = time.perf_counter()
+            op(i)
+            latencies.append(time.perf_counter() - t)
+        elapsed     = time.perf_counter() - start
+        requests    = self.server.total_requests() - before
+        peak        = None
+        if memory:
+            # separate run, tracemalloc would distort the timings
+            op = getattr(self, 'bench_%s' % name)()
+            gc.collect()
+            tracemalloc.start()
+            op(iterations)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return summarize(latencies, elapsed, requests, peak)
+
+def run(iterations=20, objects=100000, only=None, memory=True, latency=0.0, **inventory):
+    """start a stand-in server with an Inventory(**inventory), run the benchmarks and return the results"""
+    with FakeDevice42Server(Inventory(**inventory), latency=latency) as srv:
+        b = Benchmarks(srv, iterations, objects)
+        results = dict(version=version(), python=platform.python_version(), platform=platform.platform(),
+                       time=time.time(), iterations=iterations, objects=objects, latency=latency,
+                       inventory=dict(inventory, devices=len(srv.inventory.devices)), benchmarks={})
+        for name in b.names():
+            if only and name not in only:   continue
+            results['benchmarks'][name] = b.run(name, memory)
+    return results
+
+def compare(results, baseline, threshold=0.1):
+    """return (name, metric, baseline, current) for every p50/p95 latency, request count or peak memory
+    which got worse by more than threshold compared to the baseline results"""
+    regressions = []
+    for name, r in results['benchmarks'].items():
+        b = baseline['benchmarks'].get(name, None)
+        if b == None:   continue
+        for metric in ('p50', 'p95', 'requests_per_operation', 'peak_memory'):
+            if r.get(metric) == None or not b.get(metric):  continue
+            if r[metric] > b[metric] * (1 + threshold):
+                regressions.append((name, metric, b[metric], r[metric]))
+    return regressions
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='benchmark device42api against a local stand-in server')
+    p.add_argument('--iterations', type=int, default=20)
+    p.add_argument('--objects', type=int, default=100000, help='objects serialized by the get_json benchmark')
+    p.add_argument('--only', action='append', help='run only this benchmark (repeatable)')
+    p.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    p.add_argument('--latency', type=float, default=0.0, help='seconds the server adds to every request')
+    p.add_argument('--buildings', type=int, default=1)
+    p.add_argument('--rooms-per-building', type=int, default=2)
+    p.add_argument('--racks-per-room', type=int, default=5)
+    p.add_argument('--devices-per-rack', type=int, default=20)
+    p.add_argument('--output', default=None, help='write the results as JSON to this file')
+    p.add_argument('--compare', default=None, help='JSON results of a previous run to compare with')
+    p.add_argument('--threshold', type=float, default=0.1, help='relative change reported as regression')
+    args = p.parse_args(argv)
+    results = run(args.iterations, args.objects, args.only, not args.no_memory, args.latency,
+                  buildings=args.buildings, rooms_per_building=args.rooms_per_building,
+                  racks_per_room=args.racks_per_room, devices_per_rack=args.devices_per_rack)
+    print(u'%-24s %10s %10s %10s %10s %8s %12s' % ('benchmark', 'ops/s', 'p50', 'p95', 'p99', 'req/op', 'peak mem'))
+    for name, r in sorted(results['benchmarks'].items()):
+        print(u'%-24s %10.1f %10.4f %10.4f %10.4f %8.1f %12s' % (name, r['throughput'] or 0, r['p50'], r['p95'],
+              r['p99'], r['requests_per_operation'] or 0, r['peak_memory']))
+    if args.output != None:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    if args.compare != None:
+        with open(args.compare) as fp:
+            regressions = compare(results, json.load(fp), args.threshold)
+        for name, metric, before, after in regressions:
+            print(u'REGRESSION %s %s %s -> %s' % (name, metric, before, after))
+        if regressions:     return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+""".. _bulk:
+
+bulk operations on many objects at once, the requests run concurrently on up to workers threads
+sharing one Device42API and the results are aggregated instead of returned one by one
+
+custom fields are given as (object, key, value) or (object, key, value, type) tuples, values equal to
+the custom_fields the objects were loaded with are skipped, of several values for the same object and
+key the last one is written
+
+>>> from device42api import bulk
+>>> devices = [d for r in api.get_rack() for d in r.devices.values()]
+>>> bulk.set_custom_fields(api, [(d, 'owner', 'ops') for d in devices] +
+...                             [(d, 'checked', '2014-04-02', 'date') for d in devices], workers=16)
+{'updated': 61234, 'unchanged': 38766, 'duplicates': 0, 'failed': 0, 'errors': []}
+
+the interfaces of a device are given as (port_name, mac, ips) tuples, the new macs are added first and
+then the new ips, both concurrently, the mac_addresses and ip_addresses of the device are extended
+without loading it again
+
+>>> d = api.get_device(name='web01')
+>>> bulk.add_interfaces(d, [('eth0', '00:11:22:33:44:55', ['10.0.0.10', '10.0.0.11']),
+...                         ('eth1', '00:11:22:33:44:66', '192.168.0.10')])
+{'macs': 1, 'ips': 2, 'skipped': 2, 'failed': 0, 'errors': []}
+
+"""
+
+from concurrent.futures import Future
+import device42api
+from device42api import Device42APIObjectException, normalize_mac
+
+# custom field API path of the objects added through CustomField, devices use CustomFieldDevice
+CUSTOM_FIELD_PATHS = {
+    device42api.Building:   'building',
+    device42api.Room:       'room',
+    device42api.Rack:       'rack',
+    device42api.Asset:      'asset',
+    device42api.Customer:   'customer',
+}
+
+def _response(rsp):
+    """return the response of a save(), waiting for it if the request was queued by a WriteBehind"""
+    if isinstance(rsp, Future):     return rsp.result()
+    return rsp
+
+def custom_field(obj, key, value, type=None, notes=None):
+    """return the (not saved) CustomField or CustomFieldDevice setting key of obj to value"""
+    if isinstance(obj, device42api.Device):
+        cf = device42api.CustomFieldDevice(api=obj.api)
+    elif obj.__class__ in CUSTOM_FIELD_PATHS:
+        cf = device42api.CustomField(api=obj.api)
+        cf._api_path = CUSTOM_FIELD_PATHS[obj.__class__]
+    else:
+        raise Device42APIObjectException(u'%s has no custom fields' % obj.__class__.__name__)
+    cf.name     = obj.name
+    cf.key      = key
+    cf.value    = value
+    if type != None:    cf.type = type
+    if notes != None:   cf.notes = notes
+    return cf
+
+def _current(obj, key):
+    """return the custom field key of obj as loaded (a dict of the response, load() keeps them unparsed)
+    or added (a CustomField), None if unknown"""
+    for cf in obj.custom_fields:
+        if isinstance(cf, dict) and cf.get('key', None) == key:     return cf
+        if getattr(cf, 'key', None) == key:     return cf
+    return None
+def _value(cf):
+    return cf.get('value', '') if isinstance(cf, dict) else getattr(cf, 'value', '')
+
+def set_custom_fields(api, items, workers=None):
+    """write the custom fields of the (object, key, value[, type]) tuples in items concurrently, return the
+    number of updated, unchanged and duplicate (overwritten by a later tuple) fields and the failures as
+    errors [(object name, key, error)], the custom_fields of the objects are updated"""
+    latest, duplicates = {}, 0
+    for item in items:
+        if len(item) not in (3, 4):
+            raise Device42APIObjectException(u'need (object, key, value) or (object, key, value, type), got %r' % (item,))
+        if (id(item[0]), item[1]) in latest:    duplicates += 1
+        latest[(id(item[0]), item[1])] = item
+    changed, unchanged = [], 0
+    for item in latest.values():
+        obj, key, value = item[:3]
+        cf = _current(obj, key)
+        if cf != None and u'%s' % _value(cf) == u'%s' % value:
+            unchanged += 1
+        else:
+            changed.append(item)
+    def save(item):
+        obj, key, value = item[:3]
+        try:
+            cf  = custom_field(obj, key, value, item[3] if len(item) > 3 else None)
+            if cf.api == None:  cf.api = api
+            rsp = _response(cf.save())
+        except Exception as e:
+            return e
+        if not (isinstance(rsp, dict) and rsp.get('code', 1) == 0):
+            return rsp
+        current = _current(obj, key)
+        if isinstance(current, dict):
+            current['value'] = value
+        elif current != None:
+            current.value = value
+        else:
+            obj.custom_fields.append(cf)
+        return None
+    errors = [(item[0].name, item[1], e) for item, e in zip(changed, api.parallel(save, changed, workers)) if e != None]
+    return dict(updated=len(changed) - len(errors), unchanged=unchanged, duplicates=duplicates,
+                failed=len(errors), errors=errors)
+
+def _address(obj, attr):
+    """return the address attr of an ip address of a device in lower case, None if unknown"""
+    v = getattr(obj, attr, None) if obj else None
+    if v == None or isinstance(v, (device42api.Required, device42api.Optional)):    return None
+    return (u'%s' % v).lower()
+
+def add_interfaces(device, interfaces, workers=None):
+    """add the (port_name, mac, ips) interfaces of device, mac may be None for ips without mac and ips one
+    address or a list of them, addresses the device already has are skipped, the macs are added before
+    their ips, return the number of added macs and ips, skipped addresses and failures as errors
+    [(address, error)], the ips of a failed mac count as failures as well"""
+    api     = device.api
+    macs    = set(normalize_mac(getattr(m, 'macaddress', None)) for m in device.mac_addresses) - set([None])
+    ips     = set(_address(i, 'ipaddress') for i in device.ip_addresses) - set([None])
+    new_macs, new_ips, skipped = [], [], 0
+    for port_name, mac, addresses in interfaces:
+        if isinstance(addresses, str):  addresses = [addresses]
+        if mac != None:
+            if normalize_mac(mac) in macs:
+                skipped += 1
+            else:
+                macs.add(normalize_mac(mac))
+                new_macs.append((port_name, mac))
+        for ip in addresses or []:
+            if ip.lower() in ips:
+                skipped += 1
+            else:
+                ips.add(ip.lower())
+                new_ips.append((ip, mac))
+    def save(obj):
+        try:
+            rsp = _response(obj.save())
+        except Exception as e:
+            return e
+        if not (isinstance(rsp, dict) and rsp.get('code', 1) == 0):
+            return rsp
+        return None
+    def mac_address(item):
+        mc = device42api.IPAM_macaddress(api=api)
+        mc.macaddress   = item[1]
+        if item[0] != None:     mc.port_name = item[0]
+        mc.device       = device.name
+        return mc
+    def ip_address(item):
+        ip = device42api.IPAM_ipaddress(api=api)
+        ip.ipaddress    = item[0]
+        if item[1] != None:     ip.macaddress = item[1]
+        ip.device       = device.name
+        ip.type         = 'static'
+        return ip
+    errors, failed_macs, added = [], set(), dict(macs=0, ips=0)
+    objects = [mac_address(m) for m in new_macs]
+    for mc, e in zip(objects, api.parallel(save, objects, workers)):
+        if e != None:
+            errors.append((mc.macaddress, e))
+            failed_macs.add(normalize_mac(mc.macaddress))
+        else:
+            added['macs'] += 1
+            device.mac_addresses.append(mc)
+    objects = []
+    for ip, mac in new_ips:
+        if mac != None and normalize_mac(mac) in failed_macs:
+            errors.append((ip, u'mac %s failed' % mac))
+        else:
+            objects.append(ip_address((ip, mac)))
+    for ip, e in zip(objects, api.parallel(save, objects, workers)):
+        if e != None:
+            errors.append((ip.ipaddress, e))
+        else:
+            added['ips'] += 1
+            device.ip_addresses.append(ip)
+    return dict(added, skipped=skipped, failed=len(errors), errors=errors)
@@ -0,0 +1,236 @@
+#!/usr/bin/python
+""".. _columnar:
+
+columnar export of the devices, assets and ip addresses collections for analytics, the collection
+response is streamed and its items are appended to typed columns directly (no Device/Asset objects),
+the result is a pyarrow.Table, written as Parquet, Arrow IPC file or stream, or a NumPy structured array if
+pyarrow isn't installed (`pip install -e ".[columnar]"`)
+
+    $ python -m device42api.columnar --host d42 --username admin --password changeme devices devices.parquet
+
+>>> from device42api import columnar
+>>> t = columnar.table(api, 'devices')
+>>> t.schema.field('memory').type, t.num_rows
+(DataType(double), 3200)
+>>> columnar.export(api, 'ips', 'ips.arrow')
+6400
+>>> pyarrow.ipc.open_file('ips.arrow').read_all().num_rows
+6400
+>>> # without pyarrow
+>>> a = columnar.table(api, 'assets', backend='numpy')
+>>> a['size'].sum()
+64.0
+
+"""
+
+import argparse
+import math
+import sys
+import device42api
+from device42api import Device42APIObjectException
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# collection: (path, key of the array, ((column, type), ...)), category columns are dictionary encoded
+SCHEMAS = dict(
+    devices = ('devices/all/', 'Devices', (
+        ('device_id', 'int'), ('name', 'str'), ('serial_no', 'str'), ('asset_no', 'str'), ('type', 'str'),
+        ('hw_model', 'str'), ('service_level', 'category'), ('in_service', 'bool'), ('os', 'str'),
+        ('osver', 'str'), ('memory', 'float'), ('cpucount', 'int'), ('cpucore', 'int'), ('hddcount', 'int'),
+        ('hddsize', 'float'), ('customer', 'str'), ('uuid', 'str'), ('rack_id', 'int'), ('start_at', 'float'))),
+    assets  = ('assets/', 'assets', (
+        ('asset_id', 'int'), ('name', 'str'), ('type', 'str'), ('serial_no', 'str'), ('vendor', 'str'),
+        ('building', 'str'), ('room', 'str'), ('rack_id', 'int'), ('start_at', 'float'), ('size', 'float'),
+        ('service_level', 'category'), ('customer_id', 'int'))),
+    ips     = ('ips/', 'ips', (
+        ('id', 'int'), ('ip', 'str'), ('label', 'str'), ('subnet', 'str'), ('type', 'str'), ('device', 'str'),
+        ('macaddress', 'str'))),
+)
+
+def _float(v):
+    if v == None or v == '':    return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+def _int(v):
+    v = _float(v)
+    if v == None or math.isnan(v):  return None
+    return int(v)
+def _bool(v):
+    if v == None or v == '':    return None
+    if isinstance(v, bool):     return v
+    return u'%s' % v in ('yes', 'Yes', 'true', 'True', '1')
+def _str(v):
+    if v == None:   return None
+    return v if isinstance(v, str) else u'%s' % v
+
+CONVERTERS  = dict(float=_float, int=_int, bool=_bool, str=_str, category=_str)
+# NumPy has no nulls, missing values become nan, -1, False or None
+NUMPY_TYPES = dict(float=('f8', float('nan')), int=('i8', -1), bool=('?', False), str=('O', None), category=('O', None))
+
+def backends():
+    """return the usable backends, pyarrow first"""
+    return [n for n, m in (('arrow', pyarrow), ('numpy', numpy)) if m != None]
+
+class ColumnBuilder(object):
+    """.. _ColumnBuilder:
+
+    collects the values of the items of a collection column by column and turns them into a
+    pyarrow.RecordBatch or a NumPy structured array
+
+    >>> b = ColumnBuilder(SCHEMAS['assets'][2])
+    >>> b.append({'asset_id': 1, 'size': '2', 'service_level': 'Production'})
+    >>> b.numpy()['size']
+    array([2.])
+
+    """
+    def __init__(self, columns):
+        self.columns    = tuple(columns)
+        self._convert   = [(name, CONVERTERS[kind]) for name, kind in self.columns]
+        self.clear()
+    def clear(self):
+        self.values = dict((name, []) for name, kind in self.columns)
+        self.rows   = 0
+    def append(self, item):
+        for name, convert in self._convert:
+            self.values[name].append(convert(item.get(name, None)))
+        self.rows += 1
+    def arrow_schema(self):
+        types = dict(float=pyarrow.float64(), int=pyarrow.int64(), bool=pyarrow.bool_(), str=pyarrow.string(),
+                     category=pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+        return pyarrow.schema([(name, types[kind]) for name, kind in self.columns])
+    def arrow(self):
+        """return the collected rows as pyarrow.RecordBatch"""
+        schema, arrays = self.arrow_schema(), []
+        for name, kind in self.columns:
+            if kind == 'category':
+                arrays.append(pyarrow.array(self.values[name], pyarrow.string()).dictionary_encode())
+            else:
+                arrays.append(pyarrow.array(self.values[name], schema.field(name).type))
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+    def numpy_dtype(self):
+        return numpy.dtype([(name, NUMPY_TYPES[kind][0]) for name, kind in self.columns])
+    def numpy(self):
+        """return the collected rows as NumPy structured array"""
+        a = numpy.empty(self.rows, dtype=self.numpy_dtype())
+        for name, kind in self.columns:
+            missing = NUMPY_TYPES[kind][1]
+            a[name] = [missing if v == None else v for v in self.values[name]]
+        return a
+
+def _backend(backend):
+    if backend == None:
+        if not backends():
+            raise Device42APIObjectException(u'pyarrow or numpy is needed for the columnar export')
+        return backends()[0]
+    if backend not in ('arrow', 'numpy'):
+        raise Device42APIObjectException(u'backend must be arrow or numpy')
+    if backend not in backends():
+        raise Device42APIObjectException(u'%s is not installed' % ('pyarrow' if backend == 'arrow' else 'numpy'))
+    return backend
+
+def batches(api, collection, columns=None, batch_size=65536, backend=None):
+    """yield the collection as RecordBatches (arrow) or structured arrays (numpy) of at most batch_size rows
+    while its response is streamed, columns limits the export to these columns of the schema"""
+    if collection not in SCHEMAS:
+        raise Device42APIObjectException(u'unknown collection "%s", use one of %s' % (collection, ', '.join(sorted(SCHEMAS))))
+    backend = _backend(backend)
+    path, key, schema = SCHEMAS[collection]
+    if columns != None:
+        schema = [c for c in schema if c[0] in columns]
+    builder = ColumnBuilder(schema)
+    for item in api.__stream_api__(path, key):
+        builder.append(item)
+        if builder.rows >= batch_size:
+            yield builder.arrow() if backend == 'arrow' else builder.numpy()
+            builder.clear()
+    if builder.rows or backend == 'numpy':
+        yield builder.arrow() if backend == 'arrow' else builder.numpy()
+
+def table(api, collection, columns=None, batch_size=65536, backend=None):
+    """return the collection as pyarrow.Table or, with backend='numpy' or without pyarrow, NumPy structured array"""
+    backend = _backend(backend)
+    parts   = list(batches(api, collection, columns, batch_size, backend))
+    if backend == 'numpy':
+        return numpy.concatenate(parts) if len(parts) > 1 else parts[0]
+    if not parts:
+        schema = [c for c in SCHEMAS[collection][2] if columns == None or c[0] in columns]
+        return ColumnBuilder(schema).arrow_schema().empty_table()
+    return pyarrow.Table.from_batches(parts)
+
+def export(api, collection, filename, columns=None, batch_size=65536, format=None):
+    """write the collection to filename and return the number of rows, the format is taken from the name
+    unless given: parquet (.parquet), arrow IPC file (.arrow), arrow IPC stream (.arrows, .ipc) or numpy (.npy)
+
+    the category columns of every batch carry their own dictionary, which the IPC file format doesn't allow
+    (it has one dictionary per column for the whole file), for arrow the whole table is read and its
+    dictionaries unified before it's written, parquet and arrows are written batch by batch, read the stream
+    with pyarrow.ipc.open_stream(filename).read_all()"""
+    if format == None:
+        ext = filename.rsplit('.', 1)[-1].lower()
+        format = dict(parquet='parquet', arrow='arrow', arrows='arrows', ipc='arrows', npy='numpy').get(ext, None)
+    if format not in ('parquet', 'arrow', 'arrows', 'numpy'):
+        raise Device42APIObjectException(u'format must be parquet, arrow, arrows or numpy')
+    if format == 'numpy':
+        a = table(api, collection, columns, batch_size, 'numpy')
+        # object columns (strings) need pickle, numpy.load(filename, allow_pickle=True) reads it back
+        numpy.save(filename, a, allow_pickle=True)
+        return len(a)
+    _backend('arrow')
+    if format == 'arrow':
+        t = table(api, collection, columns, batch_size, 'arrow').unify_dictionaries()
+        with pyarrow.ipc.new_file(filename, t.schema) as writer:
+            writer.write_table(t)
+        return t.num_rows
+    path, key, schema = SCHEMAS[collection]
+    if columns != None:
+        schema = [c for c in schema if c[0] in columns]
+    schema  = ColumnBuilder(schema).arrow_schema()
+    rows    = 0
+    if format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(filename, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(filename, schema)
+    try:
+        # every batch is written when complete, memory is bounded by batch_size rows
+        for b in batches(api, collection, columns, batch_size, 'arrow'):
+            if format == 'parquet':
+                writer.write_batch(b)
+            else:
+                writer.write(b)
+            rows += b.num_rows
+    finally:
+        writer.close()
+    return rows
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='export devices, assets or ips of device42 as Parquet, Arrow or NumPy file')
+    p.add_argument('collection', choices=sorted(SCHEMAS))
+    p.add_argument('filename', help='.parquet, .arrow (IPC file), .arrows/.ipc (IPC stream) or .npy')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=443)
+    p.add_argument('--username', default='admin')
+    p.add_argument('--password', default='changeme')
+    p.add_argument('--scheme', default='https')
+    p.add_argument('--columns', default=None, help='comma separated subset of the columns')
+    p.add_argument('--batch-size', type=int, default=65536)
+    p.add_argument('--format', default=None, choices=('parquet', 'arrow', 'arrows', 'numpy'))
+    args = p.parse_args(argv)
+    api = device42api.Device42API(host=args.host, port=args.port, username=args.username, password=args.password,
+                                  scheme=args.scheme, noInit=True)
+    rows = export(api, args.collection, args.filename, args.columns.split(',') if args.columns else None,
+                  args.batch_size, args.format)
+    print(u'%s rows written to %s' % (rows, args.filename))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/python
+""".. _dnssync:
+
+batch synchronisation of the A (AAAA) and PTR records of many ip addresses, the records the (ip, device)
+pairs should have are compared with the dns/records read in one streamed request and only the missing or
+changed ones are written, concurrently, instead of two sequential requests per address like
+IPAM_ipaddress.save_dnsRecord()
+
+records left behind by renamed devices or moved addresses, with the name or address of a desired record
+but not desired themselves, are reported as stale, the API can't delete them, remove them in the GUI
+
+>>> from device42api.dnssync import DNSSync
+>>> sync = DNSSync(api, ttl=3600, workers=16)
+>>> plan = sync.plan((ip, ip.parent) for d in devices for ip in d.ip_addresses)
+>>> plan.summary()
+{'create': 12, 'update': 3, 'unchanged': 1985, 'stale': 1}
+>>> print(plan.report())
++ A web03.example.com 10.0.0.13
+~ PTR 12.0.0.10.in-addr.arpa web02.example.com (content web02-old.example.com -> web02.example.com)
+- A web02-old.example.com 10.0.0.12
+>>> sync.apply(plan)
+{'written': 15, 'failed': 0, 'errors': []}
+>>> # or both at once
+>>> sync.sync(pairs).result
+{'written': 15, 'failed': 0, 'errors': []}
+
+"""
+
+import ipaddress
+from concurrent.futures import Future
+import device42api
+from device42api import Device42APIObjectException
+
+# record types written for the addresses
+TYPES = ('A', 'AAAA', 'PTR')
+# fields compared besides the identity, the content of a PTR record is compared as its name identifies it
+FIELDS = ('content', 'ttl', 'nameserver')
+
+def _text(v):
+    if v == None or isinstance(v, (device42api.Required, device42api.Optional)):   return ''
+    return (u'%s' % v).strip().rstrip('.').lower()
+
+def _domain(name):
+    return '.'.join(name.split('.')[1:])
+
+def records(ip, name, ttl=86400, nameserver=None):
+    """return the forward (A or AAAA) and reverse (PTR) record dicts of address ip for the fqdn name"""
+    address = ipaddress.ip_address(u'%s' % ip)
+    reverse = address.reverse_pointer
+    forward = dict(type='A' if address.version == 4 else 'AAAA', name=name, domain=_domain(name),
+                   content=str(address), ttl=int(ttl))
+    ptr     = dict(type='PTR', name=reverse, domain=_domain(reverse), content=name, ttl=int(ttl))
+    if nameserver != None:
+        forward['nameserver'] = ptr['nameserver'] = nameserver
+    return [forward, ptr]
+
+def _key(record):
+    """return the identity of a record, type and name for PTR records, type, name and content otherwise as a
+    name might have several addresses"""
+    kind = _text(record.get('type')).upper()
+    return (kind, _text(record.get('name')), _text(record.get('content')) if kind != 'PTR' else '')
+
+class Plan(object):
+    """.. _dnssync.Plan:
+
+    the records DNSSync.plan() found missing (create), differing in content, ttl or nameserver (update), unchanged
+    and stale, every one a record dict, update as (current, desired), result is the return value of
+    DNSSync.apply() once the plan is applied by DNSSync.sync()
+
+    """
+    def __init__(self, create, update, unchanged, stale):
+        self.create     = create
+        self.update     = update
+        self.unchanged  = unchanged
+        self.stale      = stale
+        self.result     = None
+    def pending(self):
+        """return the records which need a write"""
+        return self.create + [d for c, d in self.update]
+    def summary(self):
+        return dict(create=len(self.create), update=len(self.update), unchanged=len(self.unchanged), stale=len(self.stale))
+    def report(self):
+        """return one line per record to write (+ and ~) and per stale record (-)"""
+        lines = [u'+ %s %s %s' % (r['type'], r['name'], r['content']) for r in self.create]
+        for c, d in self.update:
+            lines.append(u'~ %s %s %s (%s)' % (d['type'], d['name'], d['content'], ', '.join(u'%s %s -> %s' %
+                         (k, c.get(k, ''), d[k]) for k in FIELDS if k in d and _text(c.get(k)) != _text(d[k]))))
+        lines += [u'- %s %s %s' % (r.get('type'), r.get('name'), r.get('content')) for r in self.stale]
+        return '\n'.join(lines)
+
+class DNSSync(object):
+    """.. _DNSSync:
+
+    computes and writes the DNS records of (ip, device) pairs, ip is an IPAM_ipaddress or an address, device
+    a Device or a name, the name must be the fqdn of the device as for IPAM_ipaddress.save_dnsRecord()
+
+    """
+    def __init__(self, api, ttl=86400, nameserver=None, workers=None):
+        self.api        = api
+        self.ttl        = ttl
+        self.nameserver = nameserver
+        self.workers    = workers
+    def desired(self, pairs):
+        """return the record dicts for the (ip, device) pairs, of several records for one name and content the last one"""
+        wanted = {}
+        for ip, device in pairs:
+            if isinstance(ip, device42api.IPAM_ipaddress):  ip = ip.ipaddress
+            name = device.name if isinstance(device, device42api.Device) else device
+            if not _text(ip) or not _text(name):
+                raise Device42APIObjectException(u'need an address and a device name, got %r, %r' % (ip, name))
+            for r in records(ip, u'%s' % name, self.ttl, self.nameserver):
+                wanted[_key(r)] = r
+        return list(wanted.values())
+    def current(self):
+        """return the A, AAAA and PTR records of device42, streamed from dns/records/"""
+        return [r for r in self.api.__stream_api__('dns/records/', 'records') if _text(r.get('type')).upper() in TYPES]
+    def plan(self, pairs):
+        """return the Plan for the pairs without writing anything"""
+        desired = self.desired(pairs)
+        current = dict((_key(r), r) for r in self.current())
+        create, update, unchanged = [], [], []
+        for d in desired:
+            c = current.get(_key(d), None)
+            if c == None:
+                create.append(d)
+            elif any(_text(c.get(k)) != _text(d[k]) for k in FIELDS if k in d):
+                update.append((c, d))
+            else:
+                unchanged.append(d)
+        # forward records sharing the name or the address of a desired one, reverse ones the name or the host
+        names   = set((d['type'] == 'PTR', _text(d['name'])) for d in desired)
+        values  = set((d['type'] == 'PTR', _text(d['content'])) for d in desired)
+        keys    = set(_key(d) for d in desired)
+        stale   = [c for k, c in current.items() if k not in keys and
+                   ((k[0] == 'PTR', k[1]) in names or (k[0] == 'PTR', _text(c.get('content'))) in values)]
+        return Plan(create, update, unchanged, stale)
+    def __save__(self, record):
+        r = device42api.IPAM_DNSRecord(api=self.api)
+        for k, v in record.items():
+            setattr(r, k, v)
+        try:
+            rsp = r.save()
+            if isinstance(rsp, Future):     rsp = rsp.result()
+        except Exception as e:
+            return e
+        if not (isinstance(rsp, dict) and rsp.get('code', 1) == 0):
+            return rsp
+        return None
+    def apply(self, plan):
+        """write the missing and changed records of plan concurrently, return the number written and the
+        failures as errors [(record, error)]"""
+        pending = plan.pending()
+        errors  = [(r, e) for r, e in zip(pending, self.api.parallel(self.__save__, pending, self.workers)) if e != None]
+        return dict(written=len(pending) - len(errors), failed=len(errors), errors=errors)
+    def sync(self, pairs, dry_run=False):
+        """plan and, unless dry_run, apply, return the Plan with the result of apply as plan.result"""
+        plan = self.plan(pairs)
+        if not dry_run:
+            plan.result = self.apply(plan)
+        return plan
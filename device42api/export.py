@@ -0,0 +1,185 @@
+#!/usr/bin/python
+""".. _export:
+
+streaming export of the inventory to JSON lines (gzip compressed if the name ends with .gz), the walk
+buildings > rooms > racks > devices/assets > ip/mac addresses writes every object as soon as it's
+loaded, devices and assets are loaded by a pool of workers and a bounded queue between the workers
+and the writer keeps the memory flat however large the inventory is
+
+every line holds the class, the API id, the parent and the attributes get_json() would send
+
+    {"type": "Device", "id": 12, "parent": ["Rack", 3], "json": {"name": "web01", "serial_no": "SN1", ...}}
+
+    $ python -m device42api.export --host d42 --username admin --password changeme --output inventory.jsonl.gz
+
+>>> from device42api.export import Exporter
+>>> Exporter(api, 'inventory.jsonl.gz', workers=16).run()
+{'Building': 2, 'Room': 4, 'Rack': 16, 'Device': 320, 'Asset': 32, 'IPAM_ipaddress': 640, 'IPAM_macaddress': 640, 'errors': 0}
+
+"""
+
+import argparse
+import contextvars
+import gzip
+import logging
+import queue
+import sys
+import threading
+import simplejson as json
+from concurrent.futures import ThreadPoolExecutor
+import device42api
+
+log = logging.getLogger('device42api.export')
+
+def _open(filename):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'wt', encoding='utf-8')
+    return open(filename, 'w', encoding='utf-8')
+
+def _unwrap(obj):
+    """return the object behind a LazyObject proxy"""
+    if isinstance(obj, device42api.LazyObject):
+        return object.__getattribute__(obj, '_lazy_obj')
+    return obj
+
+class Exporter(object):
+    """.. _Exporter:
+
+    writes the inventory reachable from the buildings to output (file name or file object), at most
+    queue_size lines wait for the writer and at most 2 * workers devices/assets are loaded ahead of it
+
+    * mac_ids=True      # resolve the mac addresses of devices through get_macid_byAddress (one macs/
+                        # request, the macs are kept by the api) to export their ids, otherwise the mac,
+                        # port and vlan of the device response are written
+
+    >>> with open('inventory.jsonl', 'w') as fp:
+    ...     Exporter(api, fp, workers=8, queue_size=500).run()
+
+    """
+    def __init__(self, api, output, workers=8, queue_size=1000, mac_ids=False):
+        self.api        = api
+        self.output     = output
+        self.workers    = max(int(workers), 1)
+        self.queue_size = int(queue_size)
+        self.mac_ids    = mac_ids
+        self._lock      = threading.Lock()
+        self._queue     = None
+        self._failure   = None
+        self.counts     = {}
+        self.errors     = 0
+    def emit(self, obj, parent=None):
+        """queue one line for obj, blocks while the queue is full"""
+        obj = _unwrap(obj)
+        line = dict(type=obj.__class__.__name__, id=obj.__object_id__(), json=obj.__values__(),
+                    parent=[parent.__class__.__name__, parent.__object_id__()] if parent != None else None)
+        self._queue.put(line)
+    def __write__(self, fp):
+        while True:
+            line = self._queue.get()
+            if line == None:    break
+            # after a failed write the queue is still drained, the workers must not block on it
+            if self._failure != None:   continue
+            try:
+                fp.write(json.dumps(line) + '\n')
+            except Exception as e:
+                self._failure = e
+                continue
+            with self._lock:
+                self.counts[line['type']] = self.counts.get(line['type'], 0) + 1
+    def __error__(self, obj, error):
+        log.warning(u'loading %s %s failed: %s', obj.__class__.__name__, obj.__object_id__(), error)
+        with self._lock:
+            self.errors += 1
+    def __load__(self, obj, parent, slots):
+        try:
+            if isinstance(obj, device42api.Device):
+                obj.load(lazy=not self.mac_ids)
+            else:
+                obj.load()
+        except Exception as e:
+            self.__error__(obj, e)
+        else:
+            self.emit(obj, parent)
+            if isinstance(obj, device42api.Device):
+                self.__addresses__(obj)
+        finally:
+            slots.release()
+    def __addresses__(self, device):
+        for ip in device.ip_addresses:
+            self.emit(ip, device)
+        if self.mac_ids:
+            for m in device.mac_addresses:
+                if m:   self.emit(m, device)
+            return
+        for m in device._json.get('mac_addresses', None) or []:
+            if not m:   continue
+            self.emit(device42api.IPAM_macaddress(json=dict(macaddress=m.get('mac'), port_name=m.get('port_name'),
+                                                            vlan_id=m.get('vlan')), parent=device), device)
+    def __rack__(self, rack):
+        try:
+            rack.load(lazy=True)
+        except Exception as e:
+            self.__error__(rack, e)
+            return []
+        self.emit(rack, rack.parent)
+        return [(_unwrap(c), rack) for c in list(rack.devices.values()) + list(rack.assets.values())]
+    def __walk__(self, pool, slots):
+        api, buildings = self.api, {}
+        for b in api.__stream_api__('buildings/', 'buildings'):
+            building = buildings[b.get('name')] = device42api.Building(json=b, api=api)
+            self.emit(building)
+        for r in api.__stream_api__('rooms/', 'rooms'):
+            room = device42api.Room(json=r, api=api)
+            try:
+                room.load(lazy=True)
+            except Exception as e:
+                self.__error__(room, e)
+                continue
+            self.emit(room, buildings.get(room.building, None))
+            children = [(_unwrap(c), room) for c in room.devices + room.assets]
+            for loaded in api.parallel(self.__rack__, [_unwrap(k) for k in room.racks], self.workers):
+                children.extend(loaded)
+            for obj, parent in children:
+                # bounded look ahead, the workers block on the full queue while the writer is behind
+                slots.acquire()
+                pool.submit(contextvars.copy_context().run, self.__load__, obj, parent, slots)
+    def run(self):
+        """export everything and return the number of lines per type and the number of objects failing to load"""
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self.counts, self.errors, self._failure = {}, 0, None
+        fp      = _open(self.output) if isinstance(self.output, str) else self.output
+        writer  = threading.Thread(target=self.__write__, args=(fp,), name='device42api-export-writer', daemon=True)
+        writer.start()
+        slots   = threading.BoundedSemaphore(2 * self.workers)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                self.__walk__(pool, slots)
+        finally:
+            self._queue.put(None)
+            writer.join()
+            if isinstance(self.output, str):    fp.close()
+        if self._failure != None:
+            raise device42api.Device42APIObjectException(u'writing the export failed: %s' % self._failure)
+        return dict(self.counts, errors=self.errors)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='export the device42 inventory to JSON lines')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=443)
+    p.add_argument('--username', default='admin')
+    p.add_argument('--password', default='changeme')
+    p.add_argument('--scheme', default='https')
+    p.add_argument('--output', required=True, help='JSON lines file, .gz is written compressed')
+    p.add_argument('--workers', type=int, default=8)
+    p.add_argument('--queue-size', type=int, default=1000)
+    p.add_argument('--mac-ids', action='store_true', help='export the ids of the mac addresses')
+    args = p.parse_args(argv)
+    api = device42api.Device42API(host=args.host, port=args.port, username=args.username, password=args.password,
+                                  scheme=args.scheme, noInit=True, workers=args.workers)
+    counts = Exporter(api, args.output, args.workers, args.queue_size, args.mac_ids).run()
+    for k, n in sorted(counts.items()):
+        print(u'%-20s %s' % (k, n))
+    return 1 if counts['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/python
+""".. _importer:
+
+streaming import of discovery exports (CSV or JSON lines, gzip compressed if the name ends with .gz) into
+device42, the rows are read one by one, mapped onto Device/Asset/IPAM_* objects by a Mapping and saved
+by a pool of workers sharing one Device42API, memory is bounded by the rows in flight
+
+the position (all rows before it are done) is written to a checkpoint file, an interrupted run started
+again with the same checkpoint continues there, rows after the position which were already saved are
+saved once more, which is harmless as the API adds or updates by name
+
+    $ python -m device42api.importer --host d42 --username admin --password changeme \\
+    >       --mapping devices.json --checkpoint discovery.ckpt discovery.csv.gz
+
+>>> from device42api.importer import Mapping, Importer, read_rows
+>>> m = Mapping('device', fields=dict(name='hostname', serial_no='serial', hardware='model', os='os'),
+...             defaults=dict(type='physical'), macs=['mac'], ips=['ip'])
+>>> Importer(api, m, workers=16, checkpoint='discovery.ckpt').run(read_rows('discovery.csv'))
+{'rows': 250000, 'imported': 249996, 'failed': 4, 'skipped': 0, 'position': 250000, 'seconds': 1822.4}
+
+"""
+
+import argparse
+import contextvars
+import csv
+import gzip
+import logging
+import os
+import sys
+import threading
+import time
+import simplejson as json
+from concurrent.futures import ThreadPoolExecutor
+import device42api
+from device42api import Device42APIObjectException
+
+log = logging.getLogger('device42api.importer')
+
+# object classes rows can be mapped onto
+KINDS = dict(device=device42api.Device, asset=device42api.Asset, macaddress=device42api.IPAM_macaddress,
+             ipaddress=device42api.IPAM_ipaddress, subnet=device42api.IPAM_subnet, vlan=device42api.IPAM_vlan,
+             switchport=device42api.IPAM_switchport)
+
+def _open(filename, mode='r'):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 't', encoding='utf-8', newline='')
+    return open(filename, mode, encoding='utf-8', newline='')
+
+def read_rows(filename, format=None, delimiter=','):
+    """yield the rows of a CSV (header line with the column names) or JSON lines file as dicts,
+    format is csv or jsonl, by default taken from the file name"""
+    if format == None:
+        name    = filename[:-3] if filename.endswith('.gz') else filename
+        format  = 'jsonl' if name.endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+    if format not in ('csv', 'jsonl'):
+        raise Device42APIObjectException(u'format must be csv or jsonl')
+    with _open(filename) as fp:
+        if format == 'csv':
+            for row in csv.DictReader(fp, delimiter=delimiter):
+                yield row
+        else:
+            for line in fp:
+                if line.strip():    yield json.loads(line)
+
+def _ok(rsp):
+    """True if rsp is a successful answer of save(), add_mac() or add_ip()"""
+    if rsp is True:     return True
+    return isinstance(rsp, dict) and rsp.get('code', 1) == 0
+
+class Mapping(object):
+    """.. _Mapping:
+
+    maps the columns of a row onto the attributes of one object of kind (see KINDS)
+
+    * fields        # {attribute: column}, empty values are left out
+    * defaults      # {attribute: value} for attributes without column or an empty one
+    * macs          # columns with mac addresses added through Device.add_mac (kind device only)
+    * ips           # columns with ip addresses added through Device.add_ip (kind device only)
+    * port_names    # {mac column: port name column}
+    * separator     # several addresses in one column are separated by it
+
+    >>> m = Mapping('asset', fields=dict(name='label', serial_no='serial'), defaults=dict(type='Patch Panel'))
+    >>> m.object(api, {'label': 'pp-01', 'serial': 'X1'}).get_json()
+    {'type': 'Patch Panel', 'name': 'pp-01', 'serial_no': 'X1'}
+
+    """
+    def __init__(self, kind='device', fields=None, defaults=None, macs=(), ips=(), port_names=None, separator=';'):
+        if kind not in KINDS:
+            raise Device42APIObjectException(u'unknown kind "%s", use one of %s' % (kind, ', '.join(sorted(KINDS))))
+        if (macs or ips) and kind != 'device':
+            raise Device42APIObjectException(u'macs and ips can only be mapped for kind device')
+        self.kind       = kind
+        self.fields     = dict(fields or {})
+        self.defaults   = dict(defaults or {})
+        self.macs       = list(macs)
+        self.ips        = list(ips)
+        self.port_names = dict(port_names or {})
+        self.separator  = separator
+    @classmethod
+    def load(cls, filename):
+        """return the Mapping described by a JSON file with the arguments of the constructor"""
+        with open(filename) as fp:
+            return cls(**json.load(fp))
+    def values(self, row, columns):
+        """return the non empty addresses of columns in row"""
+        values = []
+        for c in columns:
+            for v in (row.get(c) or '').split(self.separator):
+                if v.strip():   values.append(v.strip())
+        return values
+    def object(self, api, row):
+        """return the object of the row, not saved"""
+        obj = KINDS[self.kind](api=api)
+        for k, v in self.defaults.items():
+            setattr(obj, k, v)
+        for k, c in self.fields.items():
+            v = row.get(c, None)
+            if v == None or v == '':    continue
+            setattr(obj, k, v)
+        return obj
+    def save(self, api, row):
+        """save the object of row and add its addresses, raise Device42APIObjectException on the first failure"""
+        obj = self.object(api, row)
+        rsp = obj.save()
+        if not _ok(rsp):
+            raise Device42APIObjectException(u'saving %s failed: %s' % (self.kind, rsp))
+        macs = []
+        for c in self.macs:
+            for mac in self.values(row, [c]):
+                port = row.get(self.port_names[c]) if c in self.port_names else None
+                rsp  = obj.add_mac(mac, port or None)
+                if not _ok(rsp):
+                    raise Device42APIObjectException(u'adding mac %s failed: %s' % (mac, rsp))
+                macs.append(mac)
+        for ip in self.values(row, self.ips):
+            rsp = obj.add_ip(ip, macs[0] if len(macs) == 1 else None)
+            if not _ok(rsp):
+                raise Device42APIObjectException(u'adding ip %s failed: %s' % (ip, rsp))
+        return obj
+
+class Importer(object):
+    """.. _Importer:
+
+    saves the rows of an iterable through a Mapping on workers threads, at most queue_size rows
+    (default 4 * workers) are read ahead of the finished ones
+
+    * checkpoint        # file the position is written to every checkpoint_every rows and at the end
+    * errors            # JSON lines file receiving {"row": index, "error": message, "data": row} of failed rows
+
+    >>> imp = Importer(api, Mapping.load('devices.json'), workers=16, checkpoint='discovery.ckpt', errors='failed.jsonl')
+    >>> imp.run(read_rows('discovery.jsonl.gz'))
+    {'rows': 120000, 'imported': 64000, 'failed': 0, 'skipped': 56000, 'position': 120000, 'seconds': 911.3}
+
+    """
+    def __init__(self, api, mapping, workers=8, checkpoint=None, checkpoint_every=1000, errors=None, queue_size=None):
+        self.api            = api
+        self.mapping        = mapping
+        self.workers        = max(int(workers), 1)
+        self.checkpoint     = checkpoint
+        self.checkpoint_every = int(checkpoint_every)
+        self.errors         = errors
+        self.queue_size     = int(queue_size or 4 * self.workers)
+        self._lock          = threading.Lock()
+        self._errors        = None
+        self.__reset__(0)
+    def __reset__(self, position):
+        self.position   = position
+        self.imported   = 0
+        self.failed     = 0
+        self._done      = set()
+        self._saved     = position
+    def resume(self):
+        """return the position stored in the checkpoint file, 0 without one"""
+        if self.checkpoint == None or not os.path.exists(self.checkpoint):  return 0
+        with open(self.checkpoint) as fp:
+            return int(json.load(fp).get('position', 0))
+    def __save_checkpoint__(self):
+        if self.checkpoint == None:     return
+        tmp = self.checkpoint + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump(dict(position=self.position, imported=self.imported, failed=self.failed, time=time.time()), fp)
+        os.replace(tmp, self.checkpoint)
+        self._saved = self.position
+    def __finish__(self, index, row, error=None):
+        with self._lock:
+            if error == None:
+                self.imported += 1
+            else:
+                self.failed += 1
+                log.warning(u'row %s failed: %s', index, error)
+                if self._errors != None:
+                    self._errors.write(json.dumps(dict(row=index, error=u'%s' % error, data=row)) + '\n')
+            # the position only moves over rows finished without gaps
+            self._done.add(index)
+            while self.position in self._done:
+                self._done.remove(self.position)
+                self.position += 1
+            if self.position - self._saved >= self.checkpoint_every:
+                self.__save_checkpoint__()
+    def __import__(self, index, row, slots):
+        try:
+            self.mapping.save(self.api, row)
+        except Exception as e:
+            self.__finish__(index, row, e)
+        else:
+            self.__finish__(index, row)
+        finally:
+            slots.release()
+    def run(self, rows):
+        """import rows (an iterable of dicts) starting at the checkpoint position and return the counters"""
+        start       = time.perf_counter()
+        position    = self.resume()
+        self.__reset__(position)
+        slots       = threading.BoundedSemaphore(self.queue_size)
+        count       = 0
+        self._errors = open(self.errors, 'a', encoding='utf-8') if self.errors != None else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for index, row in enumerate(rows):
+                    count += 1
+                    if index < position:    continue
+                    slots.acquire()
+                    # every row runs in a copy of the callers context, so a deadline or tracing span is kept
+                    pool.submit(contextvars.copy_context().run, self.__import__, index, row, slots)
+        finally:
+            with self._lock:
+                self.__save_checkpoint__()
+                if self._errors != None:
+                    self._errors.close()
+                    self._errors = None
+        return dict(rows=count, imported=self.imported, failed=self.failed, skipped=min(position, count),
+                    position=self.position, seconds=time.perf_counter() - start)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='import CSV or JSON lines files into device42')
+    p.add_argument('files', nargs='+', help='CSV or JSON lines files, .gz is read compressed')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=443)
+    p.add_argument('--username', default='admin')
+    p.add_argument('--password', default='changeme')
+    p.add_argument('--scheme', default='https')
+    p.add_argument('--mapping', required=True, help='JSON file with kind, fields, defaults, macs, ips, ...')
+    p.add_argument('--format', default=None, choices=('csv', 'jsonl'))
+    p.add_argument('--delimiter', default=',')
+    p.add_argument('--workers', type=int, default=8)
+    p.add_argument('--checkpoint', default=None, help='checkpoint file, one per input file is derived from it')
+    p.add_argument('--checkpoint-every', type=int, default=1000)
+    p.add_argument('--errors', default=None, help='append failed rows to this JSON lines file')
+    args = p.parse_args(argv)
+    api = device42api.Device42API(host=args.host, port=args.port, username=args.username, password=args.password,
+                                  scheme=args.scheme, noInit=True, workers=args.workers)
+    mapping = Mapping.load(args.mapping)
+    failed  = 0
+    for filename in args.files:
+        checkpoint = None
+        if args.checkpoint != None:
+            checkpoint = args.checkpoint if len(args.files) == 1 else '%s.%s' % (args.checkpoint, os.path.basename(filename))
+        imp = Importer(api, mapping, args.workers, checkpoint, args.checkpoint_every, args.errors)
+        stats = imp.run(read_rows(filename, args.format, args.delimiter))
+        failed += stats['failed']
+        print(u'%s: %s rows, %s imported, %s failed, %s skipped in %.1fs' % (filename, stats['rows'],
+              stats['imported'], stats['failed'], stats['skipped'], stats['seconds']))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/python
+""".. _ipamsync:
+
+IPAM synchronisation from ARP tables and DHCP leases, the (mac, ip, device, vlan) observations are streamed
+and checked against an in-memory index of the mac addresses (macs/) and ip addresses (ips/) of device42,
+only new associations and ones which moved (a mac seen at another device or vlan, an ip at another mac or
+device) are written, concurrently, everything else is counted as unchanged without a request
+
+vlans are given by number, name or as IPAM_vlan and resolved through vlans/ into the vlan_id written with
+the mac address, vlans unknown to device42 are counted and ignored
+
+the index is loaded once (three requests, all streamed) and kept up to date by the writes, further runs of
+the same IPAMSync only read it again with refresh=True
+
+>>> from device42api.ipamsync import IPAMSync
+>>> sync = IPAMSync(api, workers=16)
+>>> sync.run((e.mac, e.ip, e.switch, e.vlan) for e in arp_entries)
+{'observations': 184210, 'invalid': 0, 'unchanged': 183577, 'duplicates': 402, 'unknown_vlans': 0, 'new_macs': 12,
+ 'moved_macs': 3, 'new_ips': 190, 'moved_ips': 26, 'written': 231, 'failed': 0, 'seconds': 14.2}
+
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import device42api
+from device42api import Device42APIObjectException, normalize_mac
+
+log = logging.getLogger('device42api.ipamsync')
+
+def _name(v):
+    """return the name of a device or vlan given as object, dict of the API response or value, None if empty"""
+    if isinstance(v, dict):     v = v.get('name', v.get('number', None))
+    elif isinstance(v, device42api.Device42APIObject):  v = v.__object_name__()
+    if v == None or isinstance(v, (device42api.Required, device42api.Optional)):   return None
+    v = (u'%s' % v).strip()
+    return v or None
+
+def _id(v):
+    """return the API id v as text, ids are numbers which might come as float or string"""
+    if v in (None, '') or isinstance(v, (device42api.Required, device42api.Optional)):     return None
+    try:
+        return u'%d' % float(v)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def _differs(current, observed):
+    """True if observed is known and not current, unknown observations never move anything"""
+    return observed != None and (current or '').lower() != observed.lower()
+
+class Index(object):
+    """.. _Index:
+
+    the mac addresses {mac: {device, vlan}} and ip addresses {ip: {mac, device}} of device42, the vlan as
+    vlan_id, and the vlan_id of every vlan number and (lower case) name
+
+    """
+    def __init__(self):
+        self.macs   = {}
+        self.ips    = {}
+        self.vlans  = {}
+    def load(self, api, workers=None):
+        """read macs/, ips/ and vlans/ (concurrently, streamed) into the index"""
+        def macs():
+            return [m for m in api.__stream_api__('macs/', 'macaddresses') if m.get('macaddress')]
+        def ips():
+            return dict((u'%s' % i.get('ip'), dict(mac=normalize_mac(i.get('macaddress')), device=_name(i.get('device'))))
+                        for i in api.__stream_api__('ips/', 'ips') if i.get('ip'))
+        def vlans():
+            ids = {}
+            for v in api.__stream_api__('vlans/', 'vlans'):
+                i = _id(v.get('vlan_id', v.get('id')))
+                if i == None:   continue
+                if _name(v.get('name')) != None:    ids.setdefault(_name(v.get('name')).lower(), i)
+                if _id(v.get('number')) != None:    ids[_id(v.get('number'))] = i
+            return ids
+        macs, self.ips, self.vlans = api.parallel(lambda fn: fn(), [macs, ips, vlans], workers)
+        # the vlan of a mac is its vlan_id if the response has one, its number or name otherwise
+        self.macs = dict((normalize_mac(m['macaddress']), dict(device=_name(m.get('device')),
+                          vlan=_id(m.get('vlan_id')) or self.vlan_id(m.get('vlan')))) for m in macs)
+        return self
+    def vlan_id(self, v):
+        """return the vlan_id of vlan v (IPAM_vlan, dict of the API response, number or name), None if unknown"""
+        if isinstance(v, device42api.IPAM_vlan):
+            if v.__object_id__() != None:   return _id(v.__object_id__())
+            v = v.number
+        elif isinstance(v, dict):
+            if _id(v.get('vlan_id')) != None:   return _id(v['vlan_id'])
+            v = v.get('number', v.get('name'))
+        if _id(v) != None and _id(v) in self.vlans:     return self.vlans[_id(v)]
+        v = _name(v)
+        return self.vlans.get(v.lower(), None) if v != None else None
+
+class IPAMSync(object):
+    """.. _IPAMSync:
+
+    writes the new and moved associations of (mac, ip, device, vlan) observations (tuples or dicts with these
+    keys, every part but mac or ip may be None, observations without both are counted as invalid and skipped),
+    at most queue_size (default 4 * workers) writes are waiting, a failed write is retried by the next
+    observation of the same association
+
+    the vlan is resolved into its vlan_id, compared with the one of the mac address and written as vlan_id
+
+    * dry_run=True      # count the writes without sending them, the index isn't changed
+
+    """
+    def __init__(self, api, workers=8, queue_size=None):
+        self.api        = api
+        self.workers    = max(int(workers), 1)
+        self.queue_size = int(queue_size or 4 * self.workers)
+        self.index      = None
+        self._lock      = threading.Lock()
+        self.__reset__()
+    def __reset__(self):
+        self.stats      = dict(observations=0, invalid=0, unchanged=0, duplicates=0, unknown_vlans=0, new_macs=0, moved_macs=0,
+                               new_ips=0, moved_ips=0, written=0, failed=0)
+        self._seen      = set()
+    def __observation__(self, o):
+        """return (mac, ip, device, vlan) of an observation, None if it has neither mac nor ip"""
+        if isinstance(o, dict):
+            mac, ip, device, vlan = o.get('mac'), o.get('ip'), o.get('device'), o.get('vlan')
+        else:
+            mac, ip, device, vlan = o
+        mac, device = normalize_mac(mac), _name(device)
+        ip = u'%s' % ip if ip not in (None, '') else None
+        if mac == None and ip == None:
+            log.debug(u'observation %r has neither mac nor ip, skipped', o)
+            return None
+        if vlan not in (None, ''):
+            vlan_id = self.index.vlan_id(vlan)
+            if vlan_id == None:
+                log.debug(u'vlan %r unknown, ignored', vlan)
+                self.__count__('unknown_vlans')
+            vlan = vlan_id
+        return mac, ip, device, vlan
+    def __count__(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+    def __plan__(self, mac, ip, device, vlan, dry_run):
+        """return the (kind, values, previous) writes of an observation and claim them in the index, so the
+        same association observed again before the write returned isn't written twice"""
+        writes = []
+        with self._lock:
+            if mac != None:
+                current = self.index.macs.get(mac, None)
+                if current == None or _differs(current['device'], device) or _differs(current['vlan'], vlan):
+                    values = dict(device=device or (current or {}).get('device'), vlan=vlan or (current or {}).get('vlan'))
+                    writes.append(('macs', dict(values, mac=mac), current))
+                    if not dry_run:     self.index.macs[mac] = values
+            if ip != None:
+                current = self.index.ips.get(ip, None)
+                if current == None or _differs(current['mac'], mac) or _differs(current['device'], device):
+                    values = dict(mac=mac or (current or {}).get('mac'), device=device or (current or {}).get('device'))
+                    writes.append(('ips', dict(values, ip=ip), current))
+                    if not dry_run:     self.index.ips[ip] = values
+        return writes
+    def __save__(self, obj):
+        rsp = obj.save()
+        if isinstance(rsp, Future):     rsp = rsp.result()
+        if not (isinstance(rsp, dict) and rsp.get('code', 1) == 0):
+            raise Device42APIObjectException(u'saving %s failed: %s' % (obj.__class__.__name__, rsp))
+    def __write__(self, writes, slots, seen):
+        try:
+            # the mac goes first, the ip of the same observation refers to it
+            for n, (kind, values, previous) in enumerate(writes):
+                try:
+                    if kind == 'macs':
+                        obj = device42api.IPAM_macaddress(api=self.api)
+                        obj.macaddress  = values['mac']
+                        if values['vlan'] != None:      obj.vlan_id = values['vlan']
+                    else:
+                        obj = device42api.IPAM_ipaddress(api=self.api)
+                        obj.ipaddress   = values['ip']
+                        if values['mac'] != None:       obj.macaddress = values['mac']
+                    if values['device'] != None:    obj.device = values['device']
+                    self.__save__(obj)
+                except Exception as e:
+                    log.warning(u'writing %s failed: %s', values, e)
+                    self.__failed__(writes[n:], seen)
+                    return
+                self.__count__('written')
+        finally:
+            slots.release()
+    def __failed__(self, writes, seen):
+        """give the failed and the skipped writes back and forget the observation, so its association is written
+        on the next observation"""
+        with self._lock:
+            self._seen.discard(seen)
+            for kind, values, previous in writes:
+                self.stats['failed'] += 1
+                index, key = (self.index.macs, values['mac']) if kind == 'macs' else (self.index.ips, values['ip'])
+                if previous == None:    index.pop(key, None)
+                else:                   index[key] = previous
+    def run(self, observations, dry_run=False, refresh=False):
+        """check the observations (an iterable, consumed while the writes run) and write the new and moved
+        associations, return the counters of the run"""
+        start = time.perf_counter()
+        if self.index == None or refresh:
+            self.index = Index().load(self.api, self.workers)
+        self.__reset__()
+        slots = threading.BoundedSemaphore(self.queue_size)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for o in observations:
+                self.__count__('observations')
+                seen = self.__observation__(o)
+                if seen == None:
+                    self.__count__('invalid')
+                    continue
+                mac, ip, device, vlan = seen
+                with self._lock:
+                    duplicate = seen in self._seen
+                    self._seen.add(seen)
+                if duplicate:
+                    self.__count__('duplicates')
+                    continue
+                writes = self.__plan__(mac, ip, device, vlan, dry_run)
+                if not writes:
+                    self.__count__('unchanged')
+                    continue
+                for kind, values, previous in writes:
+                    self.__count__(('new_' if previous == None else 'moved_') + kind)
+                if dry_run:     continue
+                slots.acquire()
+                # every write runs in a copy of the callers context, so a deadline or tracing span is kept
+                pool.submit(contextvars.copy_context().run, self.__write__, writes, slots, seen)
+        return dict(self.stats, seconds=time.perf_counter() - start)
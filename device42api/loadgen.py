@@ -0,0 +1,191 @@
+#!/usr/bin/python
+""".. _loadgen:
+
+load generator replaying a weighted mix of read (get_rack, get_device, get_asset) and write (Device.save,
+Device.add_ip, Device.add_customField) operations through Device42API from many threads or processes,
+reporting throughput and latency percentiles for every concurrency step
+
+    $ # against the local stand-in server
+    $ python -m device42api.loadgen --local --concurrency 1,4,16,64 --duration 20
+    $ # against a staging appliance, 10% writes
+    $ python -m device42api.loadgen --host d42-staging --username admin --password changeme \\
+    >       --mix get_device=60,get_rack=5,get_asset=25,device_save=5,add_ip=3,add_customField=2
+
+>>> from device42api import loadgen
+>>> steps = loadgen.run(dict(host='127.0.0.1', port=8443, username='admin', password='changeme', scheme='http'),
+...                     concurrency=(1, 8), duration=10)
+>>> steps[1]['throughput'], steps[1]['p99']
+(812.4, 0.0311)
+
+"""
+
+import argparse
+import random
+import sys
+import time
+import simplejson as json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import device42api
+from device42api.benchmark import percentiles
+
+READS   = ('get_rack', 'get_device', 'get_asset')
+WRITES  = ('device_save', 'add_ip', 'add_customField')
+MIX     = dict(get_device=60, get_rack=5, get_asset=25, device_save=5, add_ip=3, add_customField=2)
+
+def parse_mix(text):
+    """parse "op=weight,op=weight" into a dict, unknown operations raise ValueError"""
+    mix = {}
+    for part in text.split(','):
+        if not part.strip():    continue
+        op, weight = part.split('=')
+        if op.strip() not in READS + WRITES:
+            raise ValueError(u'unknown operation "%s"' % op)
+        mix[op.strip()] = float(weight)
+    return mix
+
+def discover(connection):
+    """return the (name, id) of the devices, racks and assets used as targets"""
+    api = device42api.Device42API(noInit=True, **connection)
+    devices, racks = [], []
+    for r in api.__get_api__('racks/')['racks']:
+        racks.append((r['name'], r['rack_id']))
+        for d in r.get('devices', []):
+            devices.append((d['device']['name'], d['device']['device_id']))
+    assets = [(a.get('name'), a['asset_id']) for a in api.__get_api__('assets/')['assets'] if a.get('asset_id')]
+    return dict(devices=devices, racks=racks, assets=assets)
+
+class Operations(object):
+    """the operations of the mix, every method runs one request sequence with random targets, the reads load
+    one object each instead of (re)loading the collections of Device42API.get_rack() and get_asset()"""
+    def __init__(self, api, targets, worker=0, seed=0):
+        self.api        = api
+        self.targets    = targets
+        self.worker     = worker
+        self.random     = random.Random(seed)
+        self.counter    = 0
+    def device(self):
+        name, device_id = self.random.choice(self.targets['devices'])
+        d = device42api.Device(api=self.api)
+        d.name, d.device_id = name, device_id
+        return d
+    def get_rack(self):
+        r = device42api.Rack(api=self.api)
+        r.name, r.rack_id = self.random.choice(self.targets['racks'])
+        r.load(lazy=True)
+        return r
+    def get_device(self):
+        return self.api.get_device(device_id=self.random.choice(self.targets['devices'])[1])
+    def get_asset(self):
+        a = device42api.Asset(api=self.api)
+        a.name, a.asset_id = self.random.choice(self.targets['assets'])
+        a.load()
+        return a
+    def device_save(self):
+        self.counter += 1
+        d = device42api.Device(api=self.api)
+        d.name      = 'loadgen-%s-%s' % (self.worker, self.counter)
+        d.hardware  = 'Generic Hardware 1U'
+        d.notes     = 'created by device42api.loadgen'
+        return d.save()
+    def add_ip(self):
+        self.counter += 1
+        n = self.worker * 65536 + self.counter
+        return self.device().add_ip('10.%s.%s.%s' % (200 + (n >> 16) % 50, (n >> 8) & 255, n & 255))
+    def add_customField(self):
+        cf = device42api.CustomFieldDevice(api=self.api)
+        cf.key      = 'loadgen'
+        cf.value    = '%s' % time.time()
+        return self.device().add_customField(cf)
+
+def worker(connection, targets, mix, duration, worker_id=0, seed=0, api=None):
+    """run random operations of mix for duration seconds, return [(operation, seconds, ok), ...]"""
+    api     = api or device42api.Device42API(noInit=True, **connection)
+    ops     = Operations(api, targets, worker_id, seed + worker_id)
+    names   = sorted(mix)
+    weights = [mix[n] for n in names]
+    samples = []
+    stop    = time.perf_counter() + duration
+    while time.perf_counter() < stop:
+        op  = ops.random.choices(names, weights)[0]
+        t   = time.perf_counter()
+        try:
+            rsp = getattr(ops, op)()
+            # reads return the loaded object, writes the response (add_ip True for a new address), anything
+            # else like False or a response with an error code failed
+            if op in READS:     ok = isinstance(rsp, device42api.Device42APIObject)
+            else:               ok = rsp is True or (isinstance(rsp, dict) and rsp.get('code', 1) == 0)
+        except Exception:
+            ok  = False
+        samples.append((op, time.perf_counter() - t, ok))
+    return samples
+
+def report(samples, elapsed, concurrency):
+    """return the summary of one concurrency step"""
+    latencies = [s[1] for s in samples]
+    p50, p95, p99 = percentiles(latencies)
+    step = dict(concurrency=concurrency, seconds=elapsed, operations=len(samples),
+                errors=len([s for s in samples if not s[2]]),
+                throughput=len(samples) / elapsed if elapsed else None, p50=p50, p95=p95, p99=p99, operations_by_type={})
+    for op in sorted(set(s[0] for s in samples)):
+        lat = [s[1] for s in samples if s[0] == op]
+        o50, o95, o99 = percentiles(lat)
+        step['operations_by_type'][op] = dict(operations=len(lat), errors=len([s for s in samples if s[0] == op and not s[2]]),
+                                              p50=o50, p95=o95, p99=o99)
+    return step
+
+def run(connection, concurrency=(1, 2, 4, 8, 16), duration=10.0, mix=None, processes=False, seed=0, callback=None,
+        shared=False):
+    """run one step per concurrency level and return the step summaries, callback(step) is called after every step,
+    with shared=True all threads of a step use one Device42API instead of one client each"""
+    mix     = mix or MIX
+    targets = discover(connection)
+    steps   = []
+    for n in concurrency:
+        pool = ProcessPoolExecutor(max_workers=n) if processes else ThreadPoolExecutor(max_workers=n)
+        api  = device42api.Device42API(noInit=True, workers=n, **connection) if shared and not processes else None
+        start = time.perf_counter()
+        with pool:
+            futures = [pool.submit(worker, connection, targets, mix, duration, i, seed, api) for i in range(n)]
+            samples = [s for f in futures for s in f.result()]
+        step = report(samples, time.perf_counter() - start, n)
+        steps.append(step)
+        if callback != None:    callback(step)
+    return steps
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='multi-client load generator for device42api')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=443)
+    p.add_argument('--username', default='admin')
+    p.add_argument('--password', default='changeme')
+    p.add_argument('--scheme', default='https')
+    p.add_argument('--local', action='store_true', help='start a local stand-in server as target')
+    p.add_argument('--latency', type=float, default=0.0, help='latency of the local stand-in server')
+    p.add_argument('--concurrency', default='1,2,4,8,16', help='comma separated clients per step')
+    p.add_argument('--duration', type=float, default=10.0, help='seconds per step')
+    p.add_argument('--mix', default=None, help='op=weight,... of %s' % ', '.join(READS + WRITES))
+    p.add_argument('--processes', action='store_true', help='one process instead of one thread per client')
+    p.add_argument('--shared', action='store_true', help='all threads share one Device42API')
+    p.add_argument('--output', default=None, help='write the step summaries as JSON to this file')
+    args = p.parse_args(argv)
+    connection = dict(host=args.host, port=args.port, username=args.username, password=args.password, scheme=args.scheme)
+    srv = None
+    if args.local:
+        from device42api.testserver import Inventory, FakeDevice42Server
+        srv = FakeDevice42Server(Inventory(racks_per_room=4, devices_per_rack=20), latency=args.latency).start()
+        connection.update(host=srv.host, port=srv.port, scheme=srv.scheme)
+    def show(step):
+        print(u'clients %4s  ops/s %9.1f  p50 %.4f  p95 %.4f  p99 %.4f  errors %s' % (step['concurrency'],
+              step['throughput'] or 0, step['p50'] or 0, step['p95'] or 0, step['p99'] or 0, step['errors']))
+    try:
+        steps = run(connection, [int(c) for c in args.concurrency.split(',')], args.duration,
+                    parse_mix(args.mix) if args.mix else None, args.processes, callback=show, shared=args.shared)
+    finally:
+        if srv != None:     srv.stop()
+    if args.output != None:
+        with open(args.output, 'w') as fp:
+            json.dump(steps, fp, indent=2, sort_keys=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/python
+""".. _reconcile:
+
+desired state reconciliation, the desired Building/Room/Rack/Device/IPAM_* objects are compared with
+the current state of device42 field by field (the get_json keys of every class) and only the objects
+which differ are saved, with nothing but their identity and the changed fields in the request
+
+>>> from device42api.reconcile import Reconciler
+>>> r = Reconciler(api)
+>>> plan = r.plan(desired)              # dry-run, nothing is written
+>>> print(plan.report())
++ Device web03 name='web03' hardware='Generic Hardware 1U'
+~ Device web01 memory: '16.0' -> '32' os: 'RHEL Server' -> 'Ubuntu'
+= 42 unchanged
+>>> plan.summary()
+{'create': 1, 'update': 1, 'unchanged': 42}
+>>> r.apply(plan)                       # writes the 2 changes
+[{'msg': ['device added or updated', 7, 'web03', True, True], 'code': 0}, {'msg': ['device added or updated', 3, 'web01', False, True], 'code': 0}]
+
+"""
+
+from urllib.parse import quote
+import device42api
+from device42api import Device42APIObjectException, Optional, Required
+
+# class: (collection path or None to GET every object, array key, identity attributes, {attribute: response field})
+SOURCES = {
+    device42api.Building:           ('buildings/', 'buildings', ('name',), {}),
+    device42api.Room:               ('rooms/', 'rooms', ('name',), {}),
+    device42api.Rack:               ('racks/', 'racks', ('name', 'room'), {}),
+    device42api.Customer:           ('customers/', 'Customers', ('name',), {}),
+    device42api.Device:             (None, None, ('name',), dict(hardware='hw_model')),
+    device42api.IPAM_vlan:          ('vlans/', 'vlans', ('number',), {}),
+    device42api.IPAM_subnet:        ('subnets/', 'subnets', ('network', 'mask_bits'), {}),
+    device42api.IPAM_macaddress:    ('macs/', 'macaddresses', ('macaddress',), {}),
+    device42api.IPAM_ipaddress:     ('ips/', 'ips', ('ipaddress',), dict(ipaddress='ip', tag='label')),
+    device42api.IPAM_switchport:    ('switchports/', 'switchports', ('switch', 'port'), {}),
+}
+# objects are written level by level in this order, every level in parallel
+ORDER = (device42api.Building, device42api.Customer, device42api.Room, device42api.Rack, device42api.Device,
+         device42api.IPAM_vlan, device42api.IPAM_subnet, device42api.IPAM_macaddress, device42api.IPAM_ipaddress,
+         device42api.IPAM_switchport)
+
+# attributes compared as numbers ('16', 16 and 16.0 are equal) and as yes/no, everything else as trimmed string
+NUMERIC = {
+    device42api.Room:               ('building_id',),
+    device42api.Rack:               ('size', 'room_id', 'first_number'),
+    device42api.Device:             ('storage_room_id', 'memory', 'cpucount', 'cpupower', 'cpucore', 'hddcount', 'hddsize'),
+    device42api.IPAM_vlan:          ('number', 'switch_id'),
+    device42api.IPAM_subnet:        ('mask_bits', 'vrf_group_id', 'parent_vlan_id', 'customer_id'),
+    device42api.IPAM_macaddress:    ('vlan_id',),
+    device42api.IPAM_switchport:    ('count', 'remote_port_id', 'switchport_id'),
+}
+BOOLEAN = {
+    device42api.Rack:               ('numbering_start_from_bottom',),
+    device42api.Device:             ('is_it_switch', 'is_it_virtual_host', 'is_it_blade_host'),
+    device42api.IPAM_switchport:    ('up', 'up_admin'),
+}
+
+def field_kind(cls, attr):
+    """return number, bool or None (string) as attr of cls is compared"""
+    if attr in NUMERIC.get(cls, ()):    return 'number'
+    if attr in BOOLEAN.get(cls, ()):    return 'bool'
+    return None
+
+def normalize(v, kind=None):
+    """return v as compared by the reconciliation, for kind number '16', 16 and 16.0 are equal, for kind bool
+    'yes', 'true' and True, any other value is compared as trimmed string ('0123' and '123' differ)"""
+    if isinstance(v, dict):     v = v.get('name', v)
+    if v == None:   return ''
+    if kind == 'bool' or isinstance(v, bool):
+        t = (u'%s' % v).strip().lower()
+        if t in ('yes', 'true', '1'):   return 'yes'
+        if t in ('no', 'false', '0'):   return 'no'
+        return t
+    if kind == 'number':
+        try:
+            return repr(float(v))
+        except (TypeError, ValueError):
+            pass
+    return (u'%s' % v).strip()
+
+class Change(object):
+    """.. _Change:
+
+    one object of the desired state, action is create, update or unchanged, fields is
+    {attribute: (current, desired)} of the differing fields
+
+    """
+    def __init__(self, obj, action, fields=None, current=None):
+        self.obj        = obj
+        self.action     = action
+        self.fields     = fields or {}
+        self.current    = current
+    def __str__(self):
+        name = self.obj.__object_name__() or ' '.join(u'%s' % getattr(self.obj, k) for k in SOURCES[self.obj.__class__][2])
+        if self.action == 'create':
+            return u'+ %s %s %s' % (self.obj.__class__.__name__, name,
+                                    ' '.join(u'%s=%r' % (k, d) for k, (c, d) in sorted(self.fields.items())))
+        return u'~ %s %s %s' % (self.obj.__class__.__name__, name,
+                                ' '.join(u'%s: %r -> %r' % (k, c, d) for k, (c, d) in sorted(self.fields.items())))
+
+class Plan(object):
+    """.. _Plan:
+
+    the changes computed by Reconciler.plan(), nothing is written until Reconciler.apply(plan)
+
+    """
+    def __init__(self, changes):
+        self.changes = changes
+    def pending(self):
+        """return the changes which need a write"""
+        return [c for c in self.changes if c.action != 'unchanged']
+    def summary(self):
+        counts = dict(create=0, update=0, unchanged=0)
+        for c in self.changes:
+            counts[c.action] += 1
+        return counts
+    def report(self):
+        """return the dry-run report, one line per write and the number of unchanged objects"""
+        lines = [u'%s' % c for c in self.pending()]
+        lines.append(u'= %s unchanged' % self.summary()['unchanged'])
+        return '\n'.join(lines)
+
+class Reconciler(object):
+    """.. _Reconciler:
+
+    computes and applies the writes bringing device42 to the desired objects, the current state is
+    read with one request per collection (one per object for devices), on up to workers threads
+
+    fields a desired object leaves at the default of its class aren't compared, so a desired Device
+    without notes doesn't clear the notes of the current one
+
+    """
+    def __init__(self, api, workers=None):
+        self.api        = api
+        self.workers    = workers
+        self._defaults  = {}
+    def __source__(self, obj):
+        source = SOURCES.get(obj.__class__, None)
+        if source == None:
+            raise Device42APIObjectException(u'%s can\'t be reconciled' % obj.__class__.__name__)
+        return source
+    def __identity__(self, obj, attrs):
+        return tuple(normalize(getattr(obj, k, None), field_kind(obj.__class__, k)) for k in attrs)
+    def __specified__(self, obj):
+        """return the get_json keys of obj set to something else than the default of its class"""
+        cls = obj.__class__
+        if cls not in self._defaults:
+            self._defaults[cls] = cls().__dict__
+        defaults, keys = self._defaults[cls], []
+        for k in obj._json_keys:
+            v = getattr(obj, k, None)
+            if v == None or isinstance(v, (Required, Optional)):   continue
+            d = defaults.get(k, None)
+            if not isinstance(d, (Required, Optional)) and d == v:  continue
+            if k not in keys:   keys.append(k)
+        return keys
+    def __current__(self, desired):
+        """return {class: {identity: current json}} for the collections of the desired objects and
+        {id(device): current json} for the devices"""
+        collections, devices = {}, []
+        for obj in desired:
+            path, key, attrs, names = self.__source__(obj)
+            if path == None:    devices.append(obj)
+            else:               collections.setdefault(obj.__class__, None)
+        def fetch(cls):
+            path, key, attrs, names = SOURCES[cls]
+            rsp = self.api.__get_api__(path)
+            if not isinstance(rsp, dict) or key not in rsp:
+                raise Device42APIObjectException(u'reading %s failed: %s' % (path, rsp))
+            current = {}
+            for item in rsp[key]:
+                current[tuple(normalize(item.get(names.get(k, k), None), field_kind(cls, k)) for k in attrs)] = item
+            return current
+        classes = list(collections)
+        for cls, current in zip(classes, self.api.parallel(fetch, classes, self.workers)):
+            collections[cls] = current
+        def device(obj):
+            rsp = self.api.__get_api__('devices/name/%s' % quote(u'%s' % obj.name, safe=''))
+            if isinstance(rsp, dict) and rsp.get('name', None) != None:     return rsp
+            return None
+        found = dict(zip([id(d) for d in devices], self.api.parallel(device, devices, self.workers)))
+        return collections, found
+    def diff(self, obj, current):
+        """return the Change bringing current (response json or None) to obj"""
+        path, key, attrs, names = self.__source__(obj)
+        keys = self.__specified__(obj)
+        if current == None:
+            return Change(obj, 'create', dict((k, (None, getattr(obj, k))) for k in keys))
+        fields = {}
+        for k in keys:
+            c, d = current.get(names.get(k, k), None), getattr(obj, k)
+            if normalize(c, field_kind(obj.__class__, k)) != normalize(d, field_kind(obj.__class__, k)):
+                fields[k] = (c, d)
+        return Change(obj, 'update' if fields else 'unchanged', fields, current)
+    def plan(self, desired):
+        """return the Plan for the desired objects without writing anything"""
+        desired = list(desired)
+        collections, devices = self.__current__(desired)
+        changes = []
+        for obj in desired:
+            path, key, attrs, names = self.__source__(obj)
+            if path == None:
+                current = devices.get(id(obj), None)
+            else:
+                current = collections[obj.__class__].get(self.__identity__(obj, attrs), None)
+            changes.append(self.diff(obj, current))
+        return Plan(changes)
+    def __save__(self, change):
+        obj = change.obj
+        obj.api = obj.api or self.api
+        if change.current != None:
+            path, key, attrs, names = self.__source__(obj)
+            # the unchanged fields are known to the API, get_json() leaves them out, the identity stays in
+            obj._json = dict((k, getattr(obj, k)) for k in self.__specified__(obj) if k not in change.fields and k not in attrs)
+        obj.json = dict()
+        rsp = obj.save()
+        if not (isinstance(rsp, dict) and rsp.get('code', 1) == 0):
+            raise Device42APIObjectException(u'%s failed: %s' % (change, rsp))
+        if change.current != None and obj.__object_id__() == None:
+            # keep the id of the existing object, not sent as the switchports API would add a new port
+            for k in obj._id_attrs:
+                if change.current.get(k, None) != None:
+                    setattr(obj, k, change.current[k])
+                    break
+        return rsp
+    def apply(self, plan):
+        """write the pending changes of plan, level by level (see ORDER) and in parallel within a level,
+        return the responses in the order of ORDER"""
+        pending, responses = plan.pending(), []
+        for cls in ORDER:
+            level = [c for c in pending if c.obj.__class__ is cls]
+            if level:
+                responses.extend(self.api.parallel(self.__save__, level, self.workers))
+        return responses
+    def reconcile(self, desired, dry_run=False):
+        """plan and, unless dry_run, apply, return the Plan"""
+        plan = self.plan(desired)
+        if not dry_run:
+            self.apply(plan)
+        return plan
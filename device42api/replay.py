@@ -0,0 +1,154 @@
+#!/usr/bin/python
+""".. _replay:
+
+transports recording the requests of a Device42API with their timing to a compact file (JSON lines,
+gzip compressed if the name ends with .gz) and replaying them offline, to profile the client side cost of
+hydration, diffing and decoding on real payloads and to compare versions on identical input
+
+>>> import device42api
+>>> from device42api.replay import RecordingTransport, ReplayTransport
+>>> rec = RecordingTransport('production.jsonl.gz')
+>>> api = device42api.Device42API(host='d42', username='admin', password='changeme', transport=rec)
+>>> racks = api.get_rack()
+>>> rec.close()
+>>> # offline, host/port/credentials don't matter
+>>> api = device42api.Device42API(host='d42', username='admin', password='changeme',
+...                               transport=ReplayTransport('production.jsonl.gz', timing='fast'))
+>>> racks = api.get_rack()
+
+"""
+
+import base64
+import gzip
+import threading
+import time
+import httplib2
+import simplejson as json
+from urllib.parse import urlsplit
+from device42api import Device42APIObjectException
+
+# response headers worth keeping, the cookie is replayed for the session handling
+RESPONSE_HEADERS = ('content-type', 'set-cookie')
+# written instead of the session cookie, a recording holds no credentials
+COOKIE = 'sessionid=recorded; Path=/'
+
+def _open(filename, mode):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 't', encoding='utf-8')
+    return open(filename, mode, encoding='utf-8')
+
+def _path(uri):
+    u = urlsplit(uri)
+    return u.path + ('?' + u.query if u.query else '')
+
+def _encode(data):
+    if data == None:    return None
+    if isinstance(data, str):   return data
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return dict(base64=base64.b64encode(data).decode('ascii'))
+
+def _decode(data):
+    if data == None:    return b''
+    if isinstance(data, dict):  return base64.b64decode(data['base64'])
+    return data.encode('utf-8')
+
+class RecordingTransport(object):
+    """.. _RecordingTransport:
+
+    records every exchange (offset, duration, method, path, request body, status, content) to filename while
+    passing it to the inner transport (default one httplib2.Http per thread), authorization headers are
+    never written and the session cookie is replaced by a placeholder
+
+    """
+    def __init__(self, filename, inner=None):
+        self.filename   = filename
+        self._inner     = inner
+        self._local     = threading.local()
+        self._lock      = threading.Lock()
+        self._fp        = _open(filename, 'w')
+        self._start     = time.time()
+        self.records    = 0
+    def __http__(self):
+        if self._inner != None:     return self._inner
+        http = getattr(self._local, 'http', None)
+        if http == None:
+            http = self._local.http = httplib2.Http(disable_ssl_certificate_validation=True)
+        return http
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        offset  = time.time() - self._start
+        start   = time.perf_counter()
+        rsp, content = self.__http__().request(uri, method, body=body, headers=headers, **kwargs)
+        record  = dict(t=round(offset, 6), d=round(time.perf_counter() - start, 6), m=method, p=_path(uri),
+                       b=_encode(body), s=rsp.status, c=_encode(content),
+                       h=dict((k, COOKIE if k == 'set-cookie' else rsp[k]) for k in RESPONSE_HEADERS if k in rsp))
+        line    = json.dumps(record, separators=(',', ':'))
+        with self._lock:
+            self._fp.write(line + '\n')
+            self.records += 1
+        return rsp, content
+    def close(self):
+        with self._lock:
+            if not self._fp.closed:     self._fp.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+
+class ReplayTransport(object):
+    """.. _ReplayTransport:
+
+    answers requests from a recording, identical requests (method, path, body) get their recorded
+    responses in the recorded order, the last one is repeated once they're used up
+
+    * timing='fast'         # answer immediately
+    * timing='original'     # wait as long as the original request took (scaled by speed)
+
+    a request not contained in the recording raises Device42APIObjectException, misses are counted
+
+    >>> t = ReplayTransport('production.jsonl.gz', timing='original', speed=2.0)
+    >>> t.stats()
+    {'records': 8204, 'replayed': 0, 'misses': 0}
+
+    """
+    def __init__(self, filename, timing='fast', speed=1.0):
+        if timing not in ('fast', 'original'):
+            raise Device42APIObjectException(u'timing must be fast or original')
+        self.timing     = timing
+        self.speed      = float(speed)
+        self._lock      = threading.Lock()
+        self._responses = {}
+        self._records   = 0
+        self.replayed   = 0
+        self.misses     = 0
+        with _open(filename, 'r') as fp:
+            for line in fp:
+                if not line.strip():    continue
+                r = json.loads(line)
+                self._responses.setdefault((r['m'], r['p'], json.dumps(r['b'])), []).append(r)
+                self._records += 1
+        self._next = dict((k, 0) for k in self._responses)
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        key = (method, _path(uri), json.dumps(_encode(body)))
+        with self._lock:
+            records = self._responses.get(key, None)
+            if records == None:
+                self.misses += 1
+                raise Device42APIObjectException(u'%s %s not recorded' % (method, key[1]))
+            i = self._next[key]
+            self._next[key] = min(i + 1, len(records) - 1)
+            self.replayed += 1
+        r = records[i]
+        if self.timing == 'original' and r['d'] > 0:
+            time.sleep(r['d'] / self.speed)
+        info = dict(r.get('h', {}))
+        info['status'] = str(r['s'])
+        return httplib2.Response(info), _decode(r['c'])
+    def reset(self):
+        """start replaying every request from its first recorded response again"""
+        with self._lock:
+            self._next = dict((k, 0) for k in self._responses)
+    def stats(self):
+        with self._lock:
+            return dict(records=self._records, replayed=self.replayed, misses=self.misses)
@@ -0,0 +1,186 @@
+#!/usr/bin/python
+""".. _session:
+
+unit of work for creating or changing many related objects, attributes may reference other objects
+of the session instead of their id or name (room.building_id = building, device.hardware = hw), the
+flush saves the objects level by level in dependency order, every level in parallel, and wires the
+ids and names returned by the saves into the referencing objects right before they're saved
+
+>>> from device42api.session import Session
+>>> with Session(api) as s:
+...     b = s.add(device42api.Building(api=api))
+...     b.name = 'DC1'
+...     r = s.add(device42api.Room(api=api))
+...     r.name, r.building_id = 'Hall A', b
+...     k = s.add(device42api.Rack(api=api))
+...     k.name, k.size, k.room, k.room_id = 'A01', 42, r, r
+...     d = s.add(device42api.Device(api=api))
+...     d.name, d.hardware = 'web01', 'Generic Hardware 1U'
+...     s.place(d, k, start_at=1)
+...     m = s.add(device42api.IPAM_macaddress(api=api))
+...     m.macaddress, m.device = '00:11:22:33:44:55', d
+...     i = s.add(device42api.IPAM_ipaddress(api=api))
+...     i.ipaddress, i.macaddress, i.device = '10.0.0.10', m, d
+>>> b.building_id, r.room_id, k.rack_id, d.device_id
+(7, 12, 80, 156)
+
+"""
+
+import threading
+from concurrent.futures import Future
+from device42api import Device42APIObject, Device42APIObjectException, IPAM_ipaddress, IPAM_macaddress
+
+def _reference(obj, attr):
+    """return the value of the saved object obj for the referencing attribute attr, its id for *_id
+    attributes, the address of mac and ip addresses and the name otherwise"""
+    if attr.endswith('_id'):
+        value = obj.__object_id__()
+    elif isinstance(obj, IPAM_macaddress):
+        value = obj.macaddress
+    elif isinstance(obj, IPAM_ipaddress):
+        value = obj.ipaddress
+    else:
+        value = obj.__object_name__()
+    if value == None:
+        raise Device42APIObjectException(u'%s referenced by %s has no %s' % (obj.__class__.__name__, attr,
+                                         'id' if attr.endswith('_id') else 'name'))
+    return value
+
+def _response(rsp):
+    """return the response of a request, waiting for it if a WriteBehind queued it"""
+    if isinstance(rsp, Future):     return rsp.result()
+    return rsp
+
+def _saved(obj, rsp):
+    """check a save() response and keep the id of an object which was updated instead of created"""
+    rsp = _response(rsp)
+    if not (isinstance(rsp, dict) and rsp.get('code', 1) == 0):
+        raise Device42APIObjectException(u'saving %s failed: %s' % (obj.__class__.__name__, rsp))
+    msg = rsp.get('msg', None)
+    if obj._id_attrs and obj.__object_id__() == None and isinstance(msg, list) and len(msg) > 1:
+        setattr(obj, obj._id_attrs[0], msg[1])
+    return rsp
+
+class Pending(object):
+    """.. _Pending:
+
+    an object to save or a call (like a rack placement) waiting in a Session
+
+    """
+    def __init__(self, obj=None, fn=None, depends=(), name=None):
+        self.obj        = obj
+        self.fn         = fn
+        self.depends    = list(depends)
+        self.name       = name or (obj.__class__.__name__ if obj != None else getattr(fn, '__name__', 'call'))
+    def references(self):
+        """return [(attribute, object)] of the attributes referencing another object"""
+        if self.obj == None:    return []
+        return [(k, v) for k, v in self.obj.__dict__.items() if k not in ('parent', 'api') and isinstance(v, Device42APIObject)]
+    def run(self):
+        if self.obj == None:
+            return self.fn()
+        for k, v in self.references():
+            setattr(self.obj, k, _reference(v, k))
+        return _saved(self.obj, self.obj.save())
+    def __repr__(self):
+        return u'<device42api.session.Pending %s>' % self.name
+
+class Session(object):
+    """.. _Session:
+
+    collects new and changed objects, flush() (or leaving the with block without exception) saves them,
+    the saved ones are removed from the session, after a failure the rest stays pending
+
+    * add(obj)                          # save obj, returns obj
+    * place(device, rack, start_at)     # Rack.add_device once device and rack are saved
+    * call(fn, *objects)                # fn() once the objects are saved
+
+    >>> s = Session(api, workers=16)
+    >>> for n in range(100):
+    ...     d = s.add(device42api.Device(api=api))
+    ...     d.name = 'node%03d' % n
+    >>> s.levels()
+    [[<device42api.session.Pending Device>, ...]]
+    >>> s.flush()
+    100
+
+    """
+    def __init__(self, api, workers=None):
+        self.api        = api
+        self.workers    = workers
+        self._pending   = []
+        self._lock      = threading.Lock()
+    def add(self, obj):
+        if obj.api == None:     obj.api = self.api
+        with self._lock:
+            if not any(p.obj is obj for p in self._pending):
+                self._pending.append(Pending(obj))
+        return obj
+    def call(self, fn, *objects, **kwargs):
+        """run fn() after the objects were saved, its result must be a successful API response"""
+        def run():
+            rsp = _response(fn())
+            if isinstance(rsp, dict) and rsp.get('code', 0) != 0:
+                raise Device42APIObjectException(u'%s failed: %s' % (kwargs.get('name', 'call'), rsp))
+            return rsp
+        p = Pending(fn=run, depends=objects, name=kwargs.get('name', None))
+        with self._lock:
+            self._pending.append(p)
+        return p
+    def place(self, device, rack, start_at='auto'):
+        """mount device in rack once both are saved"""
+        return self.call(lambda: rack.add_device(device, start_at), device, rack,
+                         name=u'place %s' % (device.__object_name__() or 'device'))
+    def levels(self):
+        """return the pending work as list of levels, everything of a level only depends on earlier levels"""
+        with self._lock:
+            pending = list(self._pending)
+        nodes   = dict((id(p.obj), p) for p in pending if p.obj != None)
+        depth   = {}
+        def visit(p, path):
+            if id(p) in depth:  return depth[id(p)]
+            if id(p) in path:
+                raise Device42APIObjectException(u'circular reference between %s' % ', '.join(repr(x) for x in path.values()))
+            path[id(p)] = p
+            deps = [nodes[id(o)] for o in p.depends if id(o) in nodes]
+            deps += [nodes[id(v)] for k, v in p.references() if id(v) in nodes]
+            depth[id(p)] = 1 + max([visit(d, path) for d in deps] + [-1])
+            del path[id(p)]
+            return depth[id(p)]
+        levels = []
+        for p in pending:
+            d = visit(p, {})
+            while len(levels) <= d:     levels.append([])
+            levels[d].append(p)
+        return levels
+    def flush(self):
+        """save the pending objects level by level, every level in parallel on up to workers threads,
+        return the number of saved objects and calls, raise Device42APIObjectException after the first
+        level with failures"""
+        def run(p):
+            try:
+                p.run()
+                return None
+            except Exception as e:
+                return e
+        done = 0
+        for level in self.levels():
+            errors = self.api.parallel(run, level, self.workers)
+            saved  = [p for p, e in zip(level, errors) if e == None]
+            with self._lock:
+                self._pending = [p for p in self._pending if p not in saved]
+            done += len(saved)
+            failed = [(p, e) for p, e in zip(level, errors) if e != None]
+            if failed:
+                raise Device42APIObjectException(u'%s of %s failed: %s' % (len(failed), len(level),
+                                                 '; '.join(u'%r: %s' % (p, e) for p, e in failed)))
+        return done
+    def rollback(self):
+        """forget the pending objects and calls"""
+        with self._lock:
+            self._pending = []
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type == None:
+            self.flush()
@@ -0,0 +1,438 @@
+#!/usr/bin/python
+""".. _testserver:
+
+local stand-in for a device42 appliance, serving the API endpoints used by device42api from a synthetic
+inventory with the same response shapes ({'msg': [...], 'code': 0} for writes), to test and benchmark
+the module without hardware
+
+>>> import device42api
+>>> from device42api.testserver import Inventory, FakeDevice42Server
+>>> srv = FakeDevice42Server(Inventory(racks_per_room=2, devices_per_rack=5), latency=0.005).start()
+>>> api = device42api.Device42API(host=srv.host, port=srv.port, username='admin', password='changeme', scheme='http')
+>>> len(api.get_rack())
+8
+>>> srv.stop()
+
+or from the shell, serving https if a certificate is given
+
+    $ python -m device42api.testserver --port 8443 --devices-per-rack 20 --latency 0.01 --error-rate 0.001
+
+"""
+
+import argparse
+import random
+import ssl
+import threading
+import time
+import simplejson as json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+def _matches(record, filters):
+    """True if record has the values of the filters (query arguments) it knows, others are ignored"""
+    return all(u'%s' % record[k] == v for k, v in filters.items() if k in record)
+
+class Inventory(object):
+    """.. _Inventory:
+
+    synthetic in-memory device42 inventory, buildings > rooms > racks > devices/assets > macs > ips
+
+    >>> inv = Inventory(buildings=2, rooms_per_building=2, racks_per_room=4, devices_per_rack=10)
+    >>> len(inv.devices), len(inv.macs), len(inv.ips)
+    (160, 320, 320)
+
+    """
+    def __init__(self, buildings=2, rooms_per_building=2, racks_per_room=2, devices_per_rack=10, assets_per_rack=2,
+                 macs_per_device=2, ips_per_mac=1, custom_fields_per_device=1, seed=0):
+        self.lock           = threading.RLock()
+        self._ids           = {}
+        self.buildings      = {}
+        self.rooms          = {}
+        self.racks          = {}
+        self.devices        = {}
+        self.assets         = {}
+        self.macs           = {}
+        self.ips            = {}
+        self.dns_records    = {}
+        self.hardwares      = {}
+        self.customers      = {}
+        self.other          = {}
+        rnd = random.Random(seed)
+        for h in ('Generic Hardware 1U', 'Generic Hardware 2U'):
+            self.add('hardwares', name=h, size=int(h[-2]))
+        self.add('customers', name='device42 Support', contact_info='device42 Support Team', Contacts=[])
+        for b in range(1, buildings + 1):
+            building = self.add('buildings', name='Building %s' % b, address='Street %s' % b, notes='')
+            for r in range(1, rooms_per_building + 1):
+                room = self.add('rooms', name='Room %s-%s' % (b, r), building=building['name'],
+                                building_id=building['building_id'], notes='')
+                for k in range(1, racks_per_room + 1):
+                    rack = self.add('racks', name='Rack %s-%s-%s' % (b, r, k), size=42, room=room['name'],
+                                    room_id=room['room_id'], building=building['name'], row='',
+                                    numbering_start_from_bottom='yes', first_number=1, manufacturer='', notes='')
+                    for d in range(devices_per_rack):
+                        n = len(self.devices) + 1
+                        device = self.add('devices', name='device-%06d' % n, serial_no='SN%08d' % n,
+                                          asset_no='', hw_model='Generic Hardware 1U', type='physical',
+                                          service_level='Production', in_service=True, os='RHEL Server',
+                                          osver='6.5', memory=float(rnd.choice((8, 16, 32, 64))),
+                                          cpucount=rnd.choice((1, 2, 4)), cpucore=rnd.choice((4, 8, 16)),
+                                          hddcount=2, hddsize=float(rnd.choice((300, 600, 1200))), notes='',
+                                          uuid='00000000-0000-0000-0000-%012d' % n, customer='', aliases=[],
+                                          custom_fields=[dict(key='cf%s' % c, value='v%s' % c, notes='')
+                                                         for c in range(custom_fields_per_device)],
+                                          rack_id=rack['rack_id'], start_at=float(d + 1))
+                        for m in range(macs_per_device):
+                            mac = self.add('macs', macaddress='02:%02x:%02x:%02x:%02x:%02x' % (
+                                           (n >> 24) & 255, (n >> 16) & 255, (n >> 8) & 255, n & 255, m),
+                                           port_name='eth%s' % m, device=device['name'], vlan='')
+                            for i in range(ips_per_mac):
+                                o = len(self.ips) + 1
+                                self.add('ips', ip='10.%s.%s.%s' % ((o >> 16) & 255, (o >> 8) & 255, o & 255),
+                                         label='', subnet='10.0.0.0/8', type='static', device=device['name'],
+                                         macaddress=mac['macaddress'], notes='')
+                    for a in range(assets_per_rack):
+                        self.add('assets', name='asset-%s-%s' % (rack['rack_id'], a), type='Patch Panel',
+                                 serial_no='', vendor='Test', building=building['name'], room=room['name'],
+                                 rack_id=rack['rack_id'], start_at=float(devices_per_rack + a + 1), size=1,
+                                 service_level='Production', customer_id=None, notes='',
+                                 patch_panel_model_id=1)
+    _id_keys = dict(buildings='building_id', rooms='room_id', racks='rack_id', devices='device_id',
+                    assets='asset_id', macs='macaddress_id', ips='ip_id', dns_records='record_id',
+                    hardwares='hardware_id', customers='customer_id', vlans='vlan_id')
+    def add(self, table, **record):
+        """store a new record in table and return it with its id set"""
+        with self.lock:
+            i = self._ids[table] = self._ids.get(table, 0) + 1
+            record['id'] = i
+            if table in self._id_keys:
+                record[self._id_keys[table]] = i
+            store = getattr(self, table, None)
+            if store == None:
+                store = self.other.setdefault(table, {})
+            store[i] = record
+            return record
+    def find(self, table, **match):
+        """return the first record of table matching all given values or None"""
+        with self.lock:
+            for r in getattr(self, table).values():
+                if all(r.get(k) == v for k, v in match.items()):    return r
+        return None
+    def upsert(self, table, key, values):
+        """update the record of table whose key (a field or a tuple of fields) equals values or add it,
+        return (record, created)"""
+        keys = key if isinstance(key, tuple) else (key,)
+        with self.lock:
+            match = dict((k, values.get(k)) for k in keys)
+            record = self.find(table, **match) if None not in match.values() else None
+            if record == None:
+                return self.add(table, **values), True
+            record.update(values)
+            return record, False
+    def device_summary(self, d):
+        return dict(name=d['name'], device_id=d['device_id'], serial_no=d['serial_no'], hw_model=d['hw_model'])
+    def rack_children(self):
+        """return {rack_id: (devices, assets)} of all racks"""
+        children = dict((i, ([], [])) for i in self.racks)
+        for d in self.devices.values():
+            if d.get('rack_id') in children:
+                children[d['rack_id']][0].append(dict(device=self.device_summary(d), start_at=d['start_at'], size=1))
+        for a in self.assets.values():
+            if a.get('rack_id') in children:
+                children[a['rack_id']][1].append(dict(a))
+        return children
+    def rack_json(self, rack, children=None):
+        r = dict(rack)
+        if children != False:
+            if children == None:
+                children = self.rack_children()
+            r['devices'], r['assets'] = children[rack['rack_id']]
+        return r
+    def addresses(self):
+        """return the {device name: [mac]} and {device name: [ip]} of all devices"""
+        macs, ips = {}, {}
+        for m in self.macs.values():
+            macs.setdefault(m.get('device'), []).append(dict(mac=m['macaddress'], port_name=m['port_name'], vlan=m['vlan']))
+        for i in self.ips.values():
+            ips.setdefault(i.get('device'), []).append(dict(ip=i['ip'], label=i['label'], subnet=i['subnet'], type=i['type']))
+        return macs, ips
+    def device_json(self, d, addresses=None):
+        r = dict(d)
+        macs, ips = addresses or self.addresses()
+        r['mac_addresses'] = macs.get(d['name'], [])
+        r['ip_addresses']  = ips.get(d['name'], [])
+        return r
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version        = 'HTTP/1.1'
+    # send headers and body in one segment, otherwise delayed ACKs add ~40ms to every request
+    wbufsize                = 65536
+    disable_nagle_algorithm = True
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+    def do_GET(self):       self.__dispatch__('GET')
+    def do_POST(self):      self.__dispatch__('POST')
+    def do_PUT(self):       self.__dispatch__('PUT')
+    def __dispatch__(self, method):
+        srv     = self.server
+        url     = urlsplit(self.path)
+        body    = b''
+        if 'content-length' in self.headers:
+            body = self.rfile.read(int(self.headers['content-length']))
+        srv.count(method, url.path)
+        if srv.latency or srv.jitter:
+            time.sleep(srv.latency + srv.random.uniform(0, srv.jitter))
+        if srv.error_rate and srv.random.random() < srv.error_rate:
+            return self.__reply__(500, dict(msg='injected error', code=1))
+        path = url.path
+        for prefix in ('/api/1.0/', '/api/'):
+            if path.startswith(prefix):
+                path = path[len(prefix):]
+                break
+        parts   = [unquote(p) for p in path.strip('/').split('/')]
+        values  = dict(parse_qsl(body.decode('utf-8'))) if body else {}
+        with srv.inventory.lock:
+            try:
+                if method == 'GET':
+                    status, rsp = srv.get(parts, url.query)
+                else:
+                    status, rsp = srv.write(method, parts, values)
+            except (ValueError, KeyError, IndexError) as e:
+                status, rsp = 400, dict(msg=u'bad request %s' % e, code=1)
+        self.__reply__(status, rsp)
+    def __reply__(self, status, rsp):
+        data = json.dumps(rsp).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeDevice42Server(ThreadingHTTPServer):
+    """.. _FakeDevice42Server:
+
+    threaded HTTP(S) server answering like a device42 appliance from an Inventory
+
+    * latency       # seconds added to every request
+    * jitter        # up to that many random seconds added on top
+    * error_rate    # share of requests answered with 500 {'msg': 'injected error', 'code': 1}
+    * certfile      # serve https with that certificate (and keyfile)
+
+    >>> srv = FakeDevice42Server(Inventory(), port=0, latency=0.01, error_rate=0.01).start()
+    >>> srv.requests
+    {}
+
+    """
+    daemon_threads      = True
+    allow_reuse_address = True
+    _msg = dict(buildings='Building added/updated successfully', rooms='Room added/updated successfully',
+                racks='rack added/updated.', assets='asset added/edited.', device='device added or updated',
+                macs='mac address successfully added/updated', ip='ip added or updated',
+                hardwares='hardware model added or updated', customers='Customer added or updated.',
+                subnets='subnet successfully added/updated', vlans='vlan successfully added',
+                switchports='switchport successfully added/updated', pdus='PDU Rack Info successfully added/edited.',
+                patch_panel_ports='patch port details edited successfully.')
+    _tables = dict(buildings='buildings', rooms='rooms', racks='racks', assets='assets', device='devices',
+                   macs='macs', ip='ips', hardwares='hardwares', customers='customers')
+    def __init__(self, inventory=None, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 certfile=None, keyfile=None, seed=0, verbose=False):
+        ThreadingHTTPServer.__init__(self, (host, port), Handler)
+        self.inventory  = inventory if inventory != None else Inventory()
+        self.latency    = float(latency)
+        self.jitter     = float(jitter)
+        self.error_rate = float(error_rate)
+        self.random     = random.Random(seed)
+        self.verbose    = verbose
+        self.scheme     = 'http'
+        self.requests   = {}
+        self._lock      = threading.Lock()
+        self._thread    = None
+        if certfile != None:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(certfile, keyfile)
+            self.socket = ctx.wrap_socket(self.socket, server_side=True)
+            self.scheme = 'https'
+    @property
+    def host(self):
+        return self.server_address[0]
+    @property
+    def port(self):
+        return self.server_address[1]
+    @property
+    def url(self):
+        return u'%s://%s:%s/api/1.0/' % (self.scheme, self.host, self.port)
+    def count(self, method, path):
+        with self._lock:
+            key = '%s %s' % (method, path)
+            self.requests[key] = self.requests.get(key, 0) + 1
+    def total_requests(self):
+        with self._lock:
+            return sum(self.requests.values())
+    def start(self):
+        """serve in a background thread and return self"""
+        self._thread = threading.Thread(target=self.serve_forever, name='device42-testserver', daemon=True)
+        self._thread.start()
+        return self
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread != None:
+            self._thread.join()
+    def __enter__(self):
+        return self.start()
+    def __exit__(self, *args):
+        self.stop()
+    def get(self, parts, query=''):
+        inv = self.inventory
+        filters = dict(parse_qsl(query or ''))
+        what, rest = parts[0], parts[1:]
+        if what == 'buildings':
+            return 200, dict(buildings=list(inv.buildings.values()))
+        elif what == 'rooms' and not rest:
+            return 200, dict(rooms=list(inv.rooms.values()))
+        elif what == 'rooms':
+            room = inv.rooms.get(int(rest[0]))
+            if room == None:    return 404, dict(msg='room not found', code=1)
+            r = dict(room)
+            r['racks']   = [inv.rack_json(k, False) for k in inv.racks.values() if k['room_id'] == room['room_id']]
+            r['devices'] = []
+            r['assets']  = []
+            return 200, r
+        elif what == 'racks' and not rest:
+            children = inv.rack_children()
+            return 200, dict(racks=[inv.rack_json(r, children) for r in inv.racks.values()])
+        elif what == 'racks':
+            rack = inv.racks.get(int(rest[0]))
+            if rack == None:    return 404, dict(msg='rack not found', code=1)
+            return 200, inv.rack_json(rack)
+        elif what == 'assets' and not rest:
+            return 200, dict(assets=[a for a in inv.assets.values() if _matches(a, filters)])
+        elif what == 'assets':
+            asset = inv.assets.get(int(rest[0]))
+            if asset == None:   return 404, dict(msg='asset not found', code=1)
+            return 200, asset
+        elif what == 'macs':
+            return 200, dict(macaddresses=list(inv.macs.values()))
+        elif what in ('subnets', 'vlans', 'switchports'):
+            return 200, {what: list(inv.other.get(what, {}).values())}
+        elif what == 'ips':
+            return 200, dict(total_count=len(inv.ips), ips=list(inv.ips.values()))
+        elif what == 'devices' and rest[:1] == ['all']:
+            addresses = inv.addresses()
+            devices = [inv.device_json(d, addresses) for d in inv.devices.values() if _matches(d, filters)]
+            return 200, dict(total_count=len(devices), Devices=devices)
+        elif what == 'devices' and len(rest) >= 2:
+            if rest[0] == 'id':         d = inv.devices.get(int(rest[1]))
+            elif rest[0] == 'name':     d = inv.find('devices', name=rest[1])
+            elif rest[0] == 'serial':   d = inv.find('devices', serial_no=rest[1])
+            else:                       d = None
+            if d == None:   return 404, dict(msg='device not found', code=1)
+            return 200, inv.device_json(d)
+        elif what == 'customers':
+            return 200, dict(Customers=list(inv.customers.values()))
+        elif what == 'service_level':
+            return 200, [dict(name=n, id=i) for i, n in enumerate(('Production', 'QA', 'Development'), 1)]
+        elif what == 'pdu_models':
+            return 200, dict(pdu_models=[])
+        elif what in ('history', 'patch_panel_models'):
+            return 200, []
+        elif what == 'dns' and rest[:1] == ['records']:
+            return 200, dict(records=list(inv.dns_records.values()))
+        return 404, dict(msg='unknown path %s' % '/'.join(parts), code=1)
+    def write(self, method, parts, values):
+        inv = self.inventory
+        what = parts[0]
+        if method == 'PUT' and (what == 'custom_fields' or parts[:2] == ['device', 'custom_field']):
+            table = 'devices' if what == 'device' else (parts[1] + 's' if len(parts) > 1 else '')
+            obj = inv.find(table, name=values.get('name')) if hasattr(inv, table) else None
+            if obj == None:     return 200, dict(msg='object not found', code=1)
+            fields = obj.setdefault('custom_fields', [])
+            for cf in fields:
+                if cf['key'] == values.get('key'):
+                    cf.update(value=values.get('value', ''), notes=values.get('notes', ''))
+                    break
+            else:
+                fields.append(dict(key=values.get('key'), value=values.get('value', ''), notes=values.get('notes', '')))
+            return 200, dict(msg=['custom key pair values added or updated', obj['id'], obj['name']], code=0)
+        if method != 'POST':
+            return 405, dict(msg='method not allowed', code=1)
+        if parts[:2] == ['device', 'rack']:
+            d = inv.find('devices', name=values.get('device'))
+            r = inv.racks.get(int(values.get('rack_id', 0) or 0))
+            if d == None or r == None:  return 200, dict(msg='device or rack not found', code=1)
+            d['rack_id'] = r['rack_id']
+            start_at = values.get('start_at', 'auto')
+            if start_at == 'auto':
+                used = [x['start_at'] for x in inv.devices.values() if x.get('rack_id') == r['rack_id'] and x is not d]
+                start_at = max(used + [0.0]) + 1
+            d['start_at'] = float(start_at)
+            return 200, dict(msg=['device added or updated in the rack', d['id'], '[%s] - %s' % (d['start_at'], r['name'])], code=0)
+        if what == 'dns' and parts[1:2] == ['records']:
+            key = ('type', 'name') if values.get('type') == 'PTR' else ('type', 'name', 'content')
+            rec, created = inv.upsert('dns_records', key, dict(values))
+            return 200, dict(msg=['DNS record added/updated successfully', rec['id'], rec.get('name', '')], code=0)
+        if what == 'macs':
+            rec, created = inv.upsert('macs', 'macaddress', dict(values))
+            rec.setdefault('port_name', '')
+            rec.setdefault('vlan', '')
+            return 200, dict(msg=[self._msg['macs'], rec['id'], rec['macaddress'], created, True], code=0)
+        if what == 'ip':
+            values = dict(values)
+            values['ip'] = values.pop('ipaddress', values.get('ip'))
+            if 'tag' in values:     values['label'] = values.pop('tag')
+            rec, created = inv.upsert('ips', 'ip', values)
+            for k in ('label', 'subnet', 'type', 'notes'):
+                rec.setdefault(k, '')
+            return 200, dict(msg=[self._msg['ip'], rec['id'], rec['ip'], created, True], code=0)
+        if what in self._tables:
+            table   = self._tables[what]
+            values  = dict(values)
+            if table == 'devices' and 'hardware' in values:
+                values['hw_model'] = values.pop('hardware')
+            if 'name' not in values:
+                return 200, dict(msg='name is required', code=1)
+            rec, created = inv.upsert(table, 'name', values)
+            if table == 'devices' and created:
+                # an update keeps the fields not sent
+                for k in ('serial_no', 'hw_model', 'start_at'):
+                    rec.setdefault(k, '')
+                rec.setdefault('custom_fields', [])
+            return 200, dict(msg=[self._msg[what], rec['id'], rec['name'], created, True], code=0)
+        if what in self._msg:
+            rec = inv.add(what, **values)
+            return 200, dict(msg=[self._msg[what], rec['id'], values.get('name', ''), True, True], code=0)
+        return 404, dict(msg='unknown path %s' % '/'.join(parts), code=1)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='local stand-in device42 appliance serving a synthetic inventory')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8443)
+    p.add_argument('--buildings', type=int, default=2)
+    p.add_argument('--rooms-per-building', type=int, default=2)
+    p.add_argument('--racks-per-room', type=int, default=4)
+    p.add_argument('--devices-per-rack', type=int, default=20)
+    p.add_argument('--assets-per-rack', type=int, default=2)
+    p.add_argument('--macs-per-device', type=int, default=2)
+    p.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    p.add_argument('--jitter', type=float, default=0.0, help='random seconds added on top of latency')
+    p.add_argument('--error-rate', type=float, default=0.0, help='share of requests failing with 500')
+    p.add_argument('--certfile', default=None, help='serve https with this certificate')
+    p.add_argument('--keyfile', default=None)
+    p.add_argument('--verbose', action='store_true')
+    args = p.parse_args(argv)
+    inv = Inventory(buildings=args.buildings, rooms_per_building=args.rooms_per_building,
+                    racks_per_room=args.racks_per_room, devices_per_rack=args.devices_per_rack,
+                    assets_per_rack=args.assets_per_rack, macs_per_device=args.macs_per_device)
+    srv = FakeDevice42Server(inv, args.host, args.port, args.latency, args.jitter, args.error_rate,
+                             args.certfile, args.keyfile, verbose=args.verbose)
+    print(u'serving %s devices on %s' % (len(inv.devices), srv.url))
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,16 @@ dev_requires = [
     'ipython'
 ]
 
+# optional faster JSON decoding of response bodies, `pip install -e ".[fast]"`
+fast_requires = [
+    'orjson'
+]
+
+# optional Parquet/Arrow output of device42api.columnar, `pip install -e ".[columnar]"`
+columnar_requires = [
+    'pyarrow'
+]
+
 setup(
     name=name,
     version=version,
@@ -54,5 +64,7 @@ setup(
     install_requires=install_requires,
     extras_require={
         'dev': dev_requires,
+        'fast': fast_requires,
+        'columnar': columnar_requires,
     },
 )
@@ -0,0 +1,23 @@
+import pytest
+import device42api
+from device42api.testserver import Inventory, FakeDevice42Server
+
+@pytest.fixture
+def server():
+    """a FakeDevice42Server with 1 building, 1 room, 2 racks of 5 devices and 2 assets each"""
+    srv = FakeDevice42Server(Inventory(buildings=1, rooms_per_building=1, racks_per_room=2, devices_per_rack=5))
+    with srv:
+        yield srv
+
+@pytest.fixture
+def api(server):
+    return device42api.Device42API(host=server.host, port=server.port, username='admin', password='changeme',
+                                   scheme=server.scheme, noInit=True)
+
+@pytest.fixture
+def count(server):
+    """return a function counting the requests of server whose path starts with /api/1.0/template"""
+    def count(method, template):
+        prefix = '%s /api/1.0/%s' % (method, template)
+        return sum(n for k, n in server.requests.items() if k.startswith(prefix))
+    return count
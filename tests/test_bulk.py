@@ -0,0 +1,52 @@
+import device42api
+from device42api import bulk
+
+def test_set_custom_fields_skips_unchanged_and_duplicate_values(server, api, count):
+    d1, d2 = api.get_device(name='device-000001'), api.get_device(name='device-000002')
+    d2.custom_fields.append(dict(key='owner', value='ops', notes=''))
+    items = [(d1, 'owner', 'dev'), (d1, 'owner', 'ops'), (d2, 'owner', 'ops'), (d2, 'checked', '2014-04-02', 'date')]
+    result = bulk.set_custom_fields(api, items, workers=4)
+    assert result == dict(updated=2, unchanged=1, duplicates=1, failed=0, errors=[])
+    assert count('PUT', 'device/custom_field/') == 2
+    fields = server.inventory.find('devices', name='device-000001')['custom_fields']
+    assert [(cf['key'], cf['value']) for cf in fields if cf['key'] == 'owner'] == [('owner', 'ops')]
+    # the objects are updated, writing the same values again sends nothing
+    assert bulk.set_custom_fields(api, items)['unchanged'] == 3
+    assert count('PUT', 'device/custom_field/') == 2
+
+def test_set_custom_fields_reports_failures(server, api):
+    d = api.get_device(name='device-000001')
+    b = device42api.Building(api=api)
+    b.name = 'unknown building'
+    v = device42api.IPAM_vlan(api=api)
+    v.name = 'servers'
+    result = bulk.set_custom_fields(api, [(d, 'owner', 'ops'), (b, 'owner', 'ops'), (v, 'owner', 'ops')])
+    assert (result['updated'], result['failed']) == (1, 2)
+    errors = dict((name, e) for name, key, e in result['errors'])
+    assert errors['unknown building']['msg'] == 'object not found'
+    assert isinstance(errors['servers'], device42api.Device42APIObjectException)
+    assert b.custom_fields == [] and v.custom_fields == []
+
+def test_add_interfaces_skips_the_addresses_the_device_has(server, api, count):
+    d = api.get_device(name='device-000001')
+    mac, ip = d.mac_addresses[0].macaddress, d.ip_addresses[0].ipaddress
+    result = bulk.add_interfaces(d, [('eth0', mac.upper(), [ip, '10.200.0.1']), ('eth2', '00:11:22:33:44:55', '10.200.0.2'),
+                                     (None, None, ['10.200.0.1'])])
+    assert result == dict(macs=1, ips=2, skipped=3, failed=0, errors=[])
+    assert count('POST', 'macs/') == 1 and server.requests.get('POST /api/ip/', 0) == 2
+    assert server.inventory.find('ips', ip='10.200.0.2')['macaddress'] == '00:11:22:33:44:55'
+    assert len(d.mac_addresses) == 3 and len(d.ip_addresses) == 4
+
+def test_add_interfaces_fails_the_ips_of_a_failed_mac(server, api, count):
+    d, write = api.get_device(name='device-000001'), server.write
+    def fail_mac(method, parts, values):
+        if parts[0] == 'macs' and values.get('macaddress') == '00:11:22:33:44:55':
+            return 500, dict(msg='injected error', code=1)
+        return write(method, parts, values)
+    server.write = fail_mac
+    result = bulk.add_interfaces(d, [('eth2', '00:11:22:33:44:55', ['10.200.0.1', '10.200.0.2']),
+                                     ('eth3', '00:11:22:33:44:66', '10.200.0.3')])
+    assert (result['macs'], result['ips'], result['failed']) == (1, 1, 3)
+    assert [a for a, e in result['errors']] == ['00:11:22:33:44:55', '10.200.0.1', '10.200.0.2']
+    assert server.requests.get('POST /api/ip/', 0) == 1
+    assert server.inventory.find('ips', ip='10.200.0.1') == None
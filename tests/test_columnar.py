@@ -0,0 +1,39 @@
+import pytest
+from device42api import columnar
+
+pyarrow = pytest.importorskip('pyarrow')
+import pyarrow.ipc
+import pyarrow.parquet
+
+@pytest.fixture
+def levels(server):
+    # a category column whose dictionary differs from batch to batch
+    for i, d in enumerate(server.inventory.devices.values()):
+        d['service_level'] = 'level-%d' % (i % 7)
+    return [d['service_level'] for d in server.inventory.devices.values()]
+
+def test_arrow_export_of_several_batches(api, levels, tmp_path):
+    filename = str(tmp_path / 'devices.arrow')
+    assert columnar.export(api, 'devices', filename, batch_size=3) == len(levels)
+    with pyarrow.ipc.open_file(filename) as reader:
+        t = reader.read_all()
+    assert t.num_rows == len(levels)
+    assert t.column('service_level').to_pylist() == levels
+
+@pytest.mark.parametrize('name', ['devices.arrows', 'devices.ipc'])
+def test_arrow_stream_export_of_several_batches(api, levels, tmp_path, name):
+    filename = str(tmp_path / name)
+    assert columnar.export(api, 'devices', filename, batch_size=3) == len(levels)
+    with pyarrow.ipc.open_stream(filename) as reader:
+        t = reader.read_all()
+    assert t.column('service_level').to_pylist() == levels
+
+def test_parquet_export_of_several_batches(api, levels, tmp_path):
+    filename = str(tmp_path / 'devices.parquet')
+    assert columnar.export(api, 'devices', filename, batch_size=3) == len(levels)
+    assert pyarrow.parquet.read_table(filename).column('service_level').to_pylist() == levels
+
+def test_table_of_several_batches(api, levels):
+    t = columnar.table(api, 'devices', batch_size=3)
+    assert t.num_rows == len(levels)
+    assert t.column('service_level').to_pylist() == levels
@@ -0,0 +1,36 @@
+import pytest
+import device42api
+
+def installed():
+    names = ['simplejson', 'json']
+    if device42api.orjson != None:     names.append('orjson')
+    return names
+
+@pytest.mark.parametrize('name', installed())
+def test_decoders_return_the_same_objects(server, name):
+    api = device42api.Device42API(host=server.host, port=server.port, username='admin', password='changeme',
+                                  scheme=server.scheme, noInit=True, decoder=name)
+    d = api.get_device(name='device-000001')
+    assert (d.name, d.serial_no, len(d.ip_addresses)) == ('device-000001', 'SN00000001', 2)
+    stats = api.decode_stats()
+    assert stats['decoder'] == name
+    assert stats['calls'] == stats['requests'] == 3
+    assert stats['bytes'] > 0 and stats['decode_seconds'] > 0
+
+def test_decoder_bytes_and_text():
+    for name in installed():
+        decoder = device42api.get_decoder(name)
+        assert decoder.decode(b'{"name": "R\\u00e4ck", "size": 42}') == dict(name=u'Räck', size=42)
+        assert decoder.decode(u'{"ids": [1, 2.5, null]}') == dict(ids=[1, 2.5, None])
+        assert decoder.stats()['calls'] == 2
+
+def test_custom_decoder_and_unknown_names():
+    class Counting(device42api.StdlibDecoder):
+        name = 'counting'
+    decoder = Counting()
+    assert device42api.get_decoder(decoder) is decoder
+    assert device42api.get_decoder().name == ('orjson' if device42api.orjson != None else 'simplejson')
+    with pytest.raises(device42api.Device42APIObjectException):
+        device42api.get_decoder('yaml')
+    with pytest.raises(device42api.Device42APIObjectException):
+        device42api.JSONDecoder().decode(b'{}')
@@ -0,0 +1,31 @@
+import device42api
+from device42api.dnssync import DNSSync
+
+def test_dns_records_are_written_once(server, api):
+    sync  = DNSSync(api, ttl=3600)
+    pairs = [('10.0.0.1', 'web01.example.com'), ('10.0.0.2', 'web02.example.com')]
+    plan  = sync.plan(pairs)
+    assert plan.summary() == dict(create=4, update=0, unchanged=0, stale=0)
+    assert sync.apply(plan) == dict(written=4, failed=0, errors=[])
+    assert sync.plan(pairs).summary() == dict(create=0, update=0, unchanged=4, stale=0)
+
+def test_renamed_device_updates_the_ptr_and_reports_the_stale_record(server, api):
+    sync = DNSSync(api, ttl=3600)
+    assert sync.sync([('10.0.0.1', 'web01.example.com')]).result == dict(written=2, failed=0, errors=[])
+    plan = sync.plan([('10.0.0.1', 'web01-new.example.com')])
+    assert plan.summary() == dict(create=1, update=1, unchanged=0, stale=1)
+    assert plan.update[0][1]['content'] == 'web01-new.example.com'
+    assert plan.stale[0]['name'] == 'web01.example.com'
+
+def test_one_name_with_two_addresses_keeps_both_a_records(server, api):
+    sync  = DNSSync(api, ttl=3600)
+    pairs = [('10.0.0.1', 'www.example.com'), ('10.0.0.2', 'www.example.com')]
+    assert sync.sync(pairs).result == dict(written=4, failed=0, errors=[])
+    a = [r for r in server.inventory.dns_records.values() if r['type'] == 'A']
+    assert sorted(r['content'] for r in a) == ['10.0.0.1', '10.0.0.2']
+    assert sync.plan(pairs).summary() == dict(create=0, update=0, unchanged=4, stale=0)
+
+def test_dry_run_writes_nothing(server, api, count):
+    plan = DNSSync(api).sync([('10.0.0.1', 'web01.example.com')], dry_run=True)
+    assert (plan.summary()['create'], plan.result) == (2, None)
+    assert count('POST', 'dns/') == 0
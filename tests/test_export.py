@@ -0,0 +1,48 @@
+import gzip
+import io
+import pytest
+import simplejson as json
+import device42api
+from device42api.export import Exporter
+
+COUNTS = {'Building': 1, 'Room': 1, 'Rack': 2, 'Device': 10, 'Asset': 4, 'IPAM_ipaddress': 20, 'IPAM_macaddress': 20,
+          'errors': 0}
+
+def test_export_writes_every_object_once_after_its_parent(server, api, tmp_path):
+    filename = str(tmp_path / 'inventory.jsonl.gz')
+    assert Exporter(api, filename, workers=4, queue_size=2).run() == COUNTS
+    lines, seen = [json.loads(line) for line in gzip.open(filename, 'rt')], set()
+    for line in lines:
+        if line['parent'] != None:
+            assert tuple(line['parent']) in seen
+        if line['id'] != None:
+            seen.add((line['type'], line['id']))
+    assert len(lines) == sum(COUNTS.values())
+    devices = [l for l in lines if l['type'] == 'Device']
+    assert sorted(l['json']['name'] for l in devices) == ['device-%06d' % n for n in range(1, 11)]
+    assert set(tuple(l['parent']) for l in devices) == set([('Rack', 1), ('Rack', 2)])
+    macs = [l for l in lines if l['type'] == 'IPAM_macaddress' and l['parent'] == ['Device', 1]]
+    assert sorted(m['json']['macaddress'] for m in macs) == ['02:00:00:00:01:00', '02:00:00:00:01:01']
+
+def test_export_with_mac_ids(server, api):
+    fp = io.StringIO()
+    assert Exporter(api, fp, workers=2, mac_ids=True).run() == COUNTS
+    macs = [json.loads(l) for l in fp.getvalue().splitlines() if '"IPAM_macaddress"' in l]
+    assert all(m['id'] != None for m in macs)
+
+def test_objects_failing_to_load_are_counted(server, api):
+    get = server.get
+    def failing(parts, query=''):
+        if parts[:3] == ['devices', 'id', '3']:     return 200, ['not a device']
+        return get(parts, query)
+    server.get = failing
+    counts = Exporter(api, io.StringIO(), workers=2).run()
+    assert (counts['Device'], counts['IPAM_ipaddress'], counts['errors']) == (9, 18, 1)
+
+def test_failed_write_raises_without_blocking(server, api):
+    class Full(io.StringIO):
+        def write(self, text):
+            if self.tell() > 1000:  raise IOError('disk full')
+            return io.StringIO.write(self, text)
+    with pytest.raises(device42api.Device42APIObjectException):
+        Exporter(api, Full(), workers=2, queue_size=1).run()
@@ -0,0 +1,27 @@
+import threading
+import time
+import device42api
+
+def test_slow_request_is_won_by_the_hedge(server, api):
+    # the first request is slow, its hedge answers right away
+    slow = [0.5]
+    server.jitter = 1.0
+    server.random.uniform = lambda a, b: slow.pop() if slow else 0.0
+    api.hedge = device42api.Hedge(max_delay=0.05, budget=1.0)
+    threads = set()
+    api.add_hook('pre', lambda method, path, body: threads.add(threading.current_thread().name.split('_')[0]))
+    start = time.perf_counter()
+    assert api.__get_api__('buildings/')['buildings']
+    assert time.perf_counter() - start < 0.4
+    assert api.hedge_stats() == dict(requests=1, hedged=1, won=1, suppressed=0)
+    assert threads == set([threading.current_thread().name, 'device42api-hedge'])
+    # only the winning request is recorded
+    assert api.metrics.count('GET', 'buildings/') == 1
+
+def test_fast_request_is_not_hedged(server, api):
+    api.hedge = device42api.Hedge(max_delay=0.5, budget=1.0)
+    for i in range(5):
+        api.get_device(device_id=1 + i)
+    # get_device() reads macs/ as well
+    assert api.hedge_stats() == dict(requests=6, hedged=0, won=0, suppressed=0)
+    assert api.metrics.count('GET', 'devices/id/1/') == 5
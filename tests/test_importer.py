@@ -0,0 +1,69 @@
+import gzip
+import pytest
+import simplejson as json
+import device42api
+from device42api.importer import Mapping, Importer, read_rows
+
+MAPPING = dict(kind='device', fields=dict(name='hostname', serial_no='serial'), defaults=dict(type='physical'),
+               macs=['mac'], ips=['ip'])
+
+def rows(n, start=100):
+    return [dict(hostname='imported-%03d' % i, serial='S%03d' % i, mac='aa:bb:cc:dd:%02x:%02x' % (i // 256, i % 256),
+                 ip='10.100.0.%s' % i) for i in range(start, start + n)]
+
+def test_read_rows_of_csv_jsonl_and_gzip(tmp_path):
+    data = rows(3)
+    csv_name = str(tmp_path / 'rows.csv')
+    with open(csv_name, 'w') as fp:
+        fp.write('hostname,serial,mac,ip\n')
+        for r in data:  fp.write('%(hostname)s,%(serial)s,%(mac)s,%(ip)s\n' % r)
+    jsonl_name = str(tmp_path / 'rows.jsonl.gz')
+    with gzip.open(jsonl_name, 'wt') as fp:
+        for r in data:  fp.write(json.dumps(r) + '\n\n')
+    assert list(read_rows(csv_name)) == data
+    assert list(read_rows(jsonl_name)) == data
+    with pytest.raises(device42api.Device42APIObjectException):
+        list(read_rows(csv_name, format='xml'))
+
+def test_mapping_validation():
+    with pytest.raises(device42api.Device42APIObjectException):
+        Mapping('printer')
+    with pytest.raises(device42api.Device42APIObjectException):
+        Mapping('asset', macs=['mac'])
+
+def test_import_saves_objects_and_addresses(server, api):
+    stats = Importer(api, Mapping(**MAPPING), workers=4).run(rows(10))
+    assert (stats['rows'], stats['imported'], stats['failed'], stats['position']) == (10, 10, 0, 10)
+    d = server.inventory.find('devices', name='imported-105')
+    assert d['serial_no'] == 'S105'
+    assert server.inventory.find('macs', macaddress='aa:bb:cc:dd:00:69')['device'] == 'imported-105'
+    assert server.inventory.find('ips', ip='10.100.0.105')['device'] == 'imported-105'
+
+def test_failed_rows_are_written_and_passed(server, api, tmp_path):
+    data = rows(5)
+    data[2]['hostname'] = ''
+    errors = str(tmp_path / 'failed.jsonl')
+    stats = Importer(api, Mapping(**MAPPING), workers=2, errors=errors).run(data)
+    assert (stats['imported'], stats['failed'], stats['position']) == (4, 1, 5)
+    failed = [json.loads(line) for line in open(errors)]
+    assert [(f['row'], f['data']['serial']) for f in failed] == [(2, 'S102')]
+
+def test_interrupted_import_resumes_at_the_checkpoint(server, api, tmp_path):
+    checkpoint, data = str(tmp_path / 'import.ckpt'), rows(20)
+    def interrupted():
+        for i, row in enumerate(data):
+            if i == 12:     raise KeyboardInterrupt()
+            yield row
+    imp = Importer(api, Mapping(**MAPPING), workers=4, checkpoint=checkpoint, checkpoint_every=5)
+    with pytest.raises(KeyboardInterrupt):
+        imp.run(interrupted())
+    # the rows in flight finished before the checkpoint was written at the interruption
+    assert imp.resume() == 12
+    assert json.load(open(checkpoint))['imported'] == 12
+    stats = Importer(api, Mapping(**MAPPING), workers=4, checkpoint=checkpoint).run(data)
+    assert (stats['rows'], stats['skipped'], stats['imported'], stats['position']) == (20, 12, 8, 20)
+    assert server.requests['POST /api/device/'] == 20
+    assert all(server.inventory.find('devices', name=r['hostname']) != None for r in data)
+    # a finished import starts at its end
+    stats = Importer(api, Mapping(**MAPPING), checkpoint=checkpoint).run(data)
+    assert (stats['skipped'], stats['imported']) == (20, 0)
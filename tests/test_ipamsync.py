@@ -0,0 +1,62 @@
+import time
+import device42api
+from device42api.ipamsync import IPAMSync
+
+def mac_of(server, n):
+    return list(server.inventory.macs.values())[n]
+
+def test_known_associations_are_unchanged(server, api, count):
+    m = mac_of(server, 0)
+    ip = server.inventory.find('ips', macaddress=m['macaddress'])
+    stats = IPAMSync(api).run([(m['macaddress'].upper().replace(':', '-'), ip['ip'], m['device'], None)])
+    assert (stats['unchanged'], stats['written']) == (1, 0)
+    assert count('POST', '') == 0
+
+def test_new_and_moved_associations_are_written(server, api):
+    m = mac_of(server, 0)
+    sync = IPAMSync(api, workers=2)
+    observations = [(m['macaddress'], None, 'device-000002', None), ('aabb.ccdd.eeff', '10.200.0.1', 'device-000003', None)]
+    assert sync.run(observations, dry_run=True)['written'] == 0
+    stats = sync.run(observations)
+    assert (stats['moved_macs'], stats['new_macs'], stats['new_ips'], stats['written']) == (1, 1, 1, 3)
+    assert server.inventory.find('macs', macaddress=m['macaddress'])['device'] == 'device-000002'
+    assert server.inventory.find('ips', ip='10.200.0.1')['macaddress'] == 'aa:bb:cc:dd:ee:ff'
+    assert sync.run(observations)['unchanged'] == 2
+
+def test_vlans_are_written_as_vlan_id(server, api):
+    server.inventory.add('vlans', number=12, name='Servers')
+    server.inventory.add('vlans', number=30, name='Storage')
+    m = mac_of(server, 0)
+    sync = IPAMSync(api)
+    stats = sync.run([(m['macaddress'], None, None, 30), ('aa:bb:cc:dd:ee:01', None, None, 'servers'),
+                      ('aa:bb:cc:dd:ee:02', None, None, 'unknown')])
+    assert stats['unknown_vlans'] == 1
+    assert server.inventory.find('macs', macaddress=m['macaddress'])['vlan_id'] == '2'
+    assert server.inventory.find('macs', macaddress='aa:bb:cc:dd:ee:01')['vlan_id'] == '1'
+    assert 'vlan_id' not in server.inventory.find('macs', macaddress='aa:bb:cc:dd:ee:02')
+    v = device42api.IPAM_vlan()
+    v.vlan_id = 2
+    assert sync.run([(m['macaddress'], None, None, v)], refresh=True)['unchanged'] == 1
+
+def test_observations_without_mac_and_ip_are_invalid(server, api):
+    stats = IPAMSync(api).run([(None, None, 'device-000001', None), dict(device='device-000002'),
+                               ('aa:bb:cc:dd:ee:01', None, 'device-000001', None)])
+    assert (stats['observations'], stats['invalid'], stats['new_macs'], stats['written']) == (3, 2, 1, 1)
+
+def test_a_failed_write_is_retried_by_the_next_observation(server, api):
+    sync, save = IPAMSync(api, workers=1), IPAMSync.__save__
+    def fail_once(obj):
+        if sync.stats['failed'] == 0:
+            raise device42api.Device42APIObjectException('unavailable')
+        return save(sync, obj)
+    sync.__save__ = fail_once
+    def observations():
+        yield ('aa:bb:cc:dd:ee:01', '10.200.0.1', 'device-000001', None)
+        deadline = time.time() + 5
+        while sync.stats['failed'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        yield ('aa:bb:cc:dd:ee:01', '10.200.0.1', 'device-000001', None)
+    stats = sync.run(observations())
+    # the mac failed, its ip was skipped, both are written by the second observation
+    assert (stats['failed'], stats['duplicates'], stats['written']) == (2, 0, 2)
+    assert server.inventory.find('ips', ip='10.200.0.1')['macaddress'] == 'aa:bb:cc:dd:ee:01'
@@ -0,0 +1,70 @@
+import pytest
+import device42api
+
+def test_templates_collapse_ids_names_and_serials():
+    m = device42api.RequestMetrics()
+    assert m.template('devices/id/156/?follow=yes') == 'devices/id/{id}/'
+    assert m.template('devices/name/web01/') == 'devices/name/{name}/'
+    assert m.template('devices/serial/SN1/') == 'devices/serial/{serial}/'
+    assert m.template('racks/12/') == 'racks/{id}/'
+    assert m.template('macs/') == 'macs/'
+
+def test_counts_errors_histogram_and_percentiles():
+    m = device42api.RequestMetrics()
+    for n, seconds in enumerate([0.001, 0.02, 0.02, 0.2, 3.0]):
+        m.record('GET', 'racks/%s/' % n, 200, seconds, 100)
+    m.record('GET', 'racks/9/', 500, 0.001)
+    m.record('GET', 'racks/10/', 0, 0.5)
+    e = m.snapshot()['GET racks/{id}/']
+    assert (e['count'], e['errors'], e['bytes_in'], e['status']) == (7, 2, 500, {200: 5, 500: 1, 0: 1})
+    assert sum(e['buckets']) == 7
+    assert m.count('GET', 'racks/1/') == 7
+    assert m.percentile('GET', 'racks/1/', 0.5) == 0.025
+    assert m.percentile('GET', 'racks/1/', 1.0) == 5.0
+    assert m.percentile('GET', 'macs/', 0.5) == None
+    m.reset()
+    assert m.snapshot() == {}
+
+def test_prometheus_exposition():
+    m = device42api.RequestMetrics()
+    m.record('GET', 'macs/', 200, 0.02, 10)
+    text = m.prometheus()
+    assert 'device42api_requests_total{method="GET",template="macs/",status="200"} 1' in text
+    assert 'device42api_request_seconds_bucket{method="GET",template="macs/",le="0.025"} 1' in text
+    assert 'device42api_request_seconds_bucket{method="GET",template="macs/",le="+Inf"} 1' in text
+    assert 'device42api_request_seconds_count{method="GET",template="macs/"} 1' in text
+    assert text.endswith('\n')
+
+def test_requests_of_the_api_are_recorded(server, api):
+    api.get_device(name='device-000001')
+    snap = api.metrics.snapshot()
+    e = snap['GET devices/name/{name}/']
+    assert (e['count'], e['errors'], e['status']) == (1, 0, {200: 1})
+    assert e['bytes_in'] > 0 and e['decode_seconds'] > 0
+    with pytest.raises(KeyError):
+        api.get_device(name='unknown')
+    assert api.metrics.snapshot()['GET devices/name/{name}/']['errors'] == 1
+
+def test_hooks_see_every_request(server, api):
+    pre, post = [], []
+    def before(method, path, body):     pre.append((method, path, body))
+    def after(method, path, status, seconds, size):     post.append((method, path, status, seconds >= 0, size > 0))
+    api.add_hook('pre', before)
+    api.add_hook('post', after)
+    b = device42api.Building(api=api)
+    b.name = 'Hooked'
+    b.save()
+    api.get_building('Hooked', reload=True)
+    assert [(m, p) for m, p, body in pre] == [('POST', 'buildings/'), ('GET', 'buildings/')]
+    assert 'name=Hooked' in pre[0][2] and pre[1][2] == None
+    assert post == [('POST', 'buildings/', 200, True, True), ('GET', 'buildings/', 200, True, True)]
+    api.remove_hook('pre', before)
+    api.remove_hook('post', after)
+    api.get_building('Hooked', reload=True)
+    assert len(pre) == len(post) == 2
+
+def test_invalid_hooks_are_refused(api):
+    with pytest.raises(device42api.Device42APIObjectException):
+        api.add_hook('during', lambda *a: None)
+    with pytest.raises(device42api.Device42APIObjectException):
+        api.add_hook('pre', None)
@@ -0,0 +1,53 @@
+import device42api
+
+def lazy_racks(api):
+    racks = []
+    for rack_id in (1, 2):
+        r = device42api.Rack(api=api)
+        r.rack_id = rack_id
+        r.load(lazy=True)
+        racks.append(r)
+    return racks
+
+def test_lazy_rack_loads_a_device_on_first_access(server, api, count):
+    r = lazy_racks(api)[0]
+    assert count('GET', 'racks/') == 2
+    devices = list(r.devices.values())
+    assert [d.name for d in devices] == ['device-%06d' % n for n in range(1, 6)]
+    assert count('GET', 'devices/') == 0
+    assert len(devices[0].ip_addresses) == 2
+    assert count('GET', 'devices/id/1/') == 1
+    assert count('GET', 'devices/') == 1
+
+def test_prefetch_sends_one_request_per_rack_and_kind(server, api, count):
+    racks = lazy_racks(api)
+    api.prefetch(racks, ['devices', 'devices.mac_addresses', 'assets'])
+    assert count('GET', 'devices/all/') == 2
+    assert count('GET', 'assets/') == 2
+    assert count('GET', 'devices/id/') == 0
+    d = racks[0].devices[1.0]
+    assert isinstance(d, device42api.Device)
+    assert [m.macaddress for m in d.mac_addresses] == ['02:00:00:00:01:00', '02:00:00:00:01:01']
+    assert len(d.ip_addresses) == 2
+    assert sorted(a.name for a in racks[1].assets.values()) == ['asset-2-0', 'asset-2-1']
+
+def test_prefetch_loads_children_missing_in_the_rack_response(server, api, count):
+    racks = lazy_racks(api)
+    # moved to the other rack after the rack was read
+    server.inventory.devices[3]['rack_id'] = 2
+    api.prefetch(racks, ['devices'])
+    assert count('GET', 'devices/all/') == 2
+    assert count('GET', 'devices/id/') == 1
+    assert racks[0].devices[3.0].serial_no == 'SN00000003'
+
+def test_get_rack_with_prefetch_caches_no_summaries(server, api, count):
+    racks = api.get_rack(name='Rack 1-1-1', prefetch=['devices'])
+    assert [r.name for r in racks] == ['Rack 1-1-1']
+    assert len(racks[0].devices) == 5
+    assert count('GET', 'racks/1/') == 1
+    assert count('GET', 'racks/2/') == 0
+    assert api._racks == {}
+    # the next call without prefetch loads and caches every rack
+    racks = api.get_rack(reload=False)
+    assert sorted(api._racks) == ['Rack 1-1-1', 'Rack 1-1-2']
+    assert count('GET', 'racks/2/') == 1
@@ -0,0 +1,30 @@
+import device42api
+from device42api.reconcile import Reconciler, field_kind, normalize
+
+def test_numbers_are_compared_as_numbers_only_for_numeric_fields():
+    kind = field_kind(device42api.Device, 'memory')
+    assert kind == 'number'
+    assert normalize('16', kind) == normalize(16, kind) == normalize(16.0, kind)
+    assert field_kind(device42api.Device, 'serial_no') == None
+    assert normalize('0123') != normalize('123')
+    assert normalize(' web01 ') == 'web01'
+
+def test_booleans_and_references():
+    kind = field_kind(device42api.Device, 'is_it_switch')
+    assert kind == 'bool'
+    assert normalize(True, kind) == normalize('yes', kind) == normalize('True', kind) == 'yes'
+    assert normalize(None) == ''
+    assert normalize(dict(name='Room 1-1', room_id=1)) == 'Room 1-1'
+
+def test_only_differing_fields_are_planned(server, api):
+    server.inventory.add('devices', name='web 01/a', serial_no='0123', memory=16.0, hw_model='Generic Hardware 1U')
+    d = device42api.Device(api=api)
+    d.name, d.serial_no, d.memory = 'web 01/a', '123', '16'
+    n = device42api.Device(api=api)
+    n.name = 'web02'
+    plan = Reconciler(api).plan([d, n])
+    assert plan.summary() == dict(create=1, update=1, unchanged=0)
+    update = [c for c in plan.changes if c.action == 'update'][0]
+    assert list(update.fields) == ['serial_no']
+    # found by the quoted name
+    assert server.requests['GET /api/1.0/devices/name/web%2001%2Fa/'] == 1
@@ -0,0 +1,23 @@
+import httplib2
+import simplejson as json
+import device42api
+from device42api.replay import RecordingTransport, ReplayTransport
+
+class CookieTransport(object):
+    """answers every request with a session cookie"""
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        return httplib2.Response({'status': '200', 'content-type': 'application/json',
+                                  'set-cookie': 'sessionid=0123456789abcdef; Path=/; HttpOnly'}), b'{"buildings": []}'
+
+def test_recording_holds_no_session_cookie_and_replays(tmp_path):
+    filename = str(tmp_path / 'session.jsonl')
+    with RecordingTransport(filename, inner=CookieTransport()) as t:
+        api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme', transport=t, noInit=True)
+        assert api.get_building('Building 1') == False
+    text = open(filename).read()
+    assert '0123456789abcdef' not in text and 'changeme' not in text
+    assert json.loads(text)['h']['set-cookie'] == 'sessionid=recorded; Path=/'
+    api = device42api.Device42API(host='127.0.0.1', username='admin', password='changeme',
+                                  transport=ReplayTransport(filename), noInit=True)
+    assert api.get_building('Building 1') == False
+    assert api._headers['Cookie'] == 'sessionid=recorded; Path=/'
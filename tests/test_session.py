@@ -0,0 +1,49 @@
+import pytest
+import device42api
+from device42api.session import Session
+
+def names(session):
+    return [sorted(p.name for p in level) for level in session.levels()]
+
+def test_objects_are_saved_after_the_objects_they_reference(server, api):
+    s = Session(api)
+    i = s.add(device42api.IPAM_ipaddress(api=api))
+    m = s.add(device42api.IPAM_macaddress(api=api))
+    d = s.add(device42api.Device(api=api))
+    k = s.add(device42api.Rack(api=api))
+    r = s.add(device42api.Room(api=api))
+    b = s.add(device42api.Building(api=api))
+    b.name = 'DC9'
+    r.name, r.building_id = 'Hall Z', b
+    k.name, k.size, k.room, k.room_id = 'Z01', 42, r, r
+    d.name, d.hardware = 'web99', 'Generic Hardware 1U'
+    s.place(d, k, start_at=3)
+    m.macaddress, m.device = '00:11:22:33:44:99', d
+    i.ipaddress, i.macaddress, i.device = '10.99.0.1', m, d
+    assert names(s) == [['Building', 'Device'], ['IPAM_macaddress', 'Room'], ['IPAM_ipaddress', 'Rack'], ['place web99']]
+    assert s.flush() == 7
+    inv = server.inventory
+    assert inv.rooms[r.room_id]['building_id'] == u'%s' % b.building_id
+    assert inv.racks[k.rack_id]['room_id'] == u'%s' % r.room_id
+    assert inv.devices[d.device_id]['rack_id'] == k.rack_id
+    assert inv.find('ips', ip='10.99.0.1')['macaddress'] == '00:11:22:33:44:99'
+    assert s.levels() == []
+
+def test_levels_are_kept_with_write_behind(server, api):
+    api.write_behind = device42api.WriteBehind(window=0.05)
+    with Session(api) as s:
+        b = s.add(device42api.Building(api=api))
+        r = s.add(device42api.Room(api=api))
+        b.name = 'DC9'
+        r.name, r.building_id = 'Hall Z', b
+    api.write_behind.close()
+    assert server.inventory.rooms[r.room_id]['building_id'] == u'%s' % b.building_id
+
+def test_circular_references_raise(api):
+    s = Session(api)
+    r = s.add(device42api.Room(api=api))
+    b = s.add(device42api.Building(api=api))
+    r.name, r.building_id = 'Hall Z', b
+    b.name, b.notes = 'DC9', r
+    with pytest.raises(device42api.Device42APIObjectException):
+        s.levels()
@@ -0,0 +1,92 @@
+import threading
+import time
+import pytest
+import device42api
+
+def concurrently(n, fn):
+    results, errors = [None] * n, [None] * n
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:   t.start()
+    for t in threads:   t.join()
+    return results, errors
+
+def test_identical_calls_are_executed_once():
+    sf, started = device42api.SingleFlight(), threading.Event()
+    def fn():
+        started.set()
+        time.sleep(0.2)
+        return dict(macaddresses=[dict(macaddress='00:00:00:00:00:01')])
+    results, errors = concurrently(4, lambda: sf.do('macs/', fn))
+    assert errors == [None] * 4
+    assert sf.stats() == dict(calls=4, executed=1, coalesced=3, inflight=0)
+    assert all(r == results[0] for r in results)
+
+def test_every_waiter_gets_its_own_copy():
+    sf = device42api.SingleFlight()
+    def fn():
+        time.sleep(0.2)
+        return dict(macaddresses=[dict(macaddress='00:00:00:00:00:01')])
+    results, errors = concurrently(4, lambda: sf.do('macs/', fn))
+    assert len(set(id(r) for r in results)) == 4
+    results[0]['macaddresses'][0]['macaddress'] = 'changed'
+    assert [r['macaddresses'][0]['macaddress'] for r in results[1:]] == ['00:00:00:00:00:01'] * 3
+
+def test_error_is_raised_by_every_caller():
+    sf = device42api.SingleFlight()
+    def fn():
+        time.sleep(0.2)
+        raise device42api.Device42APIObjectException('failed')
+    results, errors = concurrently(3, lambda: sf.do('macs/', fn))
+    assert all(isinstance(e, device42api.Device42APIObjectException) for e in errors)
+    assert sf.stats()['executed'] == 1
+
+def test_api_sends_one_request_for_concurrent_gets(server, api, count):
+    server.latency = 0.2
+    results, errors = concurrently(4, lambda: api.__get_api__('buildings/'))
+    assert errors == [None] * 4
+    assert count('GET', 'buildings/') == 1
+    assert api.coalesce_stats()['coalesced'] == 3
+
+def test_leader_modifying_its_result_doesnt_change_the_waiters():
+    sf, joined = device42api.SingleFlight(), threading.Event()
+    def fn():
+        joined.wait(1.0)
+        time.sleep(0.05)
+        return dict(hardware=dict(name='Generic Hardware 1U'), items=list(range(1000)))
+    def leader():
+        rsp = sf.do('devices/id/1/', fn)
+        # like Device.__apply__, the caller rewrites the response at once
+        rsp['hardware'] = ''
+        del rsp['items'][:]
+        return rsp
+    def waiter():
+        time.sleep(0.02)
+        joined.set()
+        return sf.do('devices/id/1/', fn)
+    results = [None, None]
+    def run(i, f):
+        results[i] = f()
+    threads = [threading.Thread(target=run, args=(0, leader)), threading.Thread(target=run, args=(1, waiter))]
+    for t in threads:   t.start()
+    for t in threads:   t.join()
+    assert sf.stats()['coalesced'] == 1
+    assert results[0] == dict(hardware='', items=[])
+    assert results[1] == dict(hardware=dict(name='Generic Hardware 1U'), items=list(range(1000)))
+
+def test_timeout_of_the_leader_isnt_raised_by_waiters():
+    sf, calls = device42api.SingleFlight(), []
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        if len(calls) == 1:
+            raise device42api.Device42APITimeoutException('deadline of the leader exceeded')
+        return dict(buildings=[])
+    results, errors = concurrently(3, lambda: sf.do('buildings/', fn))
+    assert sum(isinstance(e, device42api.Device42APITimeoutException) for e in errors) == 1
+    assert results.count(dict(buildings=[])) == 2
+    assert len(calls) == 2
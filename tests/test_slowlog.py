@@ -0,0 +1,39 @@
+import logging
+import simplejson as json
+import device42api
+
+def test_only_requests_over_the_threshold_are_kept():
+    slow, seen = device42api.SlowRequestLog(threshold=1.0, size=2), []
+    slow.sink = seen.append
+    assert slow.record('GET', 'macs/', 200, 0.5) == False
+    for n in range(3):
+        assert slow.record('GET', 'racks/%s/' % n, 200, 1.0 + n, 10)
+    assert [e['path'] for e in slow.entries()] == ['racks/1/', 'racks/2/']
+    assert len(seen) == 3 and seen[0]['object_type'] == None
+    slow.clear()
+    assert slow.entries() == []
+
+def test_entries_carry_the_loading_object(server, api):
+    server.latency = 0.05
+    api.slow_log = device42api.SlowRequestLog(threshold=0.04)
+    d = device42api.Device(api=api)
+    d.device_id = 1
+    d.name = 'device-000001'
+    d.load()
+    entry = api.slow_log.entries()[0]
+    assert (entry['method'], entry['path'], entry['status']) == ('GET', 'devices/id/1/?follow=yes', 200)
+    assert (entry['object_type'], entry['object_id'], entry['object_name']) == ('Device', 1, 'device-000001')
+    assert entry['seconds'] >= 0.04 and entry['size'] > 0
+
+def test_fast_requests_are_not_logged(server, api):
+    api.slow_log = device42api.SlowRequestLog(threshold=10.0)
+    api.get_device(name='device-000001')
+    assert api.slow_log.entries() == []
+
+def test_log_sink_writes_json(caplog):
+    slow = device42api.SlowRequestLog(threshold=0.0, sink=device42api.SlowRequestLog.log_sink())
+    with caplog.at_level(logging.WARNING, logger='device42api'):
+        slow.record('GET', 'macs/', 200, 1.5, 42)
+    record = caplog.records[0]
+    assert record.device42['path'] == 'macs/'
+    assert json.loads(record.getMessage().split(' ', 2)[2])['size'] == 42
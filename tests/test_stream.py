@@ -0,0 +1,55 @@
+import json
+import pytest
+import device42api
+
+def parse(chunks, key='macaddresses'):
+    return list(device42api.JSONArrayStream(chunks, key, device42api.get_decoder()))
+
+def split(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+ITEMS = [dict(macaddress='00:00:00:00:00:%02x' % n, port_name='eth%s' % n, vlan=dict(number=n, tags=[n, 'a'])) for n in range(20)]
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 100000])
+def test_items_split_across_chunks(size):
+    text = json.dumps(dict(total_count=20, macaddresses=ITEMS, offset=0))
+    assert parse(split(text, size)) == ITEMS
+
+def test_escaped_quotes_and_brackets_in_strings():
+    items = [dict(notes='say "hi" {not an object} [nor an array]', name='back\\slash\\'), dict(notes='\\"],}{[')]
+    text = json.dumps(dict(other='"]}', macaddresses=items))
+    for size in (1, 5, len(text)):
+        assert parse(split(text, size)) == items
+
+def test_multibyte_characters_split_across_chunks():
+    items = [dict(name=u'Räck € \U0001f600')]
+    assert parse(split(json.dumps(dict(macaddresses=items), ensure_ascii=False), 1)) == items
+
+def test_empty_array_and_object():
+    assert parse([b'{"macaddresses": []}']) == []
+    assert parse([b'{"macaddresses": [ ] , "total_count": 0}']) == []
+    assert parse([b'{}']) == []
+
+def test_missing_key_yields_nothing():
+    assert parse([b'{"ipaddresses": [{"ip": "10.0.0.1"}], "total_count": 1}']) == []
+
+def test_truncated_stream_raises():
+    with pytest.raises(ValueError):
+        parse([b'{"macaddresses": [{"macaddress": "00:00:00:00:00:01"}, {"mac'])
+
+def test_error_status_raises(server, api):
+    with pytest.raises(device42api.Device42APIObjectException):
+        list(api.__stream_api__('unknown/', 'items'))
+
+def test_streamed_request_goes_through_hooks_and_slow_log(server, api):
+    pre, post = [], []
+    api.add_hook('pre', lambda method, path, body: pre.append((method, path)))
+    api.add_hook('post', lambda method, path, status, seconds, size: post.append((method, path, status, size > 0)))
+    api.slow_log = device42api.SlowRequestLog(threshold=0.0)
+    macs = list(api.iter_macs())
+    assert len(macs) == len(server.inventory.macs)
+    assert pre == [('GET', 'macs/')]
+    assert post == [('GET', 'macs/', 200, True)]
+    assert [(e['method'], e['path'], e['status']) for e in api.slow_log.entries()] == [('GET', 'macs/', 200)]
+    assert api.metrics.snapshot()['GET macs/']['count'] == 1
@@ -0,0 +1,41 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import device42api
+
+def test_one_api_shared_by_many_threads(server, api):
+    server.latency = 0.005
+    headers = dict(api._headers)
+    def work(i):
+        if i % 3 == 0:
+            b = device42api.Building(api=api)
+            b.name = 'Building T%s' % i
+            return b.save()['code']
+        return api.get_device(device_id=i % 10 + 1).name
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(work, range(60)))
+    assert results == [0 if i % 3 == 0 else 'device-%06d' % (i % 10 + 1) for i in range(60)]
+    assert api._headers == headers
+    assert len(api._idle) <= api.workers
+    assert len([b for b in server.inventory.buildings.values() if b['name'].startswith('Building T')]) == 20
+
+def test_readers_never_see_a_partial_cache(server, api):
+    for n in range(50):
+        server.inventory.add('buildings', name='Extra %s' % n)
+    api.get_building('Building 1')
+    stop, missing = threading.Event(), []
+    def reload():
+        while not stop.is_set():
+            api.get_building('Building 1', reload=True)
+    def read():
+        for n in range(200):
+            if api.get_building('Extra 49') == False:   missing.append(n)
+    writers = [threading.Thread(target=reload) for n in range(2)]
+    for t in writers:   t.start()
+    try:
+        readers = [threading.Thread(target=read) for n in range(4)]
+        for t in readers:   t.start()
+        for t in readers:   t.join()
+    finally:
+        stop.set()
+        for t in writers:   t.join()
+    assert missing == []
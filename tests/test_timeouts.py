@@ -0,0 +1,89 @@
+import threading
+import time
+import pytest
+import device42api
+
+def client(server, **kwargs):
+    return device42api.Device42API(host=server.host, port=server.port, username='admin', password='changeme',
+                                   scheme=server.scheme, noInit=True, **kwargs)
+
+def test_read_timeout(server, count):
+    api = client(server, read_timeout=0.1)
+    server.latency = 0.5
+    start = time.perf_counter()
+    with pytest.raises(device42api.Device42APITimeoutException):
+        api.get_building('Building 1')
+    assert time.perf_counter() - start < 0.4
+    assert api.metrics.snapshot()['GET buildings/']['status'] == {0: 1}
+    # the connection of the timed out request isn't reused
+    server.latency = 0.0
+    assert api.get_building('Building 1').name == 'Building 1'
+
+def test_read_timeout_of_a_streamed_request(server):
+    api = client(server, read_timeout=0.1)
+    server.latency = 0.5
+    with pytest.raises(device42api.Device42APITimeoutException):
+        list(api.iter_macs())
+    assert api.metrics.snapshot()['GET macs/']['errors'] == 1
+
+def test_connect_timeout_is_kept_apart_from_the_read_timeout(server):
+    api = client(server, connect_timeout=0.05, read_timeout=1.0)
+    server.latency = 0.2
+    assert api.get_building('Building 1').name == 'Building 1'
+
+def test_deadline_limits_all_requests_of_a_call(server, api, count):
+    server.latency = 0.1
+    start = time.perf_counter()
+    with pytest.raises(device42api.Device42APITimeoutException):
+        with api.deadline(0.25):
+            api.get_rack()
+    assert time.perf_counter() - start < 0.4
+    assert device42api.remaining() == None
+    # no request is sent once the deadline passed
+    with api.deadline(0.0):
+        with pytest.raises(device42api.Device42APITimeoutException):
+            api.get_building('Building 1')
+    assert count('GET', 'buildings/') == 0
+
+def test_enclosing_shorter_deadline_is_kept(api):
+    with api.deadline(0.5):
+        with api.deadline(10.0):
+            assert device42api.remaining() <= 0.5
+        with api.deadline(None):
+            assert device42api.remaining() <= 0.5
+
+def run_with_deadline(api, seconds, delay, results, name):
+    def run():
+        time.sleep(delay)
+        start = time.perf_counter()
+        try:
+            with api.deadline(seconds):
+                results[name] = api.__get_api__('buildings/')
+        except Exception as e:
+            results[name] = e
+        results[name + '_seconds'] = time.perf_counter() - start
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+def test_leader_times_out_and_the_waiter_gets_a_result(server, count):
+    api = client(server, coalesce=True)
+    server.latency, results = 0.6, {}
+    threads = [run_with_deadline(api, 0.2, 0.0, results, 'leader'), run_with_deadline(api, 3.0, 0.05, results, 'waiter')]
+    for t in threads:   t.join()
+    assert isinstance(results['leader'], device42api.Device42APITimeoutException)
+    assert results['leader_seconds'] < 0.5
+    # the waiter joined the request of the leader, then sent its own with its own deadline
+    assert len(results['waiter']['buildings']) == 1
+    assert api.coalesce_stats()['coalesced'] == 1
+    assert count('GET', 'buildings/') == 2
+
+def test_waiter_times_out_and_the_leader_gets_a_result(server, count):
+    api = client(server, coalesce=True)
+    server.latency, results = 0.6, {}
+    threads = [run_with_deadline(api, 3.0, 0.0, results, 'leader'), run_with_deadline(api, 0.2, 0.05, results, 'waiter')]
+    for t in threads:   t.join()
+    assert isinstance(results['waiter'], device42api.Device42APITimeoutException)
+    assert results['waiter_seconds'] < 0.5
+    assert len(results['leader']['buildings']) == 1
+    assert count('GET', 'buildings/') == 1
@@ -0,0 +1,51 @@
+import pytest
+import device42api
+
+@pytest.fixture
+def tracer(api):
+    api.tracer = device42api.SpanRecorder()
+    return api.tracer
+
+def names(span):
+    return [c.name for c in span.children]
+
+def test_spans_nest_getter_load_and_http(api, tracer):
+    api.get_device(name='device-000001')
+    assert len(tracer.traces) == 1
+    root = tracer.traces[0]
+    assert root.name == 'Device42API.get_device'
+    assert names(root) == ['HTTP GET', 'Device.load']
+    http, load = root.children
+    assert http.attributes['http.template'] == 'devices/name/{name}/'
+    assert (http.attributes['http.status_code'], http.attributes['http.response_size'] > 0) == (200, True)
+    assert (load.attributes['device42.object.type'], load.attributes['device42.object.id']) == ('Device', 1)
+    assert names(load)[:2] == ['HTTP GET', 'Device42API.get_macid_byAddress']
+    assert load.children[0].attributes['http.path'] == 'devices/id/1/?follow=yes'
+    assert all(c.duration <= root.duration for c in root.children)
+
+def test_spans_of_parallel_calls_keep_their_parent(api, tracer):
+    with tracer.start_as_current_span('batch'):
+        api.parallel(lambda i: api.get_device(device_id=i), [1, 2, 3], workers=3)
+    assert len(tracer.traces) == 1
+    assert names(tracer.traces[0]) == ['Device42API.get_device'] * 3
+
+def test_failed_call_is_recorded_on_its_span(api, tracer):
+    with pytest.raises(KeyError):
+        api.get_device(name='unknown')
+    root = tracer.traces[0]
+    assert 'KeyError' in root.attributes['exception']
+    assert root.children[0].attributes['http.status_code'] == 404
+
+def test_format_omits_fast_subtrees(api, tracer):
+    api.get_device(name='device-000001')
+    text = tracer.format()
+    assert text.splitlines()[0].startswith('Device42API.get_device')
+    assert '\n  HTTP GET' in text and '\n    HTTP GET' in text
+    assert tracer.format(min_seconds=3600) == ''
+    tracer.clear()
+    assert tracer.format() == ''
+
+def test_streamed_request_has_a_span(api, tracer):
+    assert len(list(api.iter_macs())) > 0
+    span = tracer.traces[0]
+    assert (span.name, span.attributes['http.path'], span.attributes['http.status_code']) == ('HTTP GET', 'macs/', 200)
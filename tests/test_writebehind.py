@@ -0,0 +1,61 @@
+import pytest
+import device42api
+
+@pytest.fixture
+def wb():
+    wb = device42api.WriteBehind(window=0.05)
+    yield wb
+    wb.close()
+
+def key(wb, obj, path='device/'):
+    return wb.__key__('POST', path, obj.get_json(), obj)
+
+def record(type, name, content):
+    r = device42api.IPAM_DNSRecord()
+    r.type, r.name, r.content, r.domain = type, name, content, 'example.com'
+    return r
+
+def test_records_are_merged_by_type_name_and_content(wb):
+    a1, a2 = record('A', 'web.example.com', '10.0.0.1'), record('A', 'web.example.com', '10.0.0.2')
+    assert key(wb, a1, 'dns/records/') != key(wb, a2, 'dns/records/')
+    assert key(wb, a1, 'dns/records/') == key(wb, record('A', 'web.example.com', '10.0.0.1'), 'dns/records/')
+    assert key(wb, a1, 'dns/records/') != key(wb, record('AAAA', 'web.example.com', '10.0.0.1'), 'dns/records/')
+
+def test_objects_with_id_are_merged_by_id(wb):
+    d1, d2 = device42api.Device(), device42api.Device()
+    d1.name, d1.device_id = 'web01', 7
+    d2.name, d2.device_id = 'web01-renamed', 7
+    assert key(wb, d1) == key(wb, d2)
+    d2.device_id = 8
+    assert key(wb, d1) != key(wb, d2)
+
+def test_custom_fields_of_one_object_are_not_merged(wb):
+    cfs = []
+    for k in ('owner', 'site'):
+        cf = device42api.CustomField()
+        cf.id, cf.name, cf.key, cf.value = 1, 'asset-1', k, 'x'
+        cfs.append(cf)
+    assert key(wb, cfs[0], 'custom_fields/asset/') != key(wb, cfs[1], 'custom_fields/asset/')
+
+def test_unidentified_objects_are_only_merged_with_themselves(wb):
+    m1, m2 = device42api.IPAM_macaddress(), device42api.IPAM_macaddress()
+    m1.macaddress = m2.macaddress = '00:11:22:33:44:55'
+    assert key(wb, m1, 'macs/') == key(wb, m2, 'macs/')
+    # mask_bits is missing from the identity
+    s1, s2 = device42api.IPAM_subnet(), device42api.IPAM_subnet()
+    s1.network = s2.network = '10.0.0.0'
+    assert wb.__key__('POST', 'subnets/', {}, s1) != wb.__key__('POST', 'subnets/', {}, s2)
+    assert wb.__key__('POST', 'subnets/', {}, s1) == wb.__key__('POST', 'subnets/', {}, s1)
+
+def test_writes_of_one_device_are_sent_once(server, api, wb):
+    api.write_behind = wb
+    d = device42api.Device(api=api)
+    d.name = 'web01'
+    d.notes = 'first'
+    first = d.save()
+    d.notes = 'second'
+    second = d.save()
+    wb.flush()
+    assert first.result()['code'] == 0 and second.result() is first.result()
+    assert api.write_behind_stats() == dict(calls=2, merged=1, sent=1, failed=0, pending=0)
+    assert server.inventory.find('devices', name='web01')['notes'] == 'second'